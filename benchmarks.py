@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Python CLI File Manager - Benchmarks
+Timing scripts for the file_manager hot paths. Each benchmark builds its
+own synthetic tree in a temporary directory and removes it afterwards.
+
+Usage:
+    python benchmarks.py deep [--depth N]
+    python benchmarks.py modes [--files N] [--workers N] [--processes N]
+    python benchmarks.py sizes [--count N]
+    python benchmarks.py startup [--runs N]
+    python benchmarks.py memory [--files N]
+    python benchmarks.py suite [--scale N] [--output FILE]
+                               [--baseline FILE] [--threshold R]
+
+The suite times the traversal and formatting hot paths on wide, deep,
+many-tiny-files and mixed-extension trees, reports per-entry cost and
+syscall counts, and can save results as JSON and compare a run against
+a saved baseline.
+"""
+
+import argparse
+import compileall
+import io
+import json
+import platform
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import file_manager
+import file_scan
+
+
+def max_tree_depth(root, name_length=1):
+    """
+    Return the deepest chain of ``name_length`` character directories that
+    fits under ``root`` without exceeding the platform path length limit.
+    """
+    try:
+        path_max = os.pathconf(root, "PC_PATH_MAX")
+    except (AttributeError, OSError, ValueError):
+        path_max = 260  # Windows MAX_PATH
+    # Leave room for the root itself and a file name at the bottom
+    return (path_max - len(root) - 64) // (name_length + 1)
+
+
+def build_deep_tree(root, depth):
+    """Create a single chain of ``depth`` directories with a file at the bottom."""
+    # os.makedirs recurses once per level, so create the chain by hand
+    path = root
+    for _ in range(depth):
+        path = os.path.join(path, "d")
+        os.mkdir(path)
+    with open(os.path.join(path, "bottom.py"), "w") as f:
+        f.write("# bottom\n")
+    return path
+
+
+def remove_deep_tree(root, depth):
+    """Remove a chain created by build_deep_tree (shutil.rmtree recurses)."""
+    path = os.path.join(root, *(["d"] * depth))
+    os.remove(os.path.join(path, "bottom.py"))
+    for _ in range(depth):
+        os.rmdir(path)
+        path = os.path.dirname(path)
+
+
+def build_wide_tree(root, files, files_per_dir=200, fanout=16,
+                    extensions=(".py", ".txt", ".md", ".json")):
+    """
+    Create ``files`` empty files spread over a two-level directory tree with
+    ``fanout`` top-level directories, cycling through ``extensions``.
+    """
+    leaf_count = max(1, -(-files // files_per_dir))
+    created = 0
+    for leaf in range(leaf_count):
+        leaf_dir = os.path.join(root, f"top{leaf % fanout:03d}", f"leaf{leaf:05d}")
+        os.makedirs(leaf_dir)
+        for n in range(min(files_per_dir, files - created)):
+            ext = extensions[n % len(extensions)]
+            fd = os.open(os.path.join(leaf_dir, f"file{n:04d}{ext}"),
+                         os.O_CREAT | os.O_WRONLY)
+            os.close(fd)
+        created += files_per_dir
+
+
+def build_chain_tree(root, depth, files_per_level=4):
+    """Create a chain of ``depth`` directories with a few files at every level."""
+    path = root
+    for level in range(depth):
+        for n in range(files_per_level):
+            with open(os.path.join(path, f"f{n}.py" if n % 2 else f"f{n}.txt"),
+                      "w") as f:
+                f.write("x" * level)
+        path = os.path.join(path, "d")
+        os.mkdir(path)
+
+
+def build_flat_tree(root, files):
+    """Create ``files`` one-byte files in a single directory."""
+    for n in range(files):
+        with open(os.path.join(root, f"tiny{n:06d}.py" if n % 3 == 0
+                               else f"tiny{n:06d}.dat"), "w") as f:
+            f.write("x")
+
+
+# Synthetic trees of the benchmark suite: name -> (builder(root, scale),
+# walk iteratively?). Each holds roughly ``scale`` files.
+SUITE_TREES = {
+    "wide": (lambda root, scale: build_wide_tree(root, scale, files_per_dir=10,
+                                                 fanout=64), False),
+    "deep": (lambda root, scale: build_chain_tree(
+        root, min(max(scale // 4, 1), 400, max_tree_depth(root, 1) - 1)), True),
+    "tiny": (build_flat_tree, False),
+    "mixed": (lambda root, scale: build_wide_tree(
+        root, scale, files_per_dir=50, fanout=8,
+        extensions=(".py", ".pyi", ".txt", ".md", ".json", ".tar.gz", ".c",
+                    ".h", ".rs", ".go", ".js", ".css")), False),
+}
+
+
+def best_time(func, repeat):
+    """Return (fastest of ``repeat`` runs in seconds, result of the last run)."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _suite_result(seconds, entries, stats=None):
+    result = {"seconds": seconds, "entries": entries,
+              "per_entry_us": seconds / max(entries, 1) * 1e6}
+    if stats is not None:
+        result["scandir_calls"] = stats.scandir_calls
+        result["stat_calls"] = stats.stat_calls
+    return result
+
+
+def run_suite(scale, repeat):
+    """Run every suite benchmark and return {name: result dict}."""
+    results = {}
+    for tree_name, (builder, iterative) in SUITE_TREES.items():
+        root = tempfile.mkdtemp()
+        try:
+            builder(root, scale)
+            entries = sum(1 for _ in file_manager.iter_tree_records(root))
+
+            def render():
+                stats = file_manager.WalkStats()
+                file_manager.render_directory_tree(
+                    root, io.StringIO(), max_depth=entries + 1, stats=stats,
+                    iterative=iterative)
+                return stats
+
+            def find():
+                stats = file_manager.WalkStats()
+                file_manager.find_files_by_extension(root, ".py", stats=stats,
+                                                     iterative=iterative)
+                return stats
+
+            for func_name, func in (("list_directory_tree", render),
+                                    ("find_files_by_extension", find)):
+                seconds, stats = best_time(func, repeat)
+                results[f"{tree_name}/{func_name}"] = _suite_result(
+                    seconds, entries, stats)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    rng = random.Random(212)
+    sizes = [int(2 ** rng.uniform(0, 52)) for _ in range(scale)]
+    seconds, _ = best_time(
+        lambda: [file_manager.format_file_size(size) for size in sizes], repeat)
+    results["sizes/format_file_size"] = _suite_result(seconds, len(sizes))
+    seconds, _ = best_time(lambda: file_manager.format_file_sizes(sizes), repeat)
+    results["sizes/format_file_sizes"] = _suite_result(seconds, len(sizes))
+    return results
+
+
+def compare_results(results, baseline, threshold):
+    """
+    Compare suite results against a baseline run.
+
+    A benchmark regresses if its per-entry time grew by more than
+    ``threshold`` (0.2 = 20%) or if it issued more syscalls than before.
+    Returns the list of regressed benchmark names.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"  {name:42s} (new, no baseline)")
+            continue
+        ratio = result["per_entry_us"] / max(base["per_entry_us"], 1e-9)
+        syscalls = result.get("scandir_calls", 0) + result.get("stat_calls", 0)
+        base_syscalls = base.get("scandir_calls", 0) + base.get("stat_calls", 0)
+        regressed = ratio > 1 + threshold or syscalls > base_syscalls
+        if regressed:
+            regressions.append(name)
+        print(f"  {name:42s} {ratio:6.2f}x time  "
+              f"syscalls {base_syscalls} -> {syscalls}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def bench_suite(scale, repeat, output=None, baseline=None, threshold=0.2):
+    """Run the suite, print it, optionally save and compare; return exit status."""
+    results = run_suite(scale, repeat)
+    print(f"Benchmark suite: scale {scale}, best of {repeat}")
+    for name, result in results.items():
+        syscalls = ""
+        if "scandir_calls" in result:
+            syscalls = (f"  scandir {result['scandir_calls']:7d}  "
+                        f"stat {result['stat_calls']:7d}")
+        print(f"  {name:42s} {result['per_entry_us']:8.3f} us/entry  "
+              f"({result['entries']} entries){syscalls}")
+
+    if output:
+        document = {
+            "meta": {"python": platform.python_version(),
+                     "platform": platform.platform(),
+                     "scale": scale, "repeat": repeat,
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results,
+        }
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"Results saved to {output}")
+
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            baseline_results = json.load(f)["results"]
+        print(f"Compared with {baseline} (threshold {threshold:.0%}):")
+        regressions = compare_results(results, baseline_results, threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s)")
+            return 1
+    return 0
+
+
+def time_call(func, *args, **kwargs):
+    """Run func once and return (seconds, result or the exception raised)."""
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except RecursionError as e:
+        result = e
+    return time.perf_counter() - start, result
+
+
+def bench_deep(depth):
+    """Compare recursive and iterative walkers on a single deep chain."""
+    root = tempfile.mkdtemp()
+    limit = max_tree_depth(root)
+    if depth > limit:
+        print(f"Requested depth {depth} exceeds the path length limit here; "
+              f"using depth {limit}.")
+        depth = limit
+
+    build_deep_tree(root, depth)
+    try:
+        print(f"Deep tree: depth {depth}, "
+              f"recursion limit {sys.getrecursionlimit()}")
+        for iterative in (False, True):
+            mode = "iterative" if iterative else "recursive"
+
+            elapsed, result = time_call(file_manager.find_files_by_extension,
+                                        root, ".py", iterative=iterative)
+            status = ("RecursionError" if isinstance(result, RecursionError)
+                      else f"{len(result)} match(es)")
+            print(f"  find ({mode}): {elapsed:8.4f}s  {status}")
+
+            with redirect_stdout(io.StringIO()):
+                elapsed, result = time_call(file_manager.list_directory_tree,
+                                            root, max_depth=depth + 1,
+                                            iterative=iterative)
+            status = ("RecursionError" if isinstance(result, RecursionError)
+                      else "completed")
+            print(f"  tree ({mode}): {elapsed:8.4f}s  {status}")
+    finally:
+        remove_deep_tree(root, depth)
+        os.rmdir(root)
+
+
+def bench_modes(files, workers, processes):
+    """Compare serial, thread-pool and process-pool find_files_by_extension."""
+    root = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        build_wide_tree(root, files)
+        print(f"Built {files} files in {time.perf_counter() - start:.1f}s")
+
+        runs = [("serial", {}),
+                (f"threads={workers}", {"workers": workers}),
+                (f"processes={processes}", {"processes": processes})]
+        baseline = None
+        for label, kwargs in runs:
+            elapsed, result = time_call(file_manager.find_files_by_extension,
+                                        root, ".py", **kwargs)
+            if baseline is None:
+                baseline = result
+            same = "same order" if result == baseline else "MISMATCH"
+            print(f"  {label:14s} {elapsed:8.3f}s  {len(result)} matches  "
+                  f"({same})")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def bench_sizes(count):
+    """Compare format_file_size in a loop with the format_file_sizes batch."""
+    rng = random.Random(212)
+    # Log-uniform sizes, so every unit from bytes to PiB is exercised
+    sizes = [int(2 ** rng.uniform(0, 52)) for _ in range(count)]
+    print(f"Formatting {count} sizes")
+
+    for use_binary in (True, False):
+        label = "binary" if use_binary else "decimal"
+        start = time.perf_counter()
+        scalar = [file_manager.format_file_size(size, use_binary=use_binary)
+                  for size in sizes]
+        scalar_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = file_manager.format_file_sizes(sizes, use_binary=use_binary)
+        batch_time = time.perf_counter() - start
+
+        same = "identical" if batch == scalar else "MISMATCH"
+        print(f"  {label:8s} scalar {count / scalar_time:12,.0f}/s   "
+              f"batch {count / batch_time:12,.0f}/s   "
+              f"({scalar_time / batch_time:.1f}x, {same})")
+
+
+def traced_memory(func, *args, **kwargs):
+    """Run func and return (bytes it left allocated, its result)."""
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func(*args, **kwargs)
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0] - before, result
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(files):
+    """Compare the memory held by list and ScanResult scan results."""
+    root = tempfile.mkdtemp()
+    try:
+        build_wide_tree(root, files)
+        print(f"Memory held by the results for {files} files")
+        runs = [
+            ("find, list of paths",
+             lambda: file_manager.find_files_by_extension(root, ".py")),
+            ("find, compact",
+             lambda: file_manager.find_files_by_extension(root, ".py",
+                                                          compact=True)),
+            ("scan, list of records",
+             lambda: list(file_manager.iter_tree_records(root))),
+            ("scan, compact", lambda: file_scan.scan_tree(root)),
+        ]
+        for label, func in runs:
+            held, result = traced_memory(func)
+            print(f"  {label:22s} {len(result):9d} entries  "
+                  f"{file_manager.format_file_size(held):>12}  "
+                  f"{held / max(len(result), 1):7.1f} bytes/entry")
+            del result
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def parse_importtime(stderr):
+    """Parse ``-X importtime`` output into {module: (self_us, cumulative_us)}."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def bench_startup(runs):
+    """Measure cold-start cost of the CLI with python -X importtime."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    # Make sure bytecode is current, or every run would pay for compiling
+    compileall.compile_dir(here, maxlevels=0, quiet=1)
+
+    cumulative = []
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import cli"],
+            cwd=here, capture_output=True, text=True, check=True)
+        times = parse_importtime(completed.stderr)
+        cumulative.append(times["cli"][1])
+        samples.append(times)
+
+    print(f"import cli: median {statistics.median(cumulative) / 1000:.2f} ms "
+          f"cumulative over {runs} runs")
+    # Heaviest modules by self time in the median run
+    median_run = sorted(zip(cumulative, range(runs)))[runs // 2][1]
+    heaviest = sorted(samples[median_run].items(), key=lambda item: item[1][0],
+                      reverse=True)[:8]
+    for name, (self_us, cumulative_us) in heaviest:
+        print(f"  {name:28s} self {self_us / 1000:6.2f} ms   "
+              f"cumulative {cumulative_us / 1000:6.2f} ms")
+    lazy = ("argparse", "json", "sqlite3", "concurrent.futures", "shlex")
+    loaded = [name for name in lazy if name in samples[median_run]]
+    print(f"  lazily imported modules loaded at startup: {loaded or 'none'}")
+
+    # Running cli.py as a script recompiles it on every launch (__main__
+    # is never cached), so also time the same command with cli imported
+    commands = [("python -c pass", [sys.executable, "-c", "pass"]),
+                ("cli.py calc cli.py", [sys.executable, "cli.py", "calc", "cli.py"]),
+                ("import cli; calc cli.py",
+                 [sys.executable, "-c",
+                  "import cli, sys; sys.exit(cli.main(['calc', 'cli.py']))"])]
+    for label, command in commands:
+        wall = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(command, cwd=here, stdout=subprocess.DEVNULL, check=True)
+            wall.append(time.perf_counter() - start)
+        print(f"  {label:28s} median wall {statistics.median(wall) * 1000:7.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="file_manager benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    deep = subparsers.add_parser("deep", help="recursive vs iterative walkers")
+    deep.add_argument("--depth", type=int, default=10000,
+                      help="directory chain depth (default: 10000)")
+
+    modes = subparsers.add_parser("modes",
+                                  help="serial vs thread vs process search")
+    modes.add_argument("--files", type=int, default=1_000_000,
+                       help="number of files in the synthetic tree "
+                            "(default: 1000000)")
+    modes.add_argument("--workers", type=int, default=8,
+                       help="thread-pool size (default: 8)")
+    modes.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                       help="process-pool size (default: CPU count)")
+
+    sizes = subparsers.add_parser("sizes",
+                                  help="scalar vs batch size formatting")
+    sizes.add_argument("--count", type=int, default=1_000_000,
+                       help="number of sizes to format (default: 1000000)")
+
+    startup = subparsers.add_parser("startup", help="CLI cold-start cost")
+    startup.add_argument("--runs", type=int, default=20,
+                         help="number of interpreter launches (default: 20)")
+
+    memory = subparsers.add_parser("memory",
+                                   help="list vs compact scan result memory")
+    memory.add_argument("--files", type=int, default=200_000,
+                        help="number of files in the synthetic tree "
+                             "(default: 200000)")
+
+    suite = subparsers.add_parser("suite", help="hot-path regression suite")
+    suite.add_argument("--scale", type=int, default=20000,
+                       help="approximate files per synthetic tree (default: 20000)")
+    suite.add_argument("--repeat", type=int, default=3,
+                       help="runs per benchmark, fastest is kept (default: 3)")
+    suite.add_argument("--output", metavar="FILE",
+                       help="save results as JSON")
+    suite.add_argument("--baseline", metavar="FILE",
+                       help="compare against a saved JSON run")
+    suite.add_argument("--threshold", type=float, default=0.2,
+                       help="allowed slowdown before a regression (default: 0.2)")
+
+    args = parser.parse_args(argv)
+    if args.benchmark == "deep":
+        bench_deep(args.depth)
+    elif args.benchmark == "modes":
+        bench_modes(args.files, args.workers, args.processes)
+    elif args.benchmark == "sizes":
+        bench_sizes(args.count)
+    elif args.benchmark == "startup":
+        bench_startup(args.runs)
+    elif args.benchmark == "memory":
+        bench_memory(args.files)
+    elif args.benchmark == "suite":
+        return bench_suite(args.scale, args.repeat, args.output, args.baseline,
+                           args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,8 +5,25 @@ Contains user interface functions for the file manager:
 display functions, user input handling, and main program loop.
 """
 
+import io
+import itertools
+import os
 import sys
-from file_manager import get_and_display_file_size
+import file_manager
+from file_cache import StatCache
+from file_exclude import ExcludeRules
+from file_manager import (
+    WalkStats,
+    expand_file_patterns,
+    find_files_by_extension,
+    find_largest_files,
+    format_file_size,
+    get_and_display_file_sizes,
+    iter_tree_records,
+    render_directory_tree,
+    write_counted,
+    write_records,
+)
 
 
 def display_welcome():
@@ -18,7 +35,7 @@ def display_welcome():
     print("This is a simple file manager to demonstrate")
     print("Python fundamentals: variables, expressions,")
     print("statements, and functions.")
-    # TODO: Add a blank line after the welcome message
+    print()
 
 
 def get_user_choice():
@@ -26,13 +43,25 @@ def get_user_choice():
     print("\nAvailable commands:")
     print("1. help - Show this help message")
     print("2. calc - Calculate file size")
-    print("3. info - Show program information")
-    print("4. quit - Exit the program")
+    print("3. tree - Show a directory tree")
+    print("4. find - Find files by extension")
+    print("5. largest - Show the largest files in a directory")
+    print("6. dupes - Find duplicate files")
+    print("7. checksum - Compute file checksums")
+    print("8. watch - Report changes in a directory tree")
+    print("9. snapshot - Save a scan of a directory tree to a file")
+    print("10. diff - Compare two snapshots, or a snapshot and a directory")
+    print("11. du - Show a directory tree with the size of each directory")
+    print("12. stats - Show statistics of the last operation")
+    print("13. cache - Show (or clear) the stat cache of this session")
+    print("14. info - Show program information")
+    print("15. quit - Exit the program")
     print()
 
-    choice = input("Enter your choice (help/calc/info/quit): ").strip().lower()
-    return get_user_choice()t
-    # TODO: Add code to return the choice
+    choice = input("Enter your choice (help/calc/tree/find/largest/dupes/"
+                   "checksum/watch/snapshot/diff/du/stats/cache/info/quit): "
+                   ).strip().lower()
+    return choice
 
 
 def display_help():
@@ -42,7 +71,28 @@ def display_help():
     print("=" * 40)
     print("help  - Display this help message")
     print("calc  - Calculate the size of a file")
-    print("        You'll be prompted to enter a filename")
+    print("        You'll be prompted to enter a filename;")
+    print("        glob patterns such as *.txt size every match")
+    print("tree  - Show the tree of a directory (3 levels deep)")
+    print("find  - List the files below a directory with an extension")
+    print("largest - Show the largest files below a directory;")
+    print("        'largest DIR 20 .log' shows the 20 largest .log files")
+    print("dupes - List files below a directory with identical contents")
+    print("checksum - Print the SHA-256 checksum of files;")
+    print("        'checksum --check MANIFEST' verifies a sha256sum file")
+    print("watch - Poll a directory and print added, removed and resized")
+    print("        entries until Ctrl+C; 'watch DIR SECONDS' sets the interval")
+    print("snapshot - Save the paths, sizes and mtimes below a directory;")
+    print("        'snapshot DIR FILE' writes them to FILE")
+    print("diff  - Show what was added, removed and modified between two")
+    print("        snapshots; 'diff FILE DIR' compares with the tree as it is now")
+    print("du    - Show the tree of a directory with the total size of the")
+    print("        files below each directory; 'du DIR 1' shows one level")
+    print("stats - Show what the last calc, tree or find cost:")
+    print("        entries visited, syscalls, skipped errors,")
+    print("        output size and time per phase")
+    print("cache - Show the hits and misses of the stat cache that calc,")
+    print("        tree, find and du share in a session; 'cache clear' empties it")
     print("info  - Show information about this program")
     print("quit  - Exit the file manager")
     print()
@@ -50,6 +100,8 @@ def display_help():
     print("- File paths can be relative or absolute")
     print("- Use quotes around filenames with spaces")
     print("- The program uses only Python standard library")
+    print("- Run commands from a file with: python cli.py --batch FILE")
+    print("- One-shot use: python cli.py calc|tree|find ... (see --help)")
     print("=" * 40)
 
 
@@ -63,6 +115,12 @@ def display_info():
     print("Concepts: Variables, expressions, statements, functions")
     print("Features:")
     print("  - File size calculation")
+    print("  - Directory tree and extension search")
+    print("  - Duplicate file detection")
+    print("  - Checksums and manifest verification")
+    print("  - Watching directories for changes")
+    print("  - Tree snapshots and snapshot diffs")
+    print("  - Recursive directory sizes")
     print("  - Interactive command system")
     print("  - Help system")
     print("  - Standard library only")
@@ -72,18 +130,313 @@ def display_info():
     print("=" * 40)
 
 
-# TODO - Set the keyword arguments such that;
-# 1. show_goodbye defaults to True
-# 2. goodbye_message defaults to "Thank you for using Python CLI File Manager!"
-# 3. invalid_choice_prefix defaults to "Invalid choice:"
-# 4. valid_commands defaults to "help, calc, info, quit"
+def display_stats():
+    """Display the counters of the last calc, tree or find operation."""
+    stats = file_manager.last_walk_stats
+    if stats is None:
+        print("\nNo operation has been run yet.")
+        return
+    print("\n" + "=" * 40)
+    print("        LAST OPERATION STATISTICS")
+    print("=" * 40)
+    for line in stats.summary_lines():
+        print(line)
+    print("=" * 40)
+
+
+def display_cache(args):
+    """Show the session's stat cache, or empty it with ``cache clear``."""
+    cache = file_manager.stat_cache
+    if args and args != ["clear"]:
+        print("Error: Usage: cache [clear]")
+        return False
+    if cache is None:
+        print("\nThe stat cache is only used in interactive and batch sessions.")
+        return True
+    if args:
+        cache.clear()
+        print("\nStat cache cleared.")
+        return True
+    print("\n" + "=" * 40)
+    print("            STAT CACHE")
+    print("=" * 40)
+    for line in cache.summary_lines():
+        print(line)
+    print("=" * 40)
+    return True
+
+
+def display_tree(args):
+    """Print the tree of a directory; returns False if it is not one."""
+    directory = args[0] if args else ""
+    if not os.path.isdir(directory):
+        print(f"Error: '{directory}' is not a valid directory.")
+        return False
+    render_directory_tree(directory, sys.stdout)
+    return True
+
+
+def display_du(args):
+    """
+    Print a directory tree with directory totals: ``du DIR [DEPTH]``.
+
+    Returns False for a bad directory or depth.
+    """
+    directory = args[0] if args else ""
+    if not os.path.isdir(directory):
+        print(f"Error: '{directory}' is not a valid directory.")
+        return False
+    try:
+        depth = int(args[1]) if len(args) > 1 else 3
+    except ValueError:
+        print("Error: Usage: du DIRECTORY [DEPTH]")
+        return False
+    render_directory_tree(directory, sys.stdout, depth, sizes=True)
+    return True
+
+
+def display_found_files(args):
+    """Print the files below a directory matching extensions; False on bad input."""
+    if len(args) < 2:
+        print("Error: Usage: find DIRECTORY EXTENSION...")
+        return False
+    directory, extensions = args[0], args[1:]
+    if not os.path.isdir(directory):
+        print(f"Error: '{directory}' is not a valid directory.")
+        return False
+    found_files = find_files_by_extension(directory, extensions)
+    found_files.append(f"\n{len(found_files)} file(s) found.\n")
+    write_counted(sys.stdout, "\n".join(found_files), file_manager.last_walk_stats)
+    return True
+
+
+def display_largest(args):
+    """
+    Print the largest files below a directory: ``largest DIR [COUNT [EXT...]]``.
+
+    Returns False for a bad directory or count.
+    """
+    directory = args[0] if args else ""
+    if not os.path.isdir(directory):
+        print(f"Error: '{directory}' is not a valid directory.")
+        return False
+    try:
+        count = int(args[1]) if len(args) > 1 else 10
+    except ValueError:
+        print("Error: Usage: largest DIRECTORY [COUNT [EXTENSION...]]")
+        return False
+    show_largest_files(directory, count, args[2:] or None)
+    return True
+
+
+def show_largest_files(directory, count, extensions=None, follow_symlinks=False):
+    """Print find_largest_files results, one "SIZE  PATH" line per file."""
+    largest = find_largest_files(directory, count, extensions,
+                                 follow_symlinks=follow_symlinks)
+    lines = [f"{format_file_size(size):>12}  {path}" for size, path in largest]
+    if not lines:
+        lines.append("No files found.")
+    write_counted(sys.stdout, "\n".join(lines) + "\n", file_manager.last_walk_stats)
+
+
+def display_duplicates(args, workers=8, min_size=1):
+    """Print the groups of duplicate files below a directory; False if invalid."""
+    from file_hashing import find_duplicate_files
+
+    directory = args[0] if args else ""
+    if not os.path.isdir(directory):
+        print(f"Error: '{directory}' is not a valid directory.")
+        return False
+
+    stats = WalkStats()
+    groups = find_duplicate_files(directory, workers, min_size, stats=stats)
+
+    lines = []
+    wasted = 0
+    for size, paths in groups:
+        lines.append(f"\n{len(paths)} files of {format_file_size(size)}:")
+        lines.extend(f"  {path}" for path in paths)
+        wasted += size * (len(paths) - 1)
+    lines.append(f"\n{len(groups)} group(s) of duplicates, "
+                 f"{format_file_size(wasted)} reclaimable.\n")
+    write_counted(sys.stdout, "\n".join(lines), stats)
+    return True
+
+
+def display_checksums(patterns, algorithm="sha256", workers=8):
+    """
+    Print "DIGEST  FILENAME" lines for files, as sha256sum does.
+
+    The output can be saved as a manifest for display_verification. Errors
+    and the throughput summary go to stderr so they do not end up in one.
+    Returns True if every file was hashed.
+    """
+    from file_hashing import checksum_files
+
+    filenames, ok = expand_file_patterns(patterns)
+    if not filenames:
+        if ok:
+            print("Error: No filename provided.")
+        return False
+
+    stats = WalkStats().start(f"checksum {' '.join(patterns)}")
+    lines = []
+    total_bytes = 0
+    for filename, (digest, size, error) in zip(
+            filenames, checksum_files(filenames, algorithm, workers)):
+        if error:
+            print(error, file=sys.stderr)
+            stats.errors += 1
+            ok = False
+        else:
+            lines.append(f"{digest}  {filename}")
+            total_bytes += size
+            stats.files += 1
+    write_counted(sys.stdout, "\n".join(lines) + "\n", stats)
+    stats.finish()
+    print_throughput(stats.files, total_bytes, stats.wall_time)
+    return ok
+
+
+def display_verification(manifest, workers=8):
+    """Check files against a checksum manifest; True if all of them match."""
+    from file_hashing import verify_manifest
+
+    stats = WalkStats().start(f"checksum --check {manifest}")
+    try:
+        results, bad_lines = verify_manifest(manifest, workers)
+    except OSError as e:
+        print(f"Error reading manifest: {e}")
+        return False
+
+    lines = []
+    total_bytes = 0
+    failed = 0
+    for filename, status, size in results:
+        lines.append(f"{filename}: {status}")
+        if status == "OK":
+            total_bytes += size
+            stats.files += 1
+        else:
+            failed += 1
+    stats.errors = failed
+    if lines:
+        write_counted(sys.stdout, "\n".join(lines) + "\n", stats)
+    stats.finish()
+
+    if bad_lines:
+        print(f"WARNING: {bad_lines} line(s) are improperly formatted")
+    if failed:
+        print(f"WARNING: {failed} of {len(results)} file(s) did NOT match")
+    elif not results:
+        print(f"Error: No checksums found in '{manifest}'.")
+    print_throughput(stats.files, total_bytes, stats.wall_time)
+    return not failed and not bad_lines and bool(results)
+
+
+def display_watch(args):
+    """
+    Watch a directory until Ctrl+C: ``watch DIR [SECONDS [POLLS]]``.
+
+    Returns False for a bad directory or arguments.
+    """
+    from file_watch import watch_directory
+
+    directory = args[0] if args else ""
+    if not os.path.isdir(directory):
+        print(f"Error: '{directory}' is not a valid directory.")
+        return False
+    try:
+        interval = float(args[1]) if len(args) > 1 else 2.0
+        polls = int(args[2]) if len(args) > 2 else None
+    except ValueError:
+        print("Error: Usage: watch DIRECTORY [SECONDS [POLLS]]")
+        return False
+
+    try:
+        watch_directory(directory, interval, polls)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    return True
+
+
+def display_snapshot(args, exclude=None, follow_symlinks=False):
+    """Save a snapshot: ``snapshot DIR FILE``; returns False on failure."""
+    from file_snapshot import save_snapshot
+
+    if len(args) != 2:
+        print("Error: Usage: snapshot DIRECTORY FILE")
+        return False
+    directory, path = args
+    if not os.path.isdir(directory):
+        print(f"Error: '{directory}' is not a valid directory.")
+        return False
+    try:
+        count = save_snapshot(directory, path, exclude=exclude,
+                              follow_symlinks=follow_symlinks)
+    except OSError as e:
+        print(f"Error writing snapshot: {e}")
+        return False
+    print(f"Saved {count} entries of '{directory}' to '{path}' "
+          f"({format_file_size(os.path.getsize(path))}).")
+    return True
+
+
+def display_diff(args, exclude=None, follow_symlinks=None):
+    """
+    Print the changes between two scans: ``diff OLD NEW``.
+
+    Each side is a snapshot file or a directory, scanned live with the
+    options of the snapshot unless ``exclude`` or ``follow_symlinks`` are
+    given. Returns False for bad arguments or an unreadable snapshot.
+    """
+    from file_snapshot import diff_snapshots
+    from file_watch import format_change
+
+    if len(args) != 2:
+        print("Error: Usage: diff SNAPSHOT|DIRECTORY SNAPSHOT|DIRECTORY")
+        return False
+    stats = WalkStats().start(f"diff {args[0]} {args[1]}")
+    try:
+        changes = diff_snapshots(args[0], args[1], stats, exclude,
+                                 follow_symlinks)
+        counts = {}
+        lines = []
+        for change in changes:
+            counts[change[0]] = counts.get(change[0], 0) + 1
+            lines.append(format_change(change))
+            if len(lines) >= 4096:
+                write_counted(sys.stdout, "\n".join(lines) + "\n", stats)
+                lines = []
+    except (OSError, ValueError) as e:
+        print(f"Error reading snapshot: {e}")
+        return False
+    finally:
+        stats.finish()
+    lines.append(f"{counts.get('added', 0)} added, {counts.get('removed', 0)} "
+                 f"removed, {counts.get('modified', 0)} modified.")
+    write_counted(sys.stdout, "\n".join(lines) + "\n", stats)
+    return True
+
+
+def print_throughput(files, total_bytes, seconds):
+    """Report hashing throughput on stderr."""
+    rate = total_bytes / seconds / 1e6 if seconds > 0 else 0.0
+    print(f"{files} file(s), {format_file_size(total_bytes)} in {seconds:.2f} s "
+          f"({rate:.1f} MB/s)", file=sys.stderr)
+
+
 def process_user_command(
     choice,
     running,
-    show_goodbye,
-    goodbye_message,
-    invalid_choice_prefix,
-    valid_commands,
+    *,
+    show_goodbye=True,
+    goodbye_message="Thank you for using Python CLI File Manager!",
+    invalid_choice_prefix="Invalid choice:",
+    valid_commands="help, calc, tree, find, largest, dupes, checksum, watch, "
+                   "snapshot, diff, du, stats, cache, info, quit",
+    args=None,
+    errors=None,
 ):
     """
     Process a user command and return the updated running state.
@@ -98,6 +451,8 @@ def process_user_command(
         goodbye_message (str, keyword-only): Custom goodbye message
         invalid_choice_prefix (str, keyword-only): Prefix for invalid choice messages
         valid_commands (str, keyword-only): String listing valid commands
+        args (list, keyword-only): Command arguments; None prompts for them
+        errors (list, keyword-only): If given, failed commands are appended
 
     Returns:
         bool: Updated running state (False if user chose to quit, True otherwise)
@@ -105,7 +460,69 @@ def process_user_command(
     if choice == "help":
         display_help()
     elif choice == "calc":
-        get_and_display_file_size()
+        if args is None:
+            args = [input("Enter filename (or glob pattern): ")]
+        if not get_and_display_file_sizes(args) and errors is not None:
+            errors.append(f"calc {' '.join(args)}")
+    elif choice == "tree":
+        if args is None:
+            args = [input("Enter directory: ").strip()]
+        if not display_tree(args) and errors is not None:
+            errors.append(f"tree {' '.join(args)}")
+    elif choice == "find":
+        if args is None:
+            args = [input("Enter directory: ").strip(),
+                    input("Enter extension (e.g. .py): ").strip()]
+        if not display_found_files(args) and errors is not None:
+            errors.append(f"find {' '.join(args)}")
+    elif choice == "largest":
+        if args is None:
+            args = [input("Enter directory: ").strip()]
+        if not display_largest(args) and errors is not None:
+            errors.append(f"largest {' '.join(args)}")
+    elif choice == "dupes":
+        if args is None:
+            args = [input("Enter directory: ").strip()]
+        if not display_duplicates(args) and errors is not None:
+            errors.append(f"dupes {' '.join(args)}")
+    elif choice == "checksum":
+        if args is None:
+            args = [input("Enter filename (or glob pattern): ")]
+        if args[:1] == ["--check"]:
+            ok = len(args) == 2 and display_verification(args[1])
+            if len(args) != 2:
+                print("Error: Usage: checksum --check MANIFEST")
+        else:
+            ok = display_checksums(args)
+        if not ok and errors is not None:
+            errors.append(f"checksum {' '.join(args)}")
+    elif choice == "watch":
+        if args is None:
+            args = [input("Enter directory: ").strip()]
+        if not display_watch(args) and errors is not None:
+            errors.append(f"watch {' '.join(args)}")
+    elif choice == "snapshot":
+        if args is None:
+            args = [input("Enter directory: ").strip(),
+                    input("Enter snapshot file: ").strip()]
+        if not display_snapshot(args) and errors is not None:
+            errors.append(f"snapshot {' '.join(args)}")
+    elif choice == "diff":
+        if args is None:
+            args = [input("Enter old snapshot (or directory): ").strip(),
+                    input("Enter new snapshot (or directory): ").strip()]
+        if not display_diff(args) and errors is not None:
+            errors.append(f"diff {' '.join(args)}")
+    elif choice == "du":
+        if args is None:
+            args = [input("Enter directory: ").strip()]
+        if not display_du(args) and errors is not None:
+            errors.append(f"du {' '.join(args)}")
+    elif choice == "stats":
+        display_stats()
+    elif choice == "cache":
+        if not display_cache(args or []) and errors is not None:
+            errors.append(f"cache {' '.join(args)}")
     elif choice == "info":
         display_info()
     elif choice == "quit":
@@ -116,34 +533,497 @@ def process_user_command(
     else:
         print(f"\n{invalid_choice_prefix} '{choice}'")
         print(f"Please enter one of: {valid_commands}")
+        if errors is not None:
+            errors.append(choice)
 
     return running
 
 
-def main():
-    """Main program loop."""
-    # Display welcome message
-    # TODO: Call the function to display the welcome message
+def parse_command_line(line):
+    """
+    Split a batch line into (command, arguments).
+
+    Quoting is only parsed (with shlex) when the line contains quotes or
+    backslashes; plain lines take the much cheaper str.split path.
+    Returns None for blank lines and # comments.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if '"' in line or "'" in line or "\\" in line:
+        import shlex
+        words = shlex.split(line)
+    else:
+        words = line.split()
+    return words[0].lower(), words[1:]
 
-    # Main command loop
-    # TODO: Initialize a variable to control the loop. Hint set running = True
-    while running:
+
+def run_batch(lines, output=None, chunk_commands=1000):
+    """
+    Run commands from an iterable of lines without the interactive menu.
+
+    Each line is a command with its arguments, e.g. ``calc notes.txt``.
+    Command output is buffered and written to ``output`` (default stdout)
+    every ``chunk_commands`` commands. A ``quit`` line ends the batch.
+    Failed commands are reported on stderr by line number; ``watch`` must
+    be given its POLLS, since nothing could stop it otherwise.
+
+    Returns:
+        int: Exit status, 0 if every command succeeded, 1 otherwise
+    """
+    from contextlib import redirect_stdout
+
+    output = output or sys.stdout
+    buffer = io.StringIO()
+    errors = []
+    failed_lines = []
+    running = True
+
+    # The commands of a batch share one stat cache (see StatCache)
+    previous_cache = file_manager.stat_cache
+    file_manager.stat_cache = StatCache()
+    with redirect_stdout(buffer):
         try:
-            choice = get_user_choice()
+            for line_number, line in enumerate(lines, 1):
+                try:
+                    parsed = parse_command_line(line)
+                except ValueError as e:
+                    failed_lines.append((line_number, f"{line.strip()} ({e})"))
+                    continue
+                if parsed is None:
+                    continue
+
+                choice, args = parsed
+                if choice == "watch" and len(args) < 3:
+                    failed_lines.append(
+                        (line_number,
+                         f"{line.strip()} (usage in a batch: watch DIRECTORY "
+                         f"SECONDS POLLS)"))
+                    continue
+                error_count = len(errors)
+                running = process_user_command(choice, running, show_goodbye=False,
+                                               args=args, errors=errors)
+                if len(errors) > error_count:
+                    failed_lines.append((line_number, line.strip()))
+
+                if line_number % chunk_commands == 0:
+                    output.write(buffer.getvalue())
+                    buffer.seek(0)
+                    buffer.truncate()
+                if not running:
+                    break
+        finally:
+            file_manager.stat_cache = previous_cache
+
+    output.write(buffer.getvalue())
+    output.flush()
+
+    for line_number, text in failed_lines[:10]:
+        print(f"Error on line {line_number}: {text}", file=sys.stderr)
+    if len(failed_lines) > 10:
+        print(f"... and {len(failed_lines) - 10} more", file=sys.stderr)
+    if failed_lines:
+        print(f"{len(failed_lines)} command(s) failed", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_batch_file(path, output=None):
+    """Run a batch file (or stdin when path is "-") and return the exit status."""
+    if path == "-":
+        return run_batch(sys.stdin, output)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return run_batch(f, output)
+    except OSError as e:
+        print(f"Error reading batch file: {e}", file=sys.stderr)
+        return 1
+
+
+def build_parser():
+    """
+    Build the argument parser for one-shot and batch use.
+
+    argparse is imported here rather than at module level, so the
+    interactive program and ``import cli`` do not pay for it.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Python CLI File Manager. Run without arguments for the "
+                    "interactive menu.")
+    parser.add_argument("--batch", metavar="FILE",
+                        help='run commands from FILE ("-" for stdin)')
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    calc = subparsers.add_parser("calc", help="show the size of files")
+    calc.add_argument("files", nargs="+", metavar="FILE",
+                      help="file names or glob patterns")
+    calc.add_argument("--workers", type=int, default=16,
+                      help="concurrent stat calls (default: 16)")
+
+    tree = subparsers.add_parser("tree", help="show a directory tree")
+    tree.add_argument("directory", metavar="DIR")
+    tree.add_argument("--depth", type=int, default=3,
+                      help="maximum depth to show (default: 3)")
+    tree.add_argument("--max-entries", type=int, metavar="N",
+                      help="stop after N entries")
+    tree.add_argument("--json", action="store_true",
+                      help="write one JSON object per entry (NDJSON)")
+    add_exclude_arguments(tree)
+    add_follow_argument(tree)
+
+    find = subparsers.add_parser("find", help="find files by extension")
+    find.add_argument("directory", metavar="DIR")
+    find.add_argument("extensions", nargs="+", metavar="EXT")
+    find.add_argument("--limit", type=int, metavar="N",
+                      help="stop after N matches")
+    find.add_argument("--workers", type=positive_int, metavar="N",
+                      help="list directories with N threads")
+    find.add_argument("--processes", type=positive_int, metavar="N",
+                      help="search subtrees with N processes")
+    find.add_argument("--index", metavar="DB",
+                      help="answer from (and refresh) an SQLite index")
+    find.add_argument("--no-refresh", action="store_false", dest="refresh",
+                      help="query the --index as it is, without refreshing it")
+    find.add_argument("--json", action="store_true",
+                      help="write one JSON object per match (NDJSON)")
+    add_exclude_arguments(find)
+    add_follow_argument(find)
+
+    largest = subparsers.add_parser("largest", help="show the largest files")
+    largest.add_argument("directory", metavar="DIR")
+    largest.add_argument("-n", type=int, default=10, metavar="K", dest="count",
+                         help="number of files to show (default: 10)")
+    largest.add_argument("--ext", nargs="+", metavar="EXT", dest="extensions",
+                         help="only consider files with these extensions")
+    add_follow_argument(largest)
+
+    dupes = subparsers.add_parser("dupes", help="find duplicate files")
+    dupes.add_argument("directory", metavar="DIR")
+    dupes.add_argument("--workers", type=int, default=8,
+                       help="files hashed concurrently (default: 8)")
+    dupes.add_argument("--min-size", type=int, default=1, metavar="BYTES",
+                       help="ignore smaller files (default: 1, skip empty files)")
+
+    checksum = subparsers.add_parser("checksum", help="compute or verify checksums")
+    checksum.add_argument("files", nargs="*", metavar="FILE",
+                          help="file names or glob patterns")
+    checksum.add_argument("--algorithm", choices=("sha256", "blake2b"),
+                          default="sha256", help="hash to use (default: sha256)")
+    checksum.add_argument("--check", metavar="MANIFEST",
+                          help="verify the files listed in a sha256sum-style "
+                               "manifest instead")
+    checksum.add_argument("--workers", type=int, default=8,
+                          help="files hashed concurrently (default: 8)")
+
+    watch = subparsers.add_parser("watch", help="report changes in a directory")
+    watch.add_argument("directory", metavar="DIR")
+    watch.add_argument("--interval", type=float, default=2.0, metavar="SECONDS",
+                       help="time between polls (default: 2)")
+    watch.add_argument("--count", type=int, metavar="N",
+                       help="stop after N polls (default: run until Ctrl+C)")
+    watch.add_argument("--stat-files", action="store_true",
+                       help="also stat files in unchanged directories, to "
+                            "catch files resized in place")
+
+    snapshot = subparsers.add_parser("snapshot",
+                                     help="save a scan of a directory tree")
+    snapshot.add_argument("directory", metavar="DIR")
+    snapshot.add_argument("file", metavar="FILE")
+    add_exclude_arguments(snapshot)
+    add_follow_argument(snapshot)
+
+    diff = subparsers.add_parser("diff", help="compare two snapshots")
+    diff.add_argument("old", metavar="OLD",
+                      help="snapshot file, or a directory to scan now")
+    diff.add_argument("new", metavar="NEW",
+                      help="snapshot file, or a directory to scan now")
+    add_exclude_arguments(diff)
+    add_follow_argument(diff)
+
+    du = subparsers.add_parser("du", help="show a tree with directory sizes")
+    du.add_argument("directory", metavar="DIR")
+    du.add_argument("--depth", type=int, default=3,
+                    help="maximum depth to show (default: 3)")
+    du.add_argument("--max-entries", type=int, metavar="N",
+                    help="stop after N entries")
+    add_exclude_arguments(du)
+    add_follow_argument(du)
+    return parser
+
+
+def positive_int(text):
+    """argparse type for counts of workers: an integer of at least 1."""
+    import argparse
+
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"'{text}' is not a positive integer")
+    return value
+
+
+def add_exclude_arguments(parser):
+    """Add the --exclude and --gitignore options of the walking commands."""
+    parser.add_argument("--exclude", action="append", default=[],
+                        metavar="PATTERN",
+                        help="skip entries matching a gitignore-style pattern "
+                             "(repeatable), e.g. --exclude node_modules/")
+    parser.add_argument("--gitignore", action="store_true",
+                        help="also skip what .gitignore files exclude")
+
+
+def add_follow_argument(parser):
+    """Add the --follow-symlinks option of the walking commands."""
+    parser.add_argument("--follow-symlinks", action="store_true",
+                        help="descend into symlinked directories, each "
+                             "directory once")
+
+
+def report_revisits(stats):
+    """Tell stderr how many directories a symlink-following walk skipped."""
+    if stats is not None and stats.revisits_skipped:
+        print(f"Note: skipped {stats.revisits_skipped} directories already "
+              f"visited through another path.", file=sys.stderr)
+
+
+def exclude_rules(args):
+    """Build ExcludeRules from --exclude/--gitignore, or None if not given."""
+    if not args.exclude and not args.gitignore:
+        return None
+    return ExcludeRules(args.exclude, gitignore=args.gitignore)
+
+
+def run_command_line(argv):
+    """Run a one-shot command (or a batch) from argv; return the exit status."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.batch is not None:
+        return run_batch_file(args.batch)
+    if args.command == "calc":
+        return command_calc(args)
+    if args.command == "tree":
+        return command_tree(args)
+    if args.command == "find":
+        return command_find(args)
+    if args.command == "largest":
+        return command_largest(args)
+    if args.command == "dupes":
+        return command_dupes(args)
+    if args.command == "checksum":
+        return command_checksum(args, parser)
+    if args.command == "watch":
+        return command_watch(args)
+    if args.command == "snapshot":
+        return command_snapshot(args)
+    if args.command == "diff":
+        return command_diff(args)
+    if args.command == "du":
+        return command_du(args)
+    parser.print_usage(sys.stderr)
+    return 2
+
+
+def command_calc(args):
+    """cli.py calc FILE...: exit status 1 if any file could not be sized."""
+    return 0 if get_and_display_file_sizes(args.files, args.workers) else 1
+
+
+def command_tree(args):
+    """cli.py tree DIR: text tree, or NDJSON records with --json."""
+    if not os.path.isdir(args.directory):
+        print(f"Error: '{args.directory}' is not a valid directory.", file=sys.stderr)
+        return 1
+    exclude = exclude_rules(args)
+    if args.json:
+        stats = WalkStats()
+        records = iter_tree_records(args.directory, max_depth=args.depth,
+                                    stats=stats, exclude=exclude,
+                                    follow_symlinks=args.follow_symlinks)
+        if args.max_entries is not None:
+            records = itertools.islice(records, args.max_entries)
+        write_records(records, sys.stdout, stats=stats)
+        report_revisits(stats)
+    else:
+        render_directory_tree(args.directory, sys.stdout, args.depth,
+                              max_entries=args.max_entries, exclude=exclude,
+                              follow_symlinks=args.follow_symlinks)
+    return 0
+
+
+def command_find(args):
+    """cli.py find DIR EXT...: one relative path per line, or NDJSON with --json."""
+    if not os.path.isdir(args.directory):
+        print(f"Error: '{args.directory}' is not a valid directory.", file=sys.stderr)
+        return 1
+
+    exclude = exclude_rules(args)
+    if args.json:
+        stats = WalkStats()
+        records = iter_tree_records(args.directory, extension=args.extensions,
+                                    stats=stats, exclude=exclude,
+                                    follow_symlinks=args.follow_symlinks)
+        if args.limit is not None:
+            records = itertools.islice(records, args.limit)
+        write_records(records, sys.stdout, stats=stats)
+        report_revisits(stats)
+        return 0
+
+    if args.index:
+        import sqlite3
+        from file_index import FileIndex
+
+        if exclude is not None or args.follow_symlinks:
+            print("Error: --exclude, --gitignore and --follow-symlinks cannot be "
+                  "used with --index.", file=sys.stderr)
+            return 1
+
+        try:
+            with FileIndex(args.index, args.directory) as index:
+                if args.refresh:
+                    index.refresh()
+                found_files = index.find_files_by_extension(args.extensions)
+        except (ValueError, sqlite3.Error) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        if args.limit is not None:
+            found_files = found_files[:max(args.limit, 0)]
+    else:
+        found_files = find_files_by_extension(
+            args.directory, args.extensions, limit=args.limit,
+            workers=args.workers, processes=args.processes, exclude=exclude,
+            follow_symlinks=args.follow_symlinks)
+
+    if found_files:
+        write_counted(sys.stdout, "\n".join(found_files) + "\n",
+                      None if args.index else file_manager.last_walk_stats)
+    if not args.index:
+        report_revisits(file_manager.last_walk_stats)
+    return 0
+
+
+def command_largest(args):
+    """cli.py largest DIR [-n K] [--ext EXT...]: the K largest files."""
+    if not os.path.isdir(args.directory):
+        print(f"Error: '{args.directory}' is not a valid directory.", file=sys.stderr)
+        return 1
+    show_largest_files(args.directory, args.count, args.extensions,
+                       args.follow_symlinks)
+    report_revisits(file_manager.last_walk_stats)
+    return 0
+
+
+def command_dupes(args):
+    """cli.py dupes DIR: groups of identical files, exit status 1 for a bad DIR."""
+    if not os.path.isdir(args.directory):
+        print(f"Error: '{args.directory}' is not a valid directory.", file=sys.stderr)
+        return 1
+    display_duplicates([args.directory], args.workers, args.min_size)
+    return 0
+
+
+def command_checksum(args, parser):
+    """cli.py checksum FILE... | --check MANIFEST: exit status 1 on any failure."""
+    if args.check is not None:
+        if args.files:
+            parser.error("checksum: give either FILE... or --check, not both")
+        ok = display_verification(args.check, args.workers)
+    elif args.files:
+        ok = display_checksums(args.files, args.algorithm, args.workers)
+    else:
+        parser.error("checksum: give FILE... or --check MANIFEST")
+    return 0 if ok else 1
+
+
+def command_watch(args):
+    """cli.py watch DIR: print changes until Ctrl+C (or --count polls)."""
+    from file_watch import watch_directory
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: '{args.directory}' is not a valid directory.", file=sys.stderr)
+        return 1
+    try:
+        watch_directory(args.directory, args.interval, args.count, args.stat_files)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def command_snapshot(args):
+    """cli.py snapshot DIR FILE: exit status 1 if it could not be saved."""
+    ok = display_snapshot([args.directory, args.file], exclude_rules(args),
+                          args.follow_symlinks)
+    return 0 if ok else 1
+
+
+def command_diff(args):
+    """
+    cli.py diff OLD NEW: one line per change, exit status 1 on bad input.
+
+    A directory is scanned with the snapshot's own exclude and symlink
+    options, unless --exclude, --gitignore or --follow-symlinks are given.
+    """
+    ok = display_diff([args.old, args.new], exclude_rules(args),
+                      args.follow_symlinks or None)
+    return 0 if ok else 1
+
+
+def command_du(args):
+    """cli.py du DIR: the tree with the total size below each directory."""
+    if not os.path.isdir(args.directory):
+        print(f"Error: '{args.directory}' is not a valid directory.", file=sys.stderr)
+        return 1
+    render_directory_tree(args.directory, sys.stdout, args.depth,
+                          max_entries=args.max_entries, exclude=exclude_rules(args),
+                          follow_symlinks=args.follow_symlinks, sizes=True)
+    report_revisits(file_manager.last_walk_stats)
+    return 0
+
+
+def main(argv=None):
+    """
+    Main program loop.
+
+    With ``argv`` (e.g. ``sys.argv[1:]``) a single command such as
+    ``calc FILE...``, ``tree DIR`` or ``find DIR EXT...``, or a batch via
+    ``--batch FILE``, is run instead and its exit status returned.
+    """
+    if argv:
+        return run_command_line(argv)
+
+    # Display welcome message
+    display_welcome()
+
+    # The commands of a session share one stat cache (see StatCache)
+    previous_cache = file_manager.stat_cache
+    file_manager.stat_cache = StatCache()
+    try:
+        # Main command loop
+        running = True
+        while running:
+            try:
+                choice = get_user_choice()
 
-            # Use the extracted function to process the command
-            # This demonstrates calling a function with keyword arguments
-            running = process_user_command(choice, running)
+                # Use the extracted function to process the command
+                # This demonstrates calling a function with keyword arguments
+                running = process_user_command(choice, running)
 
-        except KeyboardInterrupt:
-            print("\n\nProgram interrupted by user.")
-            print("Thank you for using Python CLI File Manager!")
-            break
-        except EOFError:
-            print("\n\nEnd of input detected.")
-            print("Thank you for using Python CLI File Manager!")
-            break
+            except KeyboardInterrupt:
+                print("\n\nProgram interrupted by user.")
+                print("Thank you for using Python CLI File Manager!")
+                break
+            except EOFError:
+                print("\n\nEnd of input detected.")
+                print("Thank you for using Python CLI File Manager!")
+                break
+    finally:
+        file_manager.stat_cache = previous_cache
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Python CLI File Manager - Stat Cache Module
+Keeps the stat results and directory sizes of one session, so commands run
+one after another over the same files do not stat them again. Uses only
+standard library modules.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class StatCache:
+    """
+    Stat results shared by the operations of one session.
+
+    calc, the tree view and the record walks (find --json, dupes,
+    snapshots) look sizes up here before calling stat, so running them
+    one after another over the same paths stats each file once. Results
+    are keyed by normalized path, as given: "a/b" and "./a/b" share an
+    entry, an absolute spelling of the same file does not.
+
+    A result is used for at most ``ttl`` seconds, which bounds how stale
+    the size of a file written in place can be. Entries also remember the
+    mtime of their parent directory when it was last checked; the walkers
+    stat each directory they list while a cache is installed, calc stats
+    the directories of the files it sizes, and a changed mtime (an entry
+    created, removed or renamed over, as editors save files) invalidates
+    the entries stored before the change. At most
+    ``max_entries`` results are kept, the least recently used going
+    first. Lookups may come from several threads at once.
+
+    The cache also memoizes what directory_sizes() found in each
+    directory it listed (the bytes and number of files directly inside
+    it, and its subdirectories), keyed on the directory's mtime, so sizing
+    a tree again only lists the directories that changed. These results
+    expire after ``ttl`` seconds as well.
+    """
+
+    def __init__(self, max_entries=50_000, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.directory_hits = 0
+        # path -> (stat result, expiry time, parent key, parent mtime_ns)
+        self._entries = OrderedDict()
+        # directory -> (mtime_ns, expiry time, bytes, files, subdirectory names)
+        self._contents = OrderedDict()
+        # directory -> mtime_ns when a walker last listed it
+        self._directories = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path):
+        """Return the cached stat result of a path, or None on a miss."""
+        key = os.path.normpath(path)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                st, expires, parent, parent_mtime = cached
+                if (time.monotonic() < expires and (
+                        parent_mtime is None
+                        or self._directories.get(parent) == parent_mtime)):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return st
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+            return None
+
+    def put(self, path, st):
+        """Store a path's stat result (following symlinks)."""
+        key = os.path.normpath(path)
+        parent = os.path.dirname(key) or os.curdir
+        with self._lock:
+            self._entries[key] = (st, time.monotonic() + self.ttl, parent,
+                                  self._directories.get(parent))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_contents(self, path, mtime_ns):
+        """
+        Return the memoized (bytes, files, subdirectory names) of a directory.
+
+        Returns None on a miss, or if the directory's mtime is no longer
+        ``mtime_ns``.
+        """
+        key = os.path.normpath(path)
+        with self._lock:
+            cached = self._contents.get(key)
+            if (cached is not None and cached[0] == mtime_ns
+                    and time.monotonic() < cached[1]):
+                self._contents.move_to_end(key)
+                self.directory_hits += 1
+                return cached[2:]
+            return None
+
+    def put_contents(self, path, mtime_ns, size, files, subdirectories):
+        """Memoize what directory_sizes() found directly inside a directory."""
+        key = os.path.normpath(path)
+        with self._lock:
+            self._contents[key] = (mtime_ns, time.monotonic() + self.ttl,
+                                   size, files, tuple(subdirectories))
+            self._contents.move_to_end(key)
+            while len(self._contents) > self.max_entries:
+                self._contents.popitem(last=False)
+                self.evictions += 1
+
+    def note_directory(self, path, mtime_ns):
+        """Record a directory's current mtime, or None if it cannot be stat'ed."""
+        key = os.path.normpath(path)
+        with self._lock:
+            self._directories.pop(key, None)
+            self._directories[key] = mtime_ns
+            if len(self._directories) > self.max_entries:
+                del self._directories[next(iter(self._directories))]
+
+    def clear(self):
+        """Drop every cached result and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._directories.clear()
+            self._contents.clear()
+            self.hits = self.misses = self.expired = self.evictions = 0
+            self.directory_hits = 0
+
+    def summary_lines(self):
+        """Describe the cache as lines of text for the CLI."""
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return [f"Entries:         {len(self._entries)} of {self.max_entries}",
+                f"Time to live:    {self.ttl:g} s",
+                f"Hits:            {self.hits} ({rate:.1f}%)",
+                f"Misses:          {self.misses}",
+                f"Expired:         {self.expired}",
+                f"Evicted:         {self.evictions}",
+                f"Directory sizes: {len(self._contents)} memoized, "
+                f"{self.directory_hits} reused"]
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Python CLI File Manager - Exclude Rules Module
+Compiles gitignore-style exclude patterns, from the command line and from
+.gitignore files, into the checks the tree walkers apply before listing a
+directory. Uses only standard library modules.
+"""
+
+import bisect
+import os
+import re
+from operator import attrgetter
+
+
+class ExcludeRules:
+    """
+    Gitignore-style exclude patterns, compiled once for a walk.
+
+    ``patterns`` use .gitignore syntax: "*", "?" and "[...]" do not match
+    "/", "**" spans directories, a trailing "/" matches directories only,
+    a pattern containing another "/" is anchored to the walk root, and
+    "!" re-includes what an earlier pattern excluded (the last matching
+    pattern wins). With ``gitignore=True`` the .gitignore file of every
+    directory walked is honored as well, for that directory's subtree,
+    with deeper files taking precedence.
+
+    The walkers check entries before descending, so an excluded directory
+    is never listed. Plain names such as "node_modules" or ".git/" are
+    looked up in a set; other patterns are merged into one regular
+    expression per file unless "!" patterns need them evaluated in order.
+    """
+
+    def __init__(self, patterns=(), gitignore=False):
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        self.patterns = list(patterns)
+        self.gitignore = gitignore
+        self._compiled = _PatternList(self.patterns) if self.patterns else None
+        # (length of the base directory prefix, patterns) per rule source,
+        # outermost first; set by rooted() and enter()
+        self._layers = None
+
+    def rooted(self, directory):
+        """Return these rules bound to a walk starting at ``directory``."""
+        if self._layers is not None:
+            return self
+        rules = self._with_layers(())
+        if self._compiled is not None:
+            rules._layers = ((_base_length(directory), self._compiled),)
+        return rules
+
+    def enter(self, directory, items):
+        """
+        Return the rules for the entries of a listed directory.
+
+        With gitignore enabled and a .gitignore among ``items`` (sorted by
+        name, as scan_directory returns them), its patterns are added.
+        """
+        if not self.gitignore:
+            return self
+        index = bisect.bisect_left(items, ".gitignore", key=attrgetter("name"))
+        if index == len(items) or items[index].name != ".gitignore":
+            return self
+        try:
+            with open(items[index].path, encoding="utf-8",
+                      errors="surrogateescape") as f:
+                patterns = _PatternList(f.read().splitlines())
+        except OSError:
+            return self
+        return self._with_layers(
+            self._layers + ((_base_length(directory), patterns),))
+
+    def excluded(self, path, name, is_dir):
+        """Check an entry by its full path (as built by the walk) and name."""
+        for base_length, patterns in reversed(self._layers):
+            decision = patterns.decide(path, base_length, name, is_dir)
+            if decision is not None:
+                return decision
+        return False
+
+    def filter(self, directory, items):
+        """Return (rules for the entries, the entries not excluded)."""
+        rules = self.enter(directory, items)
+        if not rules._layers:
+            return rules, items
+        return rules, [item for item in items
+                       if not rules.excluded(item.path, item.name,
+                                             _entry_is_dir(item))]
+
+    def _with_layers(self, layers):
+        rules = ExcludeRules.__new__(ExcludeRules)
+        rules.patterns = self.patterns
+        rules.gitignore = self.gitignore
+        rules._compiled = self._compiled
+        rules._layers = layers
+        return rules
+
+
+def _base_length(directory):
+    """Length of the prefix to strip from a walk path to make it relative."""
+    return len(os.path.join(directory, ""))
+
+
+def _entry_is_dir(entry):
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+class _PatternList:
+    """The compiled patterns of one source (command line or .gitignore)."""
+
+    def __init__(self, lines):
+        rules = []
+        for line in lines:
+            rule = _parse_gitignore_line(line)
+            if rule is not None:
+                rules.append(rule)
+
+        self._ordered = None
+        if any(negate for negate, _, _, _ in rules):
+            # Last match wins, so check the rules from the end
+            self._ordered = [(re.compile(source), negate, dir_only)
+                             for negate, dir_only, source, _ in reversed(rules)]
+            return
+        self._names = {name for _, dir_only, _, name in rules
+                       if name is not None and not dir_only}
+        self._dir_names = {name for _, dir_only, _, name in rules
+                           if name is not None and dir_only}
+        self._any = _combine([source for _, dir_only, source, name in rules
+                              if name is None and not dir_only])
+        self._dirs = _combine([source for _, dir_only, source, name in rules
+                               if name is None and dir_only])
+
+    def decide(self, path, base_length, name, is_dir):
+        """True to exclude, False to re-include, None if no pattern matches."""
+        if self._ordered is None:
+            if name in self._names or (is_dir and name in self._dir_names):
+                return True
+            if self._any is None and (self._dirs is None or not is_dir):
+                return None
+            relative = _relative_pattern_path(path, base_length)
+            if self._any is not None and self._any.fullmatch(relative):
+                return True
+            if is_dir and self._dirs is not None and self._dirs.fullmatch(relative):
+                return True
+            return None
+
+        relative = _relative_pattern_path(path, base_length)
+        for regex, negate, dir_only in self._ordered:
+            if (is_dir or not dir_only) and regex.fullmatch(relative):
+                return not negate
+        return None
+
+
+def _relative_pattern_path(path, base_length):
+    relative = path[base_length:]
+    return relative if os.sep == "/" else relative.replace(os.sep, "/")
+
+
+def _combine(sources):
+    if not sources:
+        return None
+    return re.compile("|".join(f"(?:{source})" for source in sources))
+
+
+def _parse_gitignore_line(line):
+    """
+    Parse one .gitignore line into (negate, dir_only, regex source, name).
+
+    ``name`` is set for plain unanchored names, which are matched by set
+    lookup instead of the regex. Returns None for blank and comment lines.
+    """
+    if line.endswith("\r"):
+        line = line[:-1]
+    # Trailing spaces are ignored unless escaped with a backslash
+    stripped = line.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(line):
+        stripped += " "
+    line = stripped
+    if not line or line.startswith("#"):
+        return None
+
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith(("\\#", "\\!")):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+
+    anchored = "/" in line
+    line = line.lstrip("/")
+    if not anchored and not any(char in line for char in "*?[\\"):
+        # The source is used when "!" rules force the ordered regexes
+        return negate, dir_only, "(?:.*/)?" + re.escape(line), line
+
+    source = _translate_gitignore_pattern(line)
+    if not anchored:
+        source = "(?:.*/)?" + source
+    return negate, dir_only, source, None
+
+
+def _translate_gitignore_pattern(pattern):
+    """Translate a gitignore glob into a regular expression source."""
+    out = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        char = pattern[i]
+        at_segment_start = i == 0 or pattern[i - 1] == "/"
+        if pattern.startswith("**", i) and at_segment_start:
+            if i + 2 == n:
+                out.append(".*")  # "dir/**": everything inside
+                i += 2
+                continue
+            if pattern[i + 2] == "/":
+                out.append("(?:.*/)?")  # "**/": any number of directories
+                i += 3
+                continue
+        if char == "*":
+            out.append("[^/]*")
+            while i + 1 < n and pattern[i + 1] == "*":
+                i += 1
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            start = i + 1
+            if pattern[start:start + 1] in ("!", "^"):
+                start += 1
+            if pattern[start:start + 1] == "]":
+                start += 1  # A leading "]" is part of the set
+            end = pattern.find("]", start)
+            if end < 0:
+                out.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                body = body.replace("\\", "\\\\").replace("[", "\\[")
+                out.append("[" + body + "]")
+                i = end
+        elif char == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return "".join(out)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Python CLI File Manager - Content Hashing Module
+Hashes file contents to find duplicate files and to compute and verify
+checksums. Uses only standard library modules.
+"""
+
+import hashlib
+import mmap
+import os
+import sys
+import time
+
+from file_manager import FILE_ENTRY, WalkStats, iter_tree_entries
+
+
+# Bytes read from each end of a file for the partial hash
+PARTIAL_BLOCK_SIZE = 4096
+# Buffer size for chunked reads; larger files are hashed through mmap
+CHUNK_SIZE = 1024 * 1024
+# Hash used to compare file contents
+DUPLICATE_HASH = "blake2b"
+# Algorithms the checksum command offers, by the hex digest length that
+# identifies them in a manifest
+CHECKSUM_ALGORITHMS = {64: "sha256", 128: "blake2b"}
+
+
+def hash_file(path, algorithm=DUPLICATE_HASH, chunk_size=CHUNK_SIZE):
+    """
+    Return the hex digest of a file's contents.
+
+    Files up to ``chunk_size`` bytes are read into one reusable buffer;
+    larger files are mapped with mmap and hashed in place, so no copy of
+    the data is made. hashlib releases the GIL while hashing, which lets
+    several threads hash files at once. Raises OSError if the file
+    cannot be read.
+    """
+    return _hash_file(path, algorithm, chunk_size)[0]
+
+
+def _hash_file(path, algorithm, chunk_size):
+    """hash_file, also returning the number of bytes hashed."""
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > chunk_size:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+                return digest.hexdigest(), size
+            except (OSError, ValueError):
+                f.seek(0)  # Not mappable (e.g. a pipe): fall back to reads
+
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        size = 0
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+            size += count
+    return digest.hexdigest(), size
+
+
+def partial_hash(path, size, algorithm=DUPLICATE_HASH,
+                 block_size=PARTIAL_BLOCK_SIZE):
+    """
+    Return a digest of the first and last ``block_size`` bytes of a file.
+
+    Files of the same size that differ at either end (the common case:
+    headers, trailers, appended data) are told apart with two small reads.
+    For files of at most two blocks this covers the whole content.
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        if size <= 2 * block_size:
+            digest.update(f.read())
+        else:
+            digest.update(f.read(block_size))
+            f.seek(-block_size, os.SEEK_END)
+            digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+def find_duplicate_files(directory, workers=8, min_size=1, extension=None,
+                         stats=None):
+    """
+    Find groups of files with identical contents below ``directory``.
+
+    The tree is walked once (with iter_tree_entries, the walker behind the
+    structured find output) and files are grouped by size; sizes held by a
+    single file are dropped without reading anything. The remaining
+    candidates are split by a partial hash of their first and last blocks,
+    and only files that still collide are hashed in full. Hashing runs on
+    a pool of ``workers`` threads. Files smaller than ``min_size`` bytes
+    (by default empty files) are ignored, and ``extension`` restricts the
+    search as in find_files_by_extension. Symlinks to files are skipped,
+    and hard links to a file already seen are counted once, so every
+    file of a group is a separate copy that could be deleted.
+
+    Returns a list of (size, paths) pairs, with paths relative to
+    ``directory`` in walk order, largest files first. Files that cannot
+    be read are skipped and counted as errors in ``stats``, whose wall
+    time covers the walk and the hashing.
+    """
+    if stats is None:
+        stats = WalkStats()
+    by_size = {}
+    inodes = set()
+    entries = iter_tree_entries(directory, extension=extension, stats=stats)
+    for item, path, kind, _, st in entries:
+        if (kind != FILE_ENTRY or st is None or st.st_size < min_size
+                or item.is_symlink()):
+            continue
+        inode = (st.st_dev, st.st_ino)
+        if inode in inodes:
+            continue
+        inodes.add(inode)
+        by_size.setdefault(st.st_size, []).append(path)
+
+    stats.operation = f"dupes {directory}"
+
+    groups = [(size, paths) for size, paths in by_size.items() if len(paths) > 1]
+    if not groups:
+        return []
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        groups = _split_groups(groups, directory, pool, stats, partial=True)
+        # Up to two blocks the partial hash already covered every byte
+        small = [group for group in groups if group[0] <= 2 * PARTIAL_BLOCK_SIZE]
+        large = [group for group in groups if group[0] > 2 * PARTIAL_BLOCK_SIZE]
+        groups = small + _split_groups(large, directory, pool, stats, partial=False)
+    stats.wall_time += time.perf_counter() - started
+
+    groups.sort(key=_duplicate_group_key)
+    return groups
+
+
+def _duplicate_group_key(group):
+    size, paths = group
+    return -size, paths[0].split(os.sep)
+
+
+def _split_groups(groups, directory, pool, stats, partial):
+    """Split same-size groups by content hash, keeping groups of two or more."""
+    jobs = [(os.path.join(directory, path), size, partial)
+            for size, paths in groups for path in paths]
+    digests = iter(pool.map(_hash_job, jobs))
+
+    split = []
+    for size, paths in groups:
+        by_digest = {}
+        for path in paths:
+            digest = next(digests)
+            if digest is None:
+                stats.errors += 1
+                continue
+            by_digest.setdefault(digest, []).append(path)
+        split.extend((size, same) for same in by_digest.values() if len(same) > 1)
+    return split
+
+
+def _hash_job(job):
+    """Hash one file for _split_groups; None if it cannot be read."""
+    path, size, partial = job
+    try:
+        if partial:
+            return partial_hash(path, size)
+        return hash_file(path)
+    except OSError:
+        return None
+
+
+def checksum_files(filenames, algorithm="sha256", workers=8):
+    """
+    Compute the checksums of many files on a pool of ``workers`` threads.
+
+    A single file is hashed sequentially (the algorithms are serial), so
+    the parallelism is across files; hashlib releases the GIL, which lets
+    the threads use several cores. Returns one (digest, bytes hashed,
+    error message) tuple per file, in input order; digest and size are
+    None when the file could not be read.
+    """
+    hashlib.new(algorithm)  # Fail early, with ValueError, on unknown names
+    return _run_checksum_jobs([(filename, algorithm) for filename in filenames],
+                              workers)
+
+
+def _run_checksum_jobs(jobs, workers):
+    """Run _checksum_job over (filename, algorithm) jobs, in order."""
+    if len(jobs) <= 1 or workers <= 1:
+        return [_checksum_job(job) for job in jobs]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(_checksum_job, jobs))
+
+
+def _checksum_job(job):
+    """Hash one file for checksum_files."""
+    filename, algorithm = job
+    try:
+        if os.path.isdir(filename):
+            return None, None, f"Error: '{filename}' is not a regular file."
+        digest, size = _hash_file(filename, algorithm, CHUNK_SIZE)
+    except FileNotFoundError:
+        return None, None, f"Error: File '{filename}' not found."
+    except OSError as e:
+        return None, None, f"Error reading file: {e}"
+    return digest, size, None
+
+
+def read_manifest(path):
+    """
+    Read a checksum manifest in the "DIGEST  FILENAME" format of sha256sum.
+
+    The algorithm of each line is told from the length of its digest (see
+    CHECKSUM_ALGORITHMS). ``path`` may be "-" for stdin. Returns (entries,
+    bad line count), with entries as (filename, algorithm, digest) tuples.
+    Raises OSError if the manifest cannot be read.
+    """
+    if path == "-":
+        return _parse_manifest(sys.stdin)
+    with open(path, encoding="utf-8") as f:
+        return _parse_manifest(f)
+
+
+def _parse_manifest(lines):
+    """Parse manifest lines for read_manifest."""
+    entries = []
+    bad_lines = 0
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip() or line.startswith("#"):
+            continue
+        digest, _, filename = line.partition(" ")
+        # "DIGEST  name" for text mode, "DIGEST *name" for binary mode
+        if filename[:1] in (" ", "*"):
+            filename = filename[1:]
+        algorithm = CHECKSUM_ALGORITHMS.get(len(digest))
+        if algorithm is None or not filename or not _is_hex(digest):
+            bad_lines += 1
+            continue
+        entries.append((filename, algorithm, digest.lower()))
+    return entries, bad_lines
+
+
+def _is_hex(text):
+    return not text.strip("0123456789abcdefABCDEF")
+
+
+def verify_manifest(path, workers=8):
+    """
+    Check the files listed in a manifest against their recorded digests.
+
+    File names are taken as written, relative to the current directory,
+    as sha256sum -c does. Returns (results, bad line count), with results
+    as (filename, status, bytes hashed) tuples in manifest order and
+    status one of "OK", "FAILED" and "FAILED open or read".
+    """
+    entries, bad_lines = read_manifest(path)
+    hashed = _run_checksum_jobs(
+        [(filename, algorithm) for filename, algorithm, _ in entries], workers)
+
+    results = []
+    for (filename, _, expected), (digest, size, error) in zip(entries, hashed):
+        if error:
+            status = "FAILED open or read"
+        elif digest == expected:
+            status = "OK"
+        else:
+            status = "FAILED"
+        results.append((filename, status, size))
+    return results, bad_lines
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Python CLI File Manager - Metadata Index Module
+Keeps a persistent SQLite index of a directory tree (path, size, mtime,
+extension) so repeated extension searches do not re-walk the disk.
+Uses only standard library modules.
+"""
+
+import os
+import sqlite3
+
+from file_manager import (DIR_ENTRY, FILE_ENTRY, ExtensionMatcher, entry_kind,
+                          scan_directory)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    extension TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_extension ON files (extension);
+CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+"""
+
+
+def _last_suffix(name):
+    """
+    Return the lowered text from the last "." of a file name, or "".
+
+    Any dotted extension a name ends with ends in this suffix, which is
+    what lets extension queries use the index (dotfiles included).
+    """
+    dot = name.rfind(".")
+    return name[dot:].lower() if dot >= 0 else ""
+
+
+def _walk_order_key(path):
+    """Sort key that reproduces find_files_by_extension's walk order."""
+    return path.split(os.sep)
+
+
+class FileIndex:
+    """
+    Persistent metadata index of one directory tree.
+
+    Call refresh() to bring the index up to date and find_files_by_extension()
+    to query it. A refresh stats every indexed directory but only re-lists
+    those whose mtime changed since the last scan; files themselves are not
+    re-stated, so sizes of files modified in place are only picked up when
+    their directory changes.
+    """
+
+    def __init__(self, db_path, root):
+        self.root = os.path.abspath(root)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(SCHEMA)
+
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'root'").fetchone()
+        if row is None:
+            with self.connection:
+                self.connection.execute(
+                    "INSERT INTO meta (key, value) VALUES ('root', ?)", (self.root,))
+        elif row[0] != self.root:
+            self.connection.close()
+            raise ValueError(f"Index '{db_path}' belongs to '{row[0]}', "
+                             f"not '{self.root}'")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def refresh(self, stats=None):
+        """
+        Bring the index up to date with the tree on disk.
+
+        Returns the number of directories that were re-listed. Directories
+        that disappeared are removed together with everything below them.
+        """
+        if not os.path.isdir(self.root):
+            raise NotADirectoryError(f"'{self.root}' is not a valid directory")
+
+        known = dict(self.connection.execute(
+            "SELECT path, mtime_ns FROM directories"))
+        relisted = 0
+
+        with self.connection:
+            stack = [""]
+            while stack:
+                relative = stack.pop()
+                path = os.path.join(self.root, relative) if relative else self.root
+                try:
+                    if stats is not None:
+                        stats.stat_calls += 1
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    self._forget_directory(relative)
+                    continue
+
+                if known.get(relative) == mtime_ns:
+                    # Unchanged listing: descend into the subdirectories we know
+                    stack.extend(row[0] for row in self.connection.execute(
+                        "SELECT path FROM directories WHERE parent = ?", (relative,)))
+                    continue
+
+                relisted += 1
+                stack.extend(self._relist_directory(relative, path, mtime_ns,
+                                                    stats))
+
+        return relisted
+
+    def _relist_directory(self, relative, path, mtime_ns, stats):
+        """Replace one directory's rows with a fresh listing; return its subdirectories."""
+        try:
+            items = scan_directory(path, stats)
+        except (OSError, PermissionError):
+            self._forget_directory(relative)
+            return []
+
+        files = []
+        subdirs = []
+        for item in items:
+            item_relative = os.path.join(relative, item.name) if relative else item.name
+            kind = entry_kind(item, stats)
+            if kind == FILE_ENTRY:
+                try:
+                    if stats is not None:
+                        stats.stat_calls += 1
+                    st = item.stat()
+                except OSError:
+                    continue
+                files.append((item_relative, relative, st.st_size,
+                              st.st_mtime_ns, _last_suffix(item.name)))
+            elif kind == DIR_ENTRY:
+                subdirs.append(item_relative)
+
+        old_subdirs = {row[0] for row in self.connection.execute(
+            "SELECT path FROM directories WHERE parent = ?", (relative,))}
+        for gone in old_subdirs.difference(subdirs):
+            self._forget_directory(gone)
+
+        self.connection.execute("DELETE FROM files WHERE directory = ?", (relative,))
+        self.connection.executemany(
+            "INSERT INTO files (path, directory, size, mtime_ns, extension) "
+            "VALUES (?, ?, ?, ?, ?)", files)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO directories (path, parent, mtime_ns) "
+            "VALUES (?, ?, ?)",
+            (relative, None if relative == "" else os.path.dirname(relative),
+             mtime_ns))
+        return subdirs
+
+    def _forget_directory(self, relative):
+        """Remove a directory and everything indexed below it."""
+        if relative == "":
+            self.connection.execute("DELETE FROM files")
+            self.connection.execute("DELETE FROM directories")
+            return
+        # substr() rather than LIKE: LIKE is case-insensitive and would also
+        # match sibling directories that differ only in case
+        prefix = relative + os.sep
+        for table, column in (("files", "directory"), ("directories", "path")):
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE {column} = ? "
+                f"OR substr({column}, 1, ?) = ?", (relative, len(prefix), prefix))
+
+    def find_files_by_extension(self, extension, current_path=""):
+        """
+        Answer find_files_by_extension from the index.
+
+        Returns the same relative paths in the same order as
+        file_manager.find_files_by_extension would for the indexed tree;
+        ``extension`` may likewise be one extension or several. Dotted
+        extensions are looked up through the extension index; others fall
+        back to scanning the file names in the index.
+        """
+        matcher = ExtensionMatcher(extension)
+        if all(ext.startswith(".") for ext in matcher.extensions):
+            suffixes = sorted({"." + ext.rsplit(".", 1)[1]
+                               for ext in matcher.extensions})
+            placeholders = ", ".join("?" * len(suffixes))
+            rows = self.connection.execute(
+                f"SELECT path FROM files WHERE extension IN ({placeholders})",
+                suffixes)
+        else:
+            rows = self.connection.execute("SELECT path FROM files")
+
+        found_files = [path for (path,) in rows
+                       if matcher.match(os.path.basename(path)) is not None]
+        found_files.sort(key=_walk_order_key)
+        if current_path:
+            found_files = [os.path.join(current_path, path) for path in found_files]
+        return found_files
+
+    def file_count(self):
+        """Return the number of files in the index."""
+        return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
@@ -6,7 +6,380 @@ file operations, size calculations, and file system interactions.
 Uses only standard library modules.
 """
 
+import bisect
+import itertools
 import os
+import stat
+import sys
+import time
+
+from file_exclude import ExcludeRules
+
+
+# Size units used by format_file_size / format_file_sizes, and the size
+# in bytes of each unit
+BINARY_UNITS = ('bytes', 'KiB', 'MiB', 'GiB', 'TiB', 'PiB')
+BINARY_STEPS = tuple(1024 ** power for power in range(len(BINARY_UNITS)))
+DECIMAL_UNITS = ('bytes', 'KB', 'MB', 'GB', 'TB', 'PB')
+DECIMAL_STEPS = tuple(1000 ** power for power in range(len(DECIMAL_UNITS)))
+
+# Entry kinds reported by entry_kind()
+FILE_ENTRY = "file"
+DIR_ENTRY = "dir"
+LINK_ENTRY = "link"  # A symlink to a directory that is not followed
+
+
+class WalkStats:
+    """
+    Instrumentation counters for a directory walk.
+
+    Pass an instance as ``stats=`` to the walkers; every directory listing
+    and every stat the walk issues is counted, so the cost of a walk can be
+    checked against the number of entries it visited. Besides the syscall
+    counters it records the directories listed and files seen, the errors
+    the walk skipped over, the directories skipped because a symlink led
+    back to one already walked, the bytes of output written, and the wall
+    time spent listing, stat-ing and writing output (all in seconds).
+
+    The walkers also publish the counters of the most recent top-level
+    operation as ``last_walk_stats``, which is what the CLI's ``stats``
+    command shows.
+    """
+
+    def __init__(self, operation=None):
+        self.operation = operation
+        self.scandir_calls = 0
+        self.stat_calls = 0
+        self.directories = 0
+        self.files = 0
+        self.errors = 0
+        self.revisits_skipped = 0
+        self.output_bytes = 0
+        self.list_time = 0.0
+        self.stat_time = 0.0
+        self.output_time = 0.0
+        self.wall_time = 0.0
+        self._started = None
+
+    def add(self, other):
+        """Add the counters of another WalkStats into this one."""
+        self.scandir_calls += other.scandir_calls
+        self.stat_calls += other.stat_calls
+        self.directories += other.directories
+        self.files += other.files
+        self.errors += other.errors
+        self.revisits_skipped += other.revisits_skipped
+        self.output_bytes += other.output_bytes
+        self.list_time += other.list_time
+        self.stat_time += other.stat_time
+        self.output_time += other.output_time
+
+    def start(self, operation):
+        """Mark the start of a top-level operation and publish these stats."""
+        global last_walk_stats
+        self.operation = operation
+        self._started = time.perf_counter()
+        last_walk_stats = self
+        return self
+
+    def finish(self):
+        """Add the wall time since start() to ``wall_time``."""
+        if self._started is not None:
+            self.wall_time += time.perf_counter() - self._started
+            self._started = None
+
+    @property
+    def syscalls(self):
+        """Total number of listing and stat calls issued."""
+        return self.scandir_calls + self.stat_calls
+
+    def summary_lines(self):
+        """The lines the CLI's stats command prints for these counters."""
+        return [f"Operation:       {self.operation or '(unknown)'}",
+                f"Directories:     {self.directories}",
+                f"Files:           {self.files}",
+                f"Syscalls:        {self.syscalls} ({self.scandir_calls} scandir, "
+                f"{self.stat_calls} stat)",
+                f"Errors skipped:  {self.errors}",
+                f"Revisits skipped: {self.revisits_skipped}",
+                f"Output:          {format_file_size(self.output_bytes)}",
+                f"Wall time:       {self.wall_time:.4f} s",
+                f"  listing:       {self.list_time:.4f} s",
+                f"  stat:          {self.stat_time:.4f} s",
+                f"  output:        {self.output_time:.4f} s"]
+
+    def __repr__(self):
+        return (f"WalkStats(scandir_calls={self.scandir_calls}, "
+                f"stat_calls={self.stat_calls}, directories={self.directories}, "
+                f"files={self.files}, errors={self.errors}, "
+                f"output_bytes={self.output_bytes})")
+
+
+# Counters of the most recent top-level walk (see WalkStats.start)
+last_walk_stats = None
+
+
+def _start_walk(stats, operation):
+    """Return ``stats`` (or a new WalkStats) started for a top-level operation."""
+    return (stats if stats is not None else WalkStats()).start(operation)
+
+
+def _count_error(stats):
+    """Count an error a walker skipped over."""
+    if stats is not None:
+        stats.errors += 1
+
+
+# The StatCache (see file_cache) of the current session, or None (one-shot
+# commands) to always stat. Installed by the interactive menu and batch runs.
+stat_cache = None
+
+
+def _cached_stat(path, stats, stat_call):
+    """
+    Return a stat result through stat_cache, calling ``stat_call`` on a miss.
+
+    Only real stat calls are counted (and timed) in ``stats``. Raises
+    OSError from ``stat_call``.
+    """
+    cache = stat_cache
+    st = cache.get(path) if cache is not None else None
+    if st is None:
+        if stats is not None:
+            stats.stat_calls += 1
+            started = time.perf_counter()
+        try:
+            st = stat_call()
+        finally:
+            if stats is not None:
+                stats.stat_time += time.perf_counter() - started
+        if cache is not None:
+            cache.put(path, st)
+    return st
+
+
+class ExtensionMatcher:
+    """
+    Case-insensitive filename matcher for one or more extensions.
+
+    The extensions are lowered once up front. Dotted extensions (".py",
+    ".tar.gz") go into a set, and a name is checked by looking up its
+    suffixes, taken from its last few dots, in that set, so the cost per
+    name does not grow with the number of extensions. Extensions without
+    a leading dot keep plain str.endswith semantics.
+    """
+
+    def __init__(self, extensions):
+        if isinstance(extensions, str):
+            extensions = [extensions]
+        # Lowered, de-duplicated, in the order given
+        self.extensions = list(dict.fromkeys(ext.lower() for ext in extensions))
+        self._suffixes = {ext for ext in self.extensions if ext.startswith(".")}
+        self._max_dots = max((ext.count(".") for ext in self._suffixes), default=0)
+        # Longest first, so the most specific extension is reported
+        self._plain = tuple(sorted(
+            (ext for ext in self.extensions if not ext.startswith(".")),
+            key=len, reverse=True))
+
+    def match(self, name):
+        """Return the extension ``name`` matches (longest first), or None."""
+        lowered = name.lower()
+        if self._suffixes:
+            dots = []
+            end = len(lowered)
+            for _ in range(self._max_dots):
+                end = lowered.rfind(".", 0, end)
+                if end < 0:
+                    break
+                dots.append(end)
+            for dot in reversed(dots):
+                if lowered[dot:] in self._suffixes:
+                    return lowered[dot:]
+        for ext in self._plain:
+            if lowered.endswith(ext):
+                return ext
+        return None
+
+
+def _entry_name(entry):
+    return entry.name
+
+
+def _exclude_rules(exclude, directory):
+    """Turn a walker's ``exclude`` argument into rooted ExcludeRules or None."""
+    if exclude is None:
+        return None
+    if not isinstance(exclude, ExcludeRules):
+        exclude = ExcludeRules(exclude)
+    return exclude.rooted(directory)
+
+
+def _filter_excluded(directory, items, rules):
+    """Apply exclude rules (if any) to a directory listing."""
+    if rules is None:
+        return None, items
+    return rules.filter(directory, items)
+
+
+def scan_directory(directory, stats=None):
+    """
+    List a directory with a single os.scandir call.
+
+    Returns the DirEntry objects sorted by name. Each DirEntry carries the
+    file type reported by the listing and caches its stat result, which is
+    what lets the walkers avoid separate isfile/isdir/getsize calls.
+    Raises OSError if the directory cannot be listed.
+    """
+    cache = stat_cache
+    if cache is not None:
+        _note_directory(cache, directory, stats)
+    return _list_directory(directory, stats)
+
+
+def _list_directory(directory, stats):
+    """scan_directory without telling the stat cache about the directory."""
+    if stats is None:
+        with os.scandir(directory) as it:
+            entries = list(it)
+        entries.sort(key=_entry_name)
+        return entries
+
+    stats.scandir_calls += 1
+    started = time.perf_counter()
+    with os.scandir(directory) as it:
+        entries = list(it)
+    stats.list_time += time.perf_counter() - started
+    stats.directories += 1
+    entries.sort(key=_entry_name)
+    return entries
+
+
+def _note_directory(cache, directory, stats):
+    """
+    Give a StatCache the mtime of a directory about to be listed.
+
+    Returns the mtime (in ns), or None if the directory cannot be stat'ed.
+    """
+    if stats is not None:
+        stats.stat_calls += 1
+    try:
+        mtime_ns = os.stat(directory).st_mtime_ns
+    except OSError:
+        mtime_ns = None  # Listing the directory reports the error
+    cache.note_directory(directory, mtime_ns)
+    return mtime_ns
+
+
+def entry_kind(entry, stats=None, follow_symlinks=False):
+    """
+    Return FILE_ENTRY, DIR_ENTRY, LINK_ENTRY or None for a DirEntry.
+
+    Symlinks to files are followed, like os.path.isfile. A symlink to a
+    directory is reported as LINK_ENTRY, so walkers do not descend into
+    it, unless ``follow_symlinks`` is set. Symlinks are the only case
+    where the check costs a stat, since the listing already holds the type.
+    """
+    try:
+        if entry.is_symlink():
+            if stats is not None:
+                stats.stat_calls += 1
+            if entry.is_dir():
+                return DIR_ENTRY if follow_symlinks else LINK_ENTRY
+        if entry.is_file():
+            if stats is not None:
+                stats.files += 1
+            return FILE_ENTRY
+        if entry.is_dir():
+            return DIR_ENTRY
+    except OSError:
+        pass
+    return None
+
+
+def entry_size(entry, stats=None, use_cache=True):
+    """
+    Return the size of a DirEntry from its (cached) stat result.
+
+    The session's stat_cache is consulted unless ``use_cache`` is False.
+    """
+    if use_cache and stat_cache is not None:
+        return _cached_stat(entry.path, stats, entry.stat).st_size
+    if stats is None:
+        return entry.stat().st_size
+    stats.stat_calls += 1
+    started = time.perf_counter()
+    try:
+        return entry.stat().st_size
+    finally:
+        stats.stat_time += time.perf_counter() - started
+
+
+def _is_directory(directory, entry, stats):
+    """Check for a directory, reusing a DirEntry's listing type if given."""
+    if entry is not None:
+        return entry_kind(entry, stats, follow_symlinks=True) == DIR_ENTRY
+    if stats is not None:
+        stats.stat_calls += 1
+    return os.path.isdir(directory)
+
+
+def _visited_directories(directory, follow_symlinks, stats):
+    """
+    Start the set of visited (st_dev, st_ino) pairs for a walk.
+
+    Returns None when symlinks are not followed: without them a walk
+    cannot reach a directory twice, so nothing needs tracking.
+    """
+    if not follow_symlinks:
+        return None
+    visited = set()
+    try:
+        if stats is not None:
+            stats.stat_calls += 1
+        st = os.stat(directory)
+        visited.add((st.st_dev, st.st_ino))
+    except OSError:
+        pass
+    return visited
+
+
+def _directory_key(entry, stats):
+    """Return a directory's (st_dev, st_ino), following symlinks, or None."""
+    try:
+        if stats is not None:
+            stats.stat_calls += 1
+        st = entry.stat()
+    except OSError:
+        _count_error(stats)
+        return None
+    return st.st_dev, st.st_ino
+
+
+def _first_visit(entry, visited, stats):
+    """
+    Check (and record) that a walk has not listed a directory yet.
+
+    Always True when ``visited`` is None. Directories reached again
+    through a symlink (cycles included) are counted in revisits_skipped.
+    """
+    if visited is None:
+        return True
+    key = _directory_key(entry, stats)
+    if key is None:
+        return False
+    if key in visited:
+        if stats is not None:
+            stats.revisits_skipped += 1
+        return False
+    visited.add(key)
+    return True
+
+
+def _link_target(entry):
+    try:
+        return os.readlink(entry.path)
+    except OSError:
+        return "?"
 
 
 def format_file_size(size_bytes, precision=2, use_binary=True):
@@ -26,85 +399,430 @@ def format_file_size(size_bytes, precision=2, use_binary=True):
     if size_bytes == 0:
         return "0 bytes"
     
-    # Define units (binary vs decimal)
+    # Units and unit sizes (binary vs decimal)
     if use_binary:
-        units = ['bytes', 'KiB', 'MiB', 'GiB', 'TiB', 'PiB']
-        divisor = 1024
+        units, steps = BINARY_UNITS, BINARY_STEPS
     else:
-        units = ['bytes', 'KB', 'MB', 'GB', 'TB', 'PB']
-        divisor = 1000
-    
-    # TODO: Students implement the conversion algorithm
-    # This involves loops, mathematical operations, and formatting
-    
+        units, steps = DECIMAL_UNITS, DECIMAL_STEPS
+
+    unit_index = _size_unit_index(size_bytes, use_binary)
+    if unit_index == 0:
+        formatted_size = f"{int(size_bytes)} {units[0]}"
+    else:
+        size = size_bytes / steps[unit_index]
+        formatted_size = f"{size:.{precision}f} {units[unit_index]}"
+
     return formatted_size
 
 
+def format_file_sizes(sizes, precision=2, use_binary=True):
+    """
+    Format many sizes at once; returns the same strings as format_file_size.
+
+    ``sizes`` may be any iterable of numbers, including array.array and
+    NumPy arrays (anything with a ``tolist`` method is converted in one
+    call). The unit tables and per-unit format strings are set up once
+    for the whole batch instead of once per size.
+    """
+    if hasattr(sizes, "tolist"):
+        sizes = sizes.tolist()
+
+    if use_binary:
+        units, steps = BINARY_UNITS, BINARY_STEPS
+    else:
+        units, steps = DECIMAL_UNITS, DECIMAL_STEPS
+    first_step, top_step = steps[1], steps[-1]
+    formats = [None] + [f"{{:.{precision}f}} {unit}".format for unit in units[1:]]
+    bytes_format = f"{{}} {units[0]}".format
+    bisect_right = bisect.bisect_right
+
+    formatted = []
+    append = formatted.append
+    for size in sizes:
+        if not isinstance(size, (int, float)) or size < 0:
+            append("Invalid size")
+        elif size == 0:
+            append("0 bytes")
+        elif size < first_step:
+            append(bytes_format(int(size)))
+        else:
+            if size >= top_step:
+                unit_index = len(steps) - 1
+            elif use_binary:
+                unit_index = (int(size).bit_length() - 1) // 10
+            else:
+                unit_index = bisect_right(steps, size) - 1
+            append(formats[unit_index](size / steps[unit_index]))
+    return formatted
+
+
+def _size_unit_index(size, use_binary):
+    """
+    Return the index of the largest unit not bigger than ``size`` (> 0).
+
+    Binary units come straight from the bit length (each unit is 10 bits);
+    decimal units are found by bisecting the unit sizes, which stays exact
+    where a floating-point log10 would round at the boundaries.
+    """
+    steps = BINARY_STEPS if use_binary else DECIMAL_STEPS
+    if size >= steps[-1]:
+        return len(steps) - 1
+    if size < steps[1]:
+        return 0
+    if use_binary:
+        return (int(size).bit_length() - 1) // 10
+    return bisect.bisect_right(steps, size) - 1
+
+
 def get_and_display_file_size(filename):
-    """Get and display the size of a specified file."""
+    """
+    Get and display the size of a specified file.
+
+    Returns True if the size was displayed, False if an error was printed.
+    """
     if not filename:
         print("Error: No filename provided.")
-        return
+        return False
     else:
         filename = filename.strip()
-    
+
     try:
-        # Check if file exists
-        if not os.path.exists(filename):
-            print(f"Error: File '{filename}' not found.")
-            return
+        # One stat answers "exists?", "regular file?" and "how big?"
+        size_bytes, error = stat_file_sizes([filename])[0]
+        if error:
+            print(error)
+            return False
 
-        # Check if it's a file (not a directory)
-        if not os.path.isfile(filename):
-            print(f"Error: '{filename}' is not a regular file.")
-            return
+        # Display results
+        print("\n".join(_file_size_lines(filename, size_bytes)))
+        return True
 
-        # Get file size in bytes
-        size_bytes = os.path.getsize(filename)
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+    return False
 
-        # Use format_file_size to get human-readable format
-        formatted_size = format_file_size(size_bytes)
 
-        # Display results
-        print(f"\nFile: {filename}")
-        print(f"Size: {size_bytes} bytes")
-        print(f"Size: {formatted_size}")
+def get_and_display_file_sizes(patterns, workers=16):
+    """
+    Display the sizes of many files, then their total.
+
+    ``patterns`` are file names or glob patterns. Every file is resolved
+    with a single os.stat, and the stats run concurrently on a pool of at
+    most ``workers`` threads, which hides per-file latency on network
+    shares. Results are printed in input order. Returns True if every
+    file was sized, False if any error was printed. The counters of the
+    run are published as ``last_walk_stats``.
+    """
+    filenames, ok = expand_file_patterns(patterns)
+    if not filenames:
+        if ok:
+            print("Error: No filename provided.")
+        return False
+
+    stats = WalkStats().start("calc " + " ".join(patterns))
+    cache = stat_cache
+    misses = cache.misses if cache is not None else 0
+    started = time.perf_counter()
+    results = stat_file_sizes(filenames, workers, stats)
+    stats.stat_time += time.perf_counter() - started
+    stats.stat_calls += (len(filenames) if cache is None
+                         else cache.misses - misses)
+
+    lines = []
+    total_bytes = 0
+    for filename, (size_bytes, error) in zip(filenames, results):
+        if error:
+            lines.append(error)
+            stats.errors += 1
+            ok = False
+        else:
+            lines.extend(_file_size_lines(filename, size_bytes))
+            total_bytes += size_bytes
+            stats.files += 1
+
+    if len(filenames) > 1:
+        lines.append(f"\nTotal: {stats.files} file(s), {total_bytes} bytes "
+                     f"({format_file_size(total_bytes)})")
+    write_counted(sys.stdout, "\n".join(lines) + "\n", stats)
+    stats.finish()
+    return ok
+
+
+def expand_file_patterns(patterns):
+    """
+    Expand glob patterns, keeping plain names as given.
+
+    A name that exists is taken literally even if it looks like a pattern
+    (e.g. ``rep[1].txt``), and directories matched by a pattern are
+    dropped; a directory named explicitly is kept, so that its error is
+    reported. Returns (file names in input order, ok); ok is False if a
+    pattern matched no files, after printing an error for it.
+    """
+    filenames = []
+    ok = True
+    for pattern in patterns:
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        if any(char in pattern for char in "*?[") and not os.path.lexists(pattern):
+            import glob
+
+            matches = sorted(match for match in glob.glob(pattern)
+                             if not os.path.isdir(match))
+            if not matches:
+                print(f"Error: No files match '{pattern}'.")
+                ok = False
+            filenames.extend(matches)
+        else:
+            filenames.append(pattern)
+    return filenames, ok
+
+
+def stat_file_size(filename):
+    """
+    Stat a file once and return (size in bytes, None) or (None, error message).
+
+    The error messages are the ones get_and_display_file_size prints.
+    The session's stat_cache is used when there is one.
+    """
+    return stat_file_sizes([filename])[0]
 
+
+def _stat_file_size(filename):
+    """stat_file_size, once the file's directory has been checked."""
+    try:
+        st = _cached_stat(filename, None, lambda: os.stat(filename))
+    except (FileNotFoundError, NotADirectoryError):
+        return None, f"Error: File '{filename}' not found."
     except OSError as e:
-        print(f"Error reading file: {e}")
-    except Exception as e:
-        print(f"Unexpected error: {e}")
+        return None, f"Error reading file: {e}"
+
+    if stat.S_ISDIR(st.st_mode):
+        return None, (f"Error: '{filename}' is not a regular file. "
+                      f"Use du for directories.")
+    if not stat.S_ISREG(st.st_mode):
+        return None, f"Error: '{filename}' is not a regular file."
+    return st.st_size, None
+
+
+def stat_file_sizes(filenames, workers=16, stats=None):
+    """
+    Run stat_file_size over many files on a bounded thread pool, in order.
+
+    With a stat cache installed, the directory of each file is stat'ed
+    first (once per directory, counted in ``stats``): nothing lists these
+    directories, so this is what lets the cache notice files deleted or
+    replaced since they were last sized.
+    """
+    cache = stat_cache
+    if cache is not None:
+        parents = dict.fromkeys(os.path.dirname(os.path.normpath(filename))
+                                or os.curdir for filename in filenames)
+        for parent in parents:
+            _note_directory(cache, parent, stats)
+
+    if len(filenames) <= 1 or workers <= 1:
+        return [_stat_file_size(filename) for filename in filenames]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(filenames))) as pool:
+        return list(pool.map(_stat_file_size, filenames))
+
+
+def _file_size_lines(filename, size_bytes):
+    """The lines get_and_display_file_size prints for one file."""
+    return [f"\nFile: {filename}",
+            f"Size: {size_bytes} bytes",
+            f"Size: {format_file_size(size_bytes)}"]
+
+
+class TreeWriter:
+    """
+    Buffered line output for the tree renderer.
+
+    Lines are collected and written to the text stream ``chunk_lines`` at
+    a time, instead of one print() (and possibly one flush) per line.
+    Entry lines are counted against ``max_entries``; once the limit is
+    reached further entries are dropped and ``truncated`` is set, which
+    tells the walkers to stop. With ``stats`` given, the bytes written and
+    the time spent writing are counted.
+    """
+
+    def __init__(self, stream, chunk_lines=4096, max_entries=None, stats=None):
+        self.stream = stream
+        self.stats = stats
+        self.chunk_lines = chunk_lines
+        self.max_entries = max_entries
+        self.entries = 0
+        self.truncated = False
+        self._lines = []
+
+    def line(self, text):
+        """Queue one line of output."""
+        self._lines.append(text)
+        if len(self._lines) >= self.chunk_lines:
+            self.flush()
+
+    def entry(self, text):
+        """Queue one entry line; returns False (and drops it) past max_entries."""
+        if self.max_entries is not None and self.entries >= self.max_entries:
+            self.truncated = True
+            return False
+        self.entries += 1
+        self.line(text)
+        return True
 
+    def flush(self):
+        """Write all queued lines to the stream."""
+        if self._lines:
+            self._lines.append("")
+            write_counted(self.stream, "\n".join(self._lines), self.stats)
+            self._lines = []
 
-def list_directory_tree(directory, prefix="", max_depth=3, current_depth=0):
+
+def write_counted(stream, text, stats=None):
+    """
+    Write text to a stream, counting it as output of a walk.
+
+    With a WalkStats as ``stats``, the UTF-8 size of the text and the time
+    the write took are added to its output counters.
+    """
+    if stats is None:
+        stream.write(text)
+        return
+    started = time.perf_counter()
+    stream.write(text)
+    stats.output_time += time.perf_counter() - started
+    stats.output_bytes += len(text.encode("utf-8", "surrogateescape"))
+
+
+def render_directory_tree(directory, stream, max_depth=3, *, prefix="",
+                          current_depth=0, max_entries=None, entry=None,
+                          stats=None, iterative=False, exclude=None,
+                          follow_symlinks=False, sizes=False):
+    """
+    Render a directory tree to any text stream, buffered.
+
+    Produces exactly what list_directory_tree prints. With
+    ``max_entries`` set, the walk stops after that many entries and a
+    truncation summary line is written. Returns the number of entries
+    written. The walk's counters are published as ``last_walk_stats``.
+
+    With ``sizes`` set, each directory is shown with the total size of
+    the files below it, all levels down (see directory_sizes), and a
+    total line for the whole tree is written at the end. The tree is then
+    rendered from the listings of the sizing walk, so each directory is
+    still listed once and each file stat'ed once.
+
+    ``directory`` may also be a full ScanResult, which is rendered
+    without touching the filesystem; the walk options are then ignored.
+    """
+    from file_scan import ScanResult
+
+    scan = directory if isinstance(directory, ScanResult) else None
+    stats = _start_walk(stats, f"tree {directory if scan is None else scan.root}")
+    totals = None
+    out = TreeWriter(stream, max_entries=max_entries, stats=stats)
+    try:
+        if scan is not None:
+            scan.render(out, max_depth, prefix, current_depth)
+        else:
+            exclude = _exclude_rules(exclude, directory)
+            if sizes and _is_directory(directory, entry, stats):
+                totals, listings = _directory_sizes(
+                    directory, stats, exclude, follow_symlinks,
+                    max_depth - current_depth)
+                _render_sized_tree(directory, prefix, totals, listings, out)
+            else:
+                list_directory_tree(
+                    directory, prefix, max_depth, current_depth, entry=entry,
+                    stats=stats, iterative=iterative, out=out, exclude=exclude,
+                    follow_symlinks=follow_symlinks,
+                    visited=_visited_directories(directory, follow_symlinks,
+                                                 stats))
+        if out.truncated:
+            out.line(f"{prefix}... (output truncated after {out.entries} entries)")
+        if totals:
+            size, files = totals[directory]
+            out.line(f"{prefix}Total: {files} file(s), {size} bytes "
+                     f"({format_file_size(size)})")
+    finally:
+        out.flush()
+        stats.finish()
+    return out.entries
+
+
+def list_directory_tree(directory, prefix="", max_depth=3, current_depth=0,
+                        *, entry=None, stats=None, iterative=False, out=None,
+                        exclude=None, follow_symlinks=False, visited=None):
     """
     Display directory structure as a tree using recursion.
     - Tree structures are naturally recursive
     - Clear base cases and recursive cases
     - Visual output helps understand recursion
     - Tests multiple base cases
+
+    Each directory is listed once with scan_directory(); file types come
+    from the listing and sizes from the cached DirEntry stat, so no
+    per-entry isfile/isdir/getsize calls are made. Pass the DirEntry as
+    ``entry`` when the caller has already listed ``directory``, and a
+    WalkStats as ``stats`` to count the syscalls issued.
+
+    With ``iterative=True`` the same output is produced by an explicit
+    stack instead of recursion, so arbitrarily deep trees cannot raise
+    RecursionError.
+
+    ``exclude`` takes gitignore-style patterns or an ExcludeRules; excluded
+    entries are not shown and excluded directories are not listed.
+
+    Symlinks to directories are shown as "name -> target" and not entered
+    unless ``follow_symlinks`` is set. Then ``visited`` holds the
+    (st_dev, st_ino) of every directory listed so far, and a directory
+    reached again (a symlink cycle, or a second link to the same tree) is
+    shown as skipped instead of being walked again.
+
+    Output goes through render_directory_tree to sys.stdout; ``out`` is
+    the TreeWriter the renderer passes down while walking.
     """
+    if out is None:
+        render_directory_tree(directory, sys.stdout, max_depth, prefix=prefix,
+                              current_depth=current_depth, entry=entry,
+                              stats=stats, iterative=iterative, exclude=exclude,
+                              follow_symlinks=follow_symlinks)
+        return None
+
     # Base case 1: Invalid directory
-    if not os.path.isdir(directory):
-        print(f"Error: '{directory}' is not a valid directory.")
-        # TODO: return None for the base case
+    if not _is_directory(directory, entry, stats):
+        out.line(f"Error: '{directory}' is not a valid directory.")
+        return None
+
+    if follow_symlinks and visited is None:
+        visited = _visited_directories(directory, follow_symlinks, stats)
+
+    if iterative:
+        _list_directory_tree_iterative(directory, prefix, max_depth,
+                                       current_depth, stats, out, exclude,
+                                       follow_symlinks, visited)
+        return None
 
     # Base case 2: Maximum depth reached
     if current_depth >= max_depth:
-        print(f"{prefix}... (max depth reached)")
-        # TODO: return None for yet another base case
+        out.line(f"{prefix}... (max depth reached)")
+        return None
 
     try:
-        # Get and sort directory contents
-        items = sorted(os.listdir(directory))
+        # Get and sort directory contents, minus excluded entries
+        items = scan_directory(directory, stats)
+        exclude, items = _filter_excluded(directory, items, exclude)
 
         # Base case 3: Empty directory
         if not items:
-            print(f"{prefix}(empty directory)")
-            # TODO: return None for yet another base case
+            out.line(f"{prefix}(empty directory)")
+            return None
 
         for i, item in enumerate(items):
-            item_path = os.path.join(directory, item)
+            item_path = item.path
             is_last = i == len(items) - 1
 
             # Choose the appropriate tree symbols
@@ -115,59 +833,856 @@ def list_directory_tree(directory, prefix="", max_depth=3, current_depth=0):
                 current_prefix = prefix + "├── "
                 next_prefix = prefix + "│   "
 
-            if os.path.isfile(item_path):
+            kind = entry_kind(item, stats, follow_symlinks)
+            if kind == FILE_ENTRY:
                 # Display file with size
                 try:
-                    size = os.path.getsize(item_path)
-                    print(f"{current_prefix}{item} ({size} bytes)")
+                    size = entry_size(item, stats)
+                    out.entry(f"{current_prefix}{item.name} ({size} bytes)")
                 except OSError:
-                    print(f"{current_prefix}{item} (size unknown)")
+                    _count_error(stats)
+                    out.entry(f"{current_prefix}{item.name} (size unknown)")
 
-            elif os.path.isdir(item_path):
+            elif kind == DIR_ENTRY:
+                if not _first_visit(item, visited, stats):
+                    out.entry(f"{current_prefix}{item.name}/ (already listed, skipped)")
                 # Display directory and recurse
-                print(f"{current_prefix}{item}/")
-                # Recursive case: explore subdirectory
-                # TODO: perform recursive function call
+                elif out.entry(f"{current_prefix}{item.name}/"):
+                    # Recursive case: explore subdirectory
+                    list_directory_tree(item_path, next_prefix, max_depth,
+                                        current_depth + 1, entry=item,
+                                        stats=stats, out=out, exclude=exclude,
+                                        follow_symlinks=follow_symlinks,
+                                        visited=visited)
+
+            elif kind == LINK_ENTRY:
+                out.entry(f"{current_prefix}{item.name} -> {_link_target(item)}")
+
+            if out.truncated:
+                return None
+
+    except (OSError, PermissionError) as e:
+        _count_error(stats)
+        out.line(f"{prefix}Error accessing directory: {e}")
+
+
+def _list_directory_tree_iterative(directory, prefix, max_depth, current_depth,
+                                   stats, out, exclude=None, follow_symlinks=False,
+                                   visited=None):
+    """
+    Stack-based equivalent of list_directory_tree's recursion.
+
+    Each stack frame is [items, next_index, prefix, depth, exclude rules]
+    for a directory being printed. Child prefixes are built once per
+    directory rather than once per entry.
+    """
+    stack = []
+    _push_tree_level(stack, directory, prefix, max_depth, current_depth,
+                     stats, out, exclude)
+
+    while stack and not out.truncated:
+        frame = stack[-1]
+        items, index, prefix, depth, exclude = frame
+        if index == len(items):
+            stack.pop()
+            continue
+        frame[1] = index + 1
 
+        item = items[index]
+        is_last = index == len(items) - 1
+        branch = "└── " if is_last else "├── "
+
+        kind = entry_kind(item, stats, follow_symlinks)
+        if kind == FILE_ENTRY:
+            try:
+                size = entry_size(item, stats)
+                out.entry(f"{prefix}{branch}{item.name} ({size} bytes)")
+            except OSError:
+                _count_error(stats)
+                out.entry(f"{prefix}{branch}{item.name} (size unknown)")
+
+        elif kind == DIR_ENTRY:
+            if not _first_visit(item, visited, stats):
+                out.entry(f"{prefix}{branch}{item.name}/ (already listed, skipped)")
+            elif out.entry(f"{prefix}{branch}{item.name}/"):
+                next_prefix = prefix + ("    " if is_last else "│   ")
+                _push_tree_level(stack, item.path, next_prefix, max_depth,
+                                 depth + 1, stats, out, exclude)
+
+        elif kind == LINK_ENTRY:
+            out.entry(f"{prefix}{branch}{item.name} -> {_link_target(item)}")
+
+
+def _push_tree_level(stack, directory, prefix, max_depth, depth, stats, out,
+                     exclude):
+    """Handle the tree base cases for a directory, or push it onto the stack."""
+    if depth >= max_depth:
+        out.line(f"{prefix}... (max depth reached)")
+        return
+
+    try:
+        items = scan_directory(directory, stats)
     except (OSError, PermissionError) as e:
-        print(f"{prefix}Error accessing directory: {e}")
+        _count_error(stats)
+        out.line(f"{prefix}Error accessing directory: {e}")
+        return
+
+    exclude, items = _filter_excluded(directory, items, exclude)
+    if not items:
+        out.line(f"{prefix}(empty directory)")
+        return
+
+    stack.append([items, 0, prefix, depth, exclude])
 
 
-def find_files_by_extension(directory, extension, current_path=""):
+def directory_sizes(directory, stats=None, exclude=None, follow_symlinks=False):
+    """
+    Compute the total size of every directory of a tree, in one walk.
+
+    Returns a dict mapping ``directory`` and each directory below it (as
+    the walk spells the path, os.path.join of the parent and the name) to
+    a (bytes, files) tuple: the apparent size and number of the files
+    anywhere below it. Each directory is listed once, and totals are added
+    up bottom-up from the deepest directories, so no file is stat'ed
+    twice. Entries that cannot be read are skipped and counted as errors.
+
+    ``exclude`` and ``follow_symlinks`` work as for list_directory_tree;
+    a directory reached a second time through a symlink counts once.
+    While a StatCache is installed, the contents of each directory are
+    memoized keyed on its mtime, so sizing a tree (or a parent, or a
+    sibling sharing subdirectories) again only lists the directories that
+    changed; files resized in place show up when the memoized results
+    expire. Walks with ``exclude`` or ``follow_symlinks`` are not
+    memoized. The walk's counters are published as ``last_walk_stats``.
+    """
+    stats = _start_walk(stats, f"du {directory}")
+    try:
+        totals, _ = _directory_sizes(directory, stats,
+                                     _exclude_rules(exclude, directory),
+                                     follow_symlinks)
+        return totals
+    finally:
+        stats.finish()
+
+
+def _directory_sizes(directory, stats, rules, follow_symlinks, keep_depth=0):
+    """
+    The walk behind directory_sizes; returns (totals, listings).
+
+    The listings of the directories less than ``keep_depth`` levels below
+    ``directory`` are kept for _render_sized_tree: ``listings`` maps each
+    of them to its rows (see _directory_contents), or to the OSError that
+    listing it raised. Those directories are always listed, since the
+    memoized contents do not hold the names of their files.
+    """
+    cache = stat_cache if rules is None and not follow_symlinks else None
+    visited = _visited_directories(directory, follow_symlinks, stats)
+
+    # Directories in walk (pre-)order, with what is directly inside them;
+    # every subdirectory comes after its parent, so adding up in reverse
+    # order finishes each subtree before its parent needs it.
+    order = []
+    listings = {}
+    stack = [(directory, rules, 0)]
+    while stack:
+        path, rules, depth = stack.pop()
+        size, files, subdirectories, rules, rows = _directory_contents(
+            path, stats, rules, follow_symlinks, visited, cache,
+            depth < keep_depth)
+        if rows is not None:
+            listings[path] = rows
+        subdirectories = [os.path.join(path, name) for name in subdirectories]
+        order.append((path, size, files, subdirectories))
+        # Reversed, so directories are walked in the tree view's order
+        stack.extend((subdirectory, rules, depth + 1)
+                     for subdirectory in reversed(subdirectories))
+
+    totals = {}
+    for path, size, files, subdirectories in reversed(order):
+        for subdirectory in subdirectories:
+            sub_size, sub_files = totals[subdirectory]
+            size += sub_size
+            files += sub_files
+        totals[path] = (size, files)
+    return totals, listings
+
+
+def _directory_contents(directory, stats, rules, follow_symlinks, visited,
+                        cache, keep=False):
+    """
+    Return (bytes, files, subdirectories, child rules, rows) of a directory.
+
+    The sizes are those of the files directly inside it. With a cache,
+    a memoized result for the directory's current mtime is used instead
+    of listing it, unless ``keep`` is set. With ``keep``, ``rows`` holds
+    one (name, path, kind, detail) tuple per entry shown in the tree view,
+    in order: the size (None if unknown) of a file, whether a directory
+    is visited for the first time, the target of a link. Otherwise, or
+    if the directory cannot be listed, ``rows`` is None or the OSError.
+    """
+    mtime_ns = None
+    if cache is not None:
+        mtime_ns = _note_directory(cache, directory, stats)
+        if mtime_ns is not None and not keep:
+            cached = cache.get_contents(directory, mtime_ns)
+            if cached is not None:
+                size, files, subdirectories = cached
+                return size, files, subdirectories, rules, None
+
+    try:
+        # A cache has just been given the mtime, scan_directory would stat again
+        items = (scan_directory(directory, stats) if cache is None
+                 else _list_directory(directory, stats))
+    except OSError as e:
+        _count_error(stats)
+        return 0, 0, (), rules, e if keep else None
+    child_rules, items = _filter_excluded(directory, items, rules)
+
+    size = files = 0
+    subdirectories = []
+    rows = [] if keep else None
+    for item in items:
+        kind = entry_kind(item, stats, follow_symlinks)
+        detail = None
+        if kind == FILE_ENTRY:
+            try:
+                detail = entry_size(item, stats)
+                size += detail
+                files += 1
+            except OSError:
+                _count_error(stats)
+        elif kind == DIR_ENTRY:
+            detail = _first_visit(item, visited, stats)
+            if detail:
+                subdirectories.append(item.name)
+        elif kind == LINK_ENTRY and keep:
+            detail = _link_target(item)
+        if keep:
+            rows.append((item.name, item.path, kind, detail))
+
+    if mtime_ns is not None:
+        cache.put_contents(directory, mtime_ns, size, files, subdirectories)
+    return size, files, subdirectories, child_rules, rows
+
+
+def _render_sized_tree(directory, prefix, totals, listings, out):
+    """
+    Write the tree view of a sized walk, with each directory's total.
+
+    Produces what list_directory_tree prints for the same walk, from the
+    rows _directory_sizes kept, without touching the filesystem again.
+    """
+    stack = []
+    _push_sized_level(stack, directory, prefix, listings, out)
+
+    while stack and not out.truncated:
+        frame = stack[-1]
+        rows, index, prefix = frame
+        if index == len(rows):
+            stack.pop()
+            continue
+        frame[1] = index + 1
+
+        name, path, kind, detail = rows[index]
+        is_last = index == len(rows) - 1
+        branch = "└── " if is_last else "├── "
+
+        if kind == FILE_ENTRY:
+            if detail is None:
+                out.entry(f"{prefix}{branch}{name} (size unknown)")
+            else:
+                out.entry(f"{prefix}{branch}{name} ({detail} bytes)")
+
+        elif kind == DIR_ENTRY:
+            if not detail:
+                out.entry(f"{prefix}{branch}{name}/ (already listed, skipped)")
+            elif out.entry(f"{prefix}{branch}{name}/ ({totals[path][0]} bytes)"):
+                next_prefix = prefix + ("    " if is_last else "│   ")
+                _push_sized_level(stack, path, next_prefix, listings, out)
+
+        elif kind == LINK_ENTRY:
+            out.entry(f"{prefix}{branch}{name} -> {detail}")
+
+
+def _push_sized_level(stack, directory, prefix, listings, out):
+    """Handle the tree base cases for a sized directory, or push its rows."""
+    rows = listings.get(directory)
+    if rows is None:
+        out.line(f"{prefix}... (max depth reached)")
+    elif isinstance(rows, OSError):
+        out.line(f"{prefix}Error accessing directory: {rows}")
+    elif not rows:
+        out.line(f"{prefix}(empty directory)")
+    else:
+        stack.append([rows, 0, prefix])
+
+
+def find_files_by_extension(directory, extension, current_path="", limit=None,
+                            stats=None, iterative=False, workers=None,
+                            processes=None, exclude=None, follow_symlinks=False,
+                            compact=False):
     """
     Recursively find all files with a specific extension.
+
+    ``extension`` may be a single extension or a collection of them
+    (compound suffixes such as ".tar.gz" included); see ExtensionMatcher.
+    Returns paths relative to ``directory`` (prefixed with
+    ``current_path``), in the same name-sorted order as the tree view.
+    This is the list form of iter_files_by_extension().
+
+    With ``workers`` set, directories are listed concurrently by a thread
+    pool of that size, which overlaps the latency of network and FUSE
+    filesystems. With ``processes`` set, the tree is split into subtree
+    shards that are searched by a process pool of that size, for
+    CPU-bound walks that one core cannot keep up with. Either way the
+    results are merged back into the serial order.
+
+    ``exclude`` takes gitignore-style patterns or an ExcludeRules (see
+    there); excluded directories are never listed.
+
+    Symlinks to directories are only searched with ``follow_symlinks``;
+    each directory is then searched once, however many links lead to it
+    (see list_directory_tree), under the path the serial walk reaches it
+    by first. That search is serial (``workers`` and ``processes`` are
+    ignored), since which path wins must not depend on thread timing.
+
+    With ``compact=True`` the matches are returned as a ScanResult, a
+    sequence of the same paths stored column-wise, with sizes and mtimes,
+    in a fraction of the memory of a list of strings; that search is
+    serial (``workers`` and ``processes`` are ignored).
     """
-    # Base case: Invalid directory
-    if not os.path.isdir(directory):
-        # TODO: return an empty list for the base case
-        # TODO: remove the pass statement below, only added to avoid syntax error
-        pass
+    if compact:
+        from file_scan import scan_tree
+
+        return scan_tree(directory, extension=extension, stats=stats,
+                         exclude=exclude, follow_symlinks=follow_symlinks,
+                         limit=limit, base=current_path)
+
+    if (workers is not None or processes is not None) and not follow_symlinks:
+        stats = _start_walk(stats, f"find {directory}")
+        try:
+            if not _is_directory(directory, None, stats):
+                return []
+            matcher = ExtensionMatcher(extension)
+            rules = _exclude_rules(exclude, directory)
+            if processes is not None:
+                found_files = _find_files_sharded(directory, matcher, current_path,
+                                                  processes, stats, rules)
+            else:
+                found_files = _find_files_threaded(directory, matcher, current_path,
+                                                   workers, stats, rules)
+        finally:
+            stats.finish()
+        return found_files if limit is None else found_files[:max(limit, 0)]
+
+    return list(iter_files_by_extension(directory, extension, current_path,
+                                        limit=limit, stats=stats,
+                                        iterative=iterative, exclude=exclude,
+                                        follow_symlinks=follow_symlinks))
+
+
+def find_files_by_extensions(directory, extensions, current_path="", **kwargs):
+    """
+    Find files for several extensions in one walk, grouped per extension.
+
+    Returns a dict mapping each (lowered) extension to its matches, in the
+    order the extensions were given. A file is listed under the longest
+    extension it matches, so "x.tar.gz" goes to ".tar.gz" rather than
+    ".gz" when both are requested. Keyword arguments are passed on to
+    find_files_by_extension.
+    """
+    matcher = ExtensionMatcher(extensions)
+    grouped = {extension: [] for extension in matcher.extensions}
+    for path in find_files_by_extension(directory, extensions, current_path,
+                                        **kwargs):
+        grouped[matcher.match(os.path.basename(path))].append(path)
+    return grouped
+
+
+def iter_files_by_extension(directory, extension, current_path="", limit=None,
+                            stats=None, iterative=False, exclude=None,
+                            follow_symlinks=False):
+    """
+    Yield files with a specific extension as the walk finds them.
 
-    # TODO: Initialize found_files as an empty list
+    Paths are yielded in the same order find_files_by_extension returns
+    them. Directories are only listed when the consumer asks for more
+    results, so stopping early (or passing ``limit``) leaves the rest of
+    the tree untouched. ``iterative=True`` walks with an explicit stack
+    instead of recursion, for trees deeper than the recursion limit. The
+    walk's counters are published as ``last_walk_stats``; its wall time
+    runs until the generator is exhausted or closed.
+    """
+    if limit is not None and limit <= 0:
+        return
 
+    stats = _start_walk(stats, f"find {directory}")
     try:
-        for item in os.listdir(directory):
-            item_path = os.path.join(directory, item)
+        # Base case: Invalid directory
+        if not _is_directory(directory, None, stats):
+            return
+
+        walk = _iter_files_iterative if iterative else _iter_files
+        found_files = walk(directory, ExtensionMatcher(extension), current_path,
+                           stats, _exclude_rules(exclude, directory),
+                           _visited_directories(directory, follow_symlinks, stats))
+        if limit is not None:
+            found_files = itertools.islice(found_files, limit)
+        yield from found_files
+    finally:
+        stats.finish()
 
-            if os.path.isfile(item_path):
-                # Base case: Check if file matches extension
-                if item.lower().endswith(extension.lower()):
-                    relative_path = (
-                        os.path.join(current_path, item) if current_path else item
-                    )
-                    found_files.append(relative_path)
 
-            elif os.path.isdir(item_path):
-                # Recursive case: Search in subdirectory
-                sub_path = os.path.join(current_path, item) if current_path else item
-                # TODO recursively call find_files_by_extension
-                # TODO: Extend found_files with results from recursive call
-               
+def _iter_files(directory, matcher, current_path, stats, rules=None,
+                visited=None):
+    """
+    Recursive generator behind iter_files_by_extension.
 
+    Symlinked directories are followed when ``visited`` (the set of
+    directories seen so far, see _first_visit) is given.
+    """
+    try:
+        items = scan_directory(directory, stats)
     except (OSError, PermissionError):
-        pass  # Skip inaccessible directories
+        _count_error(stats)
+        return  # Skip inaccessible directories
+    rules, items = _filter_excluded(directory, items, rules)
+
+    for item in items:
+        kind = entry_kind(item, stats, visited is not None)
+        if kind == FILE_ENTRY:
+            # Base case: Check if file matches extension
+            if matcher.match(item.name) is not None:
+                yield (
+                    os.path.join(current_path, item.name) if current_path else item.name
+                )
 
-    return found_files
-    found_files()
+        elif kind == DIR_ENTRY and _first_visit(item, visited, stats):
+            # Recursive case: Search in subdirectory
+            sub_path = (
+                os.path.join(current_path, item.name) if current_path else item.name
+            )
+            yield from _iter_files(item.path, matcher, sub_path, stats, rules,
+                                   visited)
 
 
+def _iter_files_iterative(directory, matcher, current_path, stats, rules=None,
+                          visited=None):
+    """
+    Stack-based equivalent of _iter_files.
+
+    The stack holds an iterator over the sorted entries of each open
+    directory, with the exclude rules for those entries, and
+    ``path_parts`` the names of the subdirectories entered, so a relative
+    path is only joined when a file actually matches.
+    """
+    try:
+        items = scan_directory(directory, stats)
+    except (OSError, PermissionError):
+        _count_error(stats)
+        return  # Skip inaccessible directories
+    rules, items = _filter_excluded(directory, items, rules)
+    stack = [(iter(items), rules)]
+    base_parts = [current_path] if current_path else []
+    path_parts = []
+
+    while stack:
+        entries, rules = stack[-1]
+        item = next(entries, None)
+        if item is None:
+            stack.pop()
+            if path_parts:
+                path_parts.pop()
+            continue
+
+        kind = entry_kind(item, stats, visited is not None)
+        if kind == FILE_ENTRY:
+            if matcher.match(item.name) is not None:
+                yield os.path.join(*base_parts, *path_parts, item.name)
+
+        elif kind == DIR_ENTRY and _first_visit(item, visited, stats):
+            try:
+                items = scan_directory(item.path, stats)
+            except (OSError, PermissionError):
+                _count_error(stats)
+                continue  # Skip inaccessible directories
+            sub_rules, items = _filter_excluded(item.path, items, rules)
+            stack.append((iter(items), sub_rules))
+            path_parts.append(item.name)
+
+
+def _find_files_threaded(directory, matcher, current_path, workers, stats,
+                         rules=None):
+    """
+    Thread-pool search behind find_files_by_extension(workers=N).
+
+    Every directory listing is a task; finishing one queues its
+    subdirectories. Matches are collected as tuples of path components,
+    and sorting those tuples reproduces the serial depth-first order
+    because children are visited in name order.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    matches = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_scan_for_matches, directory, (), matcher, rules)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                found, subdirs, task_stats = future.result()
+                matches.extend(found)
+                if stats is not None:
+                    stats.add(task_stats)
+                for path, parts, sub_rules in subdirs:
+                    pending.add(pool.submit(_scan_for_matches, path, parts,
+                                            matcher, sub_rules))
+
+    matches.sort()
+    base_parts = (current_path,) if current_path else ()
+    return [os.path.join(*base_parts, *parts) for parts in matches]
+
+
+def _scan_for_matches(directory, parts, matcher, rules=None):
+    """
+    List one directory for the threaded search.
+
+    Returns (matching files, subdirectories, stats), with files as
+    component tuples and subdirectories as (path, component tuple,
+    exclude rules) triples. Counters are kept per task and merged by the
+    caller, so worker threads never update a shared WalkStats.
+    """
+    stats = WalkStats()
+    found = []
+    subdirs = []
+    try:
+        items = scan_directory(directory, stats)
+    except (OSError, PermissionError):
+        stats.errors += 1
+        return found, subdirs, stats  # Skip inaccessible directories
+    rules, items = _filter_excluded(directory, items, rules)
+
+    for item in items:
+        kind = entry_kind(item, stats)
+        if kind == FILE_ENTRY:
+            if matcher.match(item.name) is not None:
+                found.append(parts + (item.name,))
+        elif kind == DIR_ENTRY:
+            subdirs.append((item.path, parts + (item.name,), rules))
+    return found, subdirs, stats
+
+
+# Shards per process the sharded search aims for, so one large subtree
+# does not leave the other processes idle.
+SHARDS_PER_PROCESS = 4
+# How many directory levels below the root shards may be split into
+MAX_SHARD_SPLIT_DEPTH = 3
+
+
+def _find_files_sharded(directory, matcher, current_path, processes, stats,
+                        rules=None):
+    """
+    Process-pool search behind find_files_by_extension(processes=N).
+
+    The root is listed in this process and each subdirectory becomes a
+    shard. While there are fewer than SHARDS_PER_PROCESS shards per
+    process, shards are split by listing them here as well, so their own
+    subdirectories become shards. Each shard is walked serially in a
+    worker, and since a shard's results form one contiguous block of the
+    serial order, sorting blocks by their path components and
+    concatenating them reproduces find_files_by_extension's output.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    base_parts = (current_path,) if current_path else ()
+    blocks = []  # (path components, list of relative paths)
+    shards = [(directory, (), rules)]
+    target = processes * SHARDS_PER_PROCESS
+
+    for _ in range(MAX_SHARD_SPLIT_DEPTH):
+        if len(shards) >= target:
+            break
+        split_shards = []
+        for path, parts, shard_rules in shards:
+            found, subdirs, task_stats = _scan_for_matches(path, parts, matcher,
+                                                           shard_rules)
+            if stats is not None:
+                stats.add(task_stats)
+            blocks.extend((match, [os.path.join(*base_parts, *match)])
+                          for match in found)
+            split_shards.extend(subdirs)
+        shards = split_shards
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        jobs = [(path, os.path.join(*base_parts, *parts), matcher, shard_rules)
+                for path, parts, shard_rules in shards]
+        chunksize = max(1, len(jobs) // (processes * SHARDS_PER_PROCESS))
+        results = pool.map(_find_in_shard, jobs, chunksize=chunksize)
+        for (_, parts, _), (found, task_stats) in zip(shards, results):
+            if stats is not None:
+                stats.add(task_stats)
+            blocks.append((parts, found))
+
+    blocks.sort(key=_block_key)
+    return [path for _, found in blocks for path in found]
+
+
+def _block_key(block):
+    return block[0]
+
+
+def _find_in_shard(job):
+    """Serially search one shard in a worker process."""
+    directory, current_path, matcher, rules = job
+    stats = WalkStats()
+    found = list(_iter_files_iterative(directory, matcher, current_path, stats,
+                                       rules))
+    return found, stats
+
+
+def find_largest_files(directory, count=10, extension=None, stats=None,
+                       follow_symlinks=False):
+    """
+    Return the ``count`` largest files below ``directory``, largest first.
+
+    The tree is walked once and the sizes come from the stat the walk does
+    for each file anyway. Only the current top ``count`` are kept, in a
+    heapq min-heap, so memory stays O(count) however large the tree is,
+    and the relative path of a file is only built when it enters the heap.
+    ``extension`` (one or several, as for find_files_by_extension)
+    restricts the search, and ``follow_symlinks`` also searches symlinked
+    directories, each directory once. Returns (size, relative path) pairs;
+    files of equal size keep the walk's order.
+    """
+    if count <= 0:
+        return []
+    stats = _start_walk(stats, f"largest {directory}")
+    try:
+        if not _is_directory(directory, None, stats):
+            return []
+        heap = _largest_files_heap(
+            directory, count, extension, stats,
+            _visited_directories(directory, follow_symlinks, stats))
+    finally:
+        stats.finish()
+    heap.sort(key=_largest_key)
+    return [(size, path) for size, _, path in heap]
+
+
+def _largest_key(item):
+    size, order, _ = item
+    return -size, -order
+
+
+def _largest_files_heap(directory, count, extension, stats, visited=None):
+    """
+    Walk behind find_largest_files.
+
+    Heap items are (size, -walk order, path): the smallest size sits at
+    the top and, among equal sizes, the file found last, so earlier files
+    win ties. Directories are walked with an explicit stack of
+    (entry iterator, relative directory path) pairs.
+    """
+    import heapq
+
+    matcher = ExtensionMatcher(extension) if extension is not None else None
+    heap = []
+    order = 0
+    try:
+        stack = [(iter(scan_directory(directory, stats)), "")]
+    except (OSError, PermissionError):
+        stats.errors += 1
+        return heap  # Skip inaccessible directories
+
+    while stack:
+        items, parent = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            continue
+
+        kind = entry_kind(item, stats, visited is not None)
+        if kind == DIR_ENTRY:
+            if not _first_visit(item, visited, stats):
+                continue
+            try:
+                stack.append((iter(scan_directory(item.path, stats)),
+                              _join_relative(parent, item.name)))
+            except (OSError, PermissionError):
+                stats.errors += 1  # Skip inaccessible directories
+            continue
+        if kind != FILE_ENTRY or (matcher is not None
+                                  and matcher.match(item.name) is None):
+            continue
+
+        try:
+            size = entry_size(item, stats)
+        except OSError:
+            stats.errors += 1
+            continue
+        order += 1
+        if len(heap) < count:
+            heapq.heappush(heap, (size, -order, _join_relative(parent, item.name)))
+        elif size > heap[0][0]:
+            heapq.heapreplace(heap, (size, -order, _join_relative(parent, item.name)))
+    return heap
+
+
+def _join_relative(parent, name):
+    return os.path.join(parent, name) if parent else name
+
+
+def iter_tree_records(directory, max_depth=None, extension=None, stats=None,
+                      exclude=None, follow_symlinks=False):
+    """
+    Yield one dict per entry of a tree, in the tree view's order.
+
+    Each record has ``path`` (relative to ``directory``), ``type``
+    ("file", "dir" or "link"), ``size``, ``depth`` (0 for entries
+    directly inside ``directory``) and ``mtime``. Size and mtime come from the one stat
+    the walk does per entry; they are None if that stat fails.
+    ``max_depth`` limits the walk like list_directory_tree's, and
+    ``extension`` (one or several, as for find_files_by_extension) turns
+    this into a search that yields only matching file records.
+    ``exclude`` skips entries as for find_files_by_extension. Symlinks to
+    directories are reported as "link" records (with the size and mtime
+    of the link itself) unless ``follow_symlinks`` is set; then they are
+    walked, and a directory reached a second time is left out. The walk
+    uses an explicit stack, so depth is not limited by recursion. The
+    walk's counters are published as ``last_walk_stats``.
+    """
+    for _, path, kind, depth, st in iter_tree_entries(
+            directory, max_depth, extension, stats, exclude, follow_symlinks):
+        size, mtime = (st.st_size, st.st_mtime) if st is not None else (None, None)
+        yield {"path": path, "type": kind, "size": size, "depth": depth,
+               "mtime": mtime}
+
+
+def iter_tree_entries(directory, max_depth=None, extension=None, stats=None,
+                      exclude=None, follow_symlinks=False):
+    """
+    Yield (DirEntry, path, kind, depth, stat result) per entry of a tree.
+
+    The walk of iter_tree_records, for callers that need more of an entry
+    than its record holds (such as its inode, or whether it is a symlink
+    to a file). The stat result is None if the stat failed.
+    """
+    if max_depth is not None and max_depth <= 0:
+        return
+    stats = _start_walk(stats, f"records {directory}")
+    try:
+        yield from _iter_tree_entries(directory, max_depth, extension, stats,
+                                      _exclude_rules(exclude, directory),
+                                      follow_symlinks)
+    finally:
+        stats.finish()
+
+
+def _iter_tree_entries(directory, max_depth, extension, stats, rules,
+                       follow_symlinks=False):
+    """The walk behind iter_tree_entries."""
+    if not _is_directory(directory, None, stats):
+        return
+    visited = _visited_directories(directory, follow_symlinks, stats)
+    matcher = ExtensionMatcher(extension) if extension is not None else None
+
+    try:
+        items = scan_directory(directory, stats)
+    except (OSError, PermissionError):
+        stats.errors += 1
+        return  # Skip inaccessible directories
+    rules, items = _filter_excluded(directory, items, rules)
+    stack = [(iter(items), "", 0, rules)]
+
+    while stack:
+        items, parent, depth, rules = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            continue
+
+        kind = entry_kind(item, stats, follow_symlinks)
+        if kind is None:
+            continue
+        path = os.path.join(parent, item.name) if parent else item.name
+
+        if kind == LINK_ENTRY:
+            if matcher is None:
+                yield item, path, kind, depth, _entry_stat(item, kind, stats)
+
+        elif kind == DIR_ENTRY:
+            if not _first_visit(item, visited, stats):
+                continue
+            if matcher is None:
+                yield item, path, kind, depth, _entry_stat(item, kind, stats)
+            if max_depth is None or depth + 1 < max_depth:
+                try:
+                    sub_items = scan_directory(item.path, stats)
+                except (OSError, PermissionError):
+                    stats.errors += 1  # Skip inaccessible directories
+                    continue
+                sub_rules, sub_items = _filter_excluded(item.path, sub_items, rules)
+                stack.append((iter(sub_items), path, depth + 1, sub_rules))
+
+        elif matcher is None or matcher.match(item.name) is not None:
+            yield item, path, kind, depth, _entry_stat(item, kind, stats)
+
+
+def _entry_stat(item, kind, stats):
+    """Stat a DirEntry (a LINK_ENTRY itself, not its target); None on failure."""
+    if kind != LINK_ENTRY and stat_cache is not None:
+        try:
+            return _cached_stat(item.path, stats, item.stat)
+        except OSError:
+            stats.errors += 1
+            return None
+    stats.stat_calls += 1
+    started = time.perf_counter()
+    try:
+        st = item.stat(follow_symlinks=kind != LINK_ENTRY)
+    except OSError:
+        stats.errors += 1
+        st = None
+    stats.stat_time += time.perf_counter() - started
+    return st
+
+
+def write_records(records, stream, json_lines=True, chunk_records=4096,
+                  stats=None):
+    """
+    Stream records to a text stream as NDJSON (default) or a JSON array.
+
+    Records are serialized as they arrive and written in chunks, so a
+    consumer sees output while the walk is still running without paying
+    for one write per record. Returns the number of records written.
+    Pass the walk's WalkStats as ``stats`` to count the output written.
+    """
+    import json
+
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    if not json_lines:
+        write_counted(stream, "[\n", stats)
+
+    count = 0
+    chunk = []
+    for record in records:
+        chunk.append(encode(record))
+        if len(chunk) >= chunk_records:
+            _write_record_chunk(stream, chunk, json_lines, count, stats)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        _write_record_chunk(stream, chunk, json_lines, count, stats)
+        count += len(chunk)
+
+    if not json_lines:
+        write_counted(stream, "\n]\n", stats)
+    return count
+
+
+def _write_record_chunk(stream, chunk, json_lines, written, stats):
+    """Write encoded records: one per line, or comma-separated array items."""
+    if json_lines:
+        write_counted(stream, "\n".join(chunk) + "\n", stats)
+    else:
+        write_counted(stream, (",\n" if written else "") + ",\n".join(chunk),
+                       stats)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Python CLI File Manager - Compact Scan Module
+Walks a directory tree once into column-oriented arrays instead of a list
+of path strings and record dicts, and renders the tree view from them.
+Uses only standard library modules.
+"""
+
+import os
+import sys
+from array import array
+
+from file_manager import (
+    DIR_ENTRY,
+    FILE_ENTRY,
+    LINK_ENTRY,
+    ExtensionMatcher,
+    _entry_stat,
+    _exclude_rules,
+    _filter_excluded,
+    _first_visit,
+    _is_directory,
+    _link_target,
+    _start_walk,
+    _visited_directories,
+    entry_kind,
+    scan_directory,
+)
+
+
+# ScanResult flag bytes: the low two bits index _SCAN_KINDS, the others
+# mark entries without the usual data.
+_SCAN_KINDS = (FILE_ENTRY, DIR_ENTRY, LINK_ENTRY)
+_SCAN_KIND_CODES = {kind: code for code, kind in enumerate(_SCAN_KINDS)}
+_SCAN_KIND_MASK = 0x03
+_SCAN_NO_STAT = 0x04  # The stat failed: size and mtime unknown
+_SCAN_REVISIT = 0x08  # Directory already listed through another path
+
+
+class ScanResult:
+    """
+    Compact, column-oriented result of a tree scan.
+
+    Paths are not stored. Each directory is an interned name plus the
+    index of its parent directory, and each entry is the index of its
+    directory, its name in one shared UTF-8 buffer, its size and mtime
+    (the float st_mtime) in array columns and a flag byte, about 40 bytes of
+    columns plus the name, against a few hundred for a path string and
+    a record dict. Paths and records are built only when accessed.
+
+    As a sequence, a ScanResult holds the entries' relative paths in walk
+    order, the order of find_files_by_extension and the tree view, so it
+    can stand in for find's list. record(i) returns the full
+    iter_tree_records dict of an entry. A full scan (no ``extension``)
+    can be passed to render_directory_tree instead of a directory path.
+    Build one with scan_tree().
+    """
+
+    def __init__(self, root, files_only=False, max_depth=None, base=""):
+        self.root = root
+        self.files_only = files_only
+        self.max_depth = max_depth
+        self.valid = True
+        # Directory 0 is the root; its name is the prefix of every path
+        self._dir_names = [base]
+        self._dir_parents = array("l", [-1])
+        self._parents = array("L")
+        self._names = bytearray()
+        self._name_ends = array("Q")
+        self._sizes = array("Q")
+        self._mtimes = array("d")
+        self._flags = bytearray()
+        self._links = {}  # Entry index -> symlink target
+        self._errors = {}  # Directory index -> why it could not be listed
+        # Directories whose listing ends with entries the tree view does not
+        # show (kind None: sockets, FIFOs, broken links); they still decide
+        # which shown entry is drawn as the last one
+        self._hidden_tails = set()
+
+    def __len__(self):
+        return len(self._flags)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ScanResult index out of range")
+        return self._join(self._dir_path(self._parents[index]), self.name(index))
+
+    def __iter__(self):
+        dir_paths = {}
+        for index, parent in enumerate(self._parents):
+            base = dir_paths.get(parent)
+            if base is None:
+                base = dir_paths[parent] = self._dir_path(parent)
+            yield self._join(base, self.name(index))
+
+    def __repr__(self):
+        return (f"ScanResult({self.root!r}, {len(self)} entries, "
+                f"{len(self._dir_names)} directories)")
+
+    @property
+    def directories(self):
+        """Number of directories in the directory table, the root included."""
+        return len(self._dir_names)
+
+    def name(self, index):
+        """Return an entry's file name."""
+        start = self._name_ends[index - 1] if index else 0
+        return self._names[start:self._name_ends[index]].decode(
+            "utf-8", "surrogateescape")
+
+    def kind(self, index):
+        """Return an entry's kind: FILE_ENTRY, DIR_ENTRY or LINK_ENTRY."""
+        return _SCAN_KINDS[self._flags[index] & _SCAN_KIND_MASK]
+
+    def size(self, index):
+        """Return an entry's size in bytes, or None if it could not be stat'ed."""
+        return None if self._flags[index] & _SCAN_NO_STAT else self._sizes[index]
+
+    def record(self, index):
+        """Return an entry as an iter_tree_records dict."""
+        if index < 0:
+            index += len(self)
+        no_stat = self._flags[index] & _SCAN_NO_STAT
+        return {"path": self[index], "type": self.kind(index),
+                "size": None if no_stat else self._sizes[index],
+                "depth": self._dir_depth(self._parents[index]),
+                "mtime": None if no_stat else self._mtimes[index]}
+
+    def records(self):
+        """Yield every entry as an iter_tree_records dict."""
+        for index in range(len(self)):
+            yield self.record(index)
+
+    def memory_size(self):
+        """Return the bytes held by the columns and the directory table."""
+        columns = (self._dir_parents, self._parents, self._names,
+                   self._name_ends, self._sizes, self._mtimes, self._flags,
+                   self._dir_names)
+        names = {id(name): sys.getsizeof(name) for name in self._dir_names}
+        return sum(map(sys.getsizeof, columns)) + sum(names.values())
+
+    def render(self, out, max_depth=3, prefix="", current_depth=0):
+        """
+        Write the scanned tree to a TreeWriter as list_directory_tree would.
+
+        The output matches a live walk of the same tree with the same
+        ``max_depth``; directories below the scan's own max_depth are
+        shown as "max depth reached". Only full scans can be rendered.
+        """
+        if self.files_only:
+            raise ValueError("only a full scan (without extension) can be "
+                             "rendered as a tree")
+        if not self.valid:
+            out.line(f"Error: '{self.root}' is not a valid directory.")
+            return
+        limit = max_depth - current_depth
+        if self.max_depth is not None:
+            limit = min(limit, self.max_depth)
+
+        count = len(self)
+        # In walk order an entry is the last of its directory when no later
+        # entry has the same parent
+        last = bytearray(count)
+        has_children = bytearray(self.directories)
+        for directory in self._hidden_tails:
+            has_children[directory] = 1
+        for index in range(count - 1, -1, -1):
+            parent = self._parents[index]
+            if not has_children[parent]:
+                has_children[parent] = last[index] = 1
+
+        depths = self._dir_depths()
+        prefixes = [prefix]
+        if not self._render_listing(out, 0, prefix, limit, has_children):
+            return
+        directory = 0
+        for index in range(count):
+            flags = self._flags[index]
+            kind = _SCAN_KINDS[flags & _SCAN_KIND_MASK]
+            if kind == DIR_ENTRY:
+                directory += 1  # Directories are numbered in walk order
+            depth = depths[self._parents[index]]
+            if depth >= limit:
+                continue
+
+            base = prefixes[depth]
+            if last[index]:
+                current_prefix, next_prefix = base + "└── ", base + "    "
+            else:
+                current_prefix, next_prefix = base + "├── ", base + "│   "
+            name = self.name(index)
+
+            if kind == FILE_ENTRY:
+                if flags & _SCAN_NO_STAT:
+                    out.entry(f"{current_prefix}{name} (size unknown)")
+                else:
+                    out.entry(f"{current_prefix}{name} ({self._sizes[index]} bytes)")
+            elif kind == DIR_ENTRY:
+                if flags & _SCAN_REVISIT:
+                    out.entry(f"{current_prefix}{name}/ (already listed, skipped)")
+                elif out.entry(f"{current_prefix}{name}/"):
+                    del prefixes[depth + 1:]
+                    prefixes.append(next_prefix)
+                    self._render_listing(out, directory, next_prefix, limit,
+                                         has_children)
+            else:
+                out.entry(f"{current_prefix}{name} -> {self._links.get(index, '?')}")
+
+            if out.truncated:
+                return
+
+    def _render_listing(self, out, directory, prefix, limit, has_children):
+        """Write the line that replaces a directory's entries, if any."""
+        if self._dir_depth(directory) >= limit:
+            out.line(f"{prefix}... (max depth reached)")
+        elif directory in self._errors:
+            out.line(f"{prefix}Error accessing directory: {self._errors[directory]}")
+        elif not has_children[directory]:
+            out.line(f"{prefix}(empty directory)")
+        else:
+            return True
+        return False
+
+    def _add_directory(self, parent, name):
+        """Add a directory to the directory table; return its index."""
+        self._dir_names.append(sys.intern(name))
+        self._dir_parents.append(parent)
+        return len(self._dir_names) - 1
+
+    def _add(self, parent, name, kind, st=None, flags=0):
+        """Append an entry, with its size and mtime from ``st``."""
+        self._parents.append(parent)
+        self._names += name.encode("utf-8", "surrogateescape")
+        self._name_ends.append(len(self._names))
+        if st is None:
+            flags |= _SCAN_NO_STAT
+            self._sizes.append(0)
+            self._mtimes.append(0.0)
+        else:
+            self._sizes.append(st.st_size)
+            self._mtimes.append(st.st_mtime)
+        self._flags.append(_SCAN_KIND_CODES[kind] | flags)
+        return len(self._flags) - 1
+
+    def _dir_path(self, directory):
+        parts = []
+        while directory > 0:
+            parts.append(self._dir_names[directory])
+            directory = self._dir_parents[directory]
+        if self._dir_names[0]:
+            parts.append(self._dir_names[0])
+        return os.path.join(*reversed(parts)) if parts else ""
+
+    def _dir_depth(self, directory):
+        """Depth of the entries inside a directory (0 for the root's)."""
+        depth = 0
+        while directory > 0:
+            depth += 1
+            directory = self._dir_parents[directory]
+        return depth
+
+    def _dir_depths(self):
+        depths = array("l", [0])
+        for directory in range(1, self.directories):
+            depths.append(depths[self._dir_parents[directory]] + 1)
+        return depths
+
+    @staticmethod
+    def _join(base, name):
+        return os.path.join(base, name) if base else name
+
+
+def scan_tree(directory, max_depth=None, extension=None, stats=None,
+              exclude=None, follow_symlinks=False, limit=None, base=""):
+    """
+    Walk a tree once into a ScanResult.
+
+    Takes the options of iter_tree_records: ``max_depth``, ``exclude``,
+    ``follow_symlinks``, and ``extension``, which turns the scan into a
+    search that keeps only matching files (and can stop after ``limit``
+    of them). ``base`` is prepended to every path, like find's
+    ``current_path``. Entries are stat'ed once, not following symlinks
+    for LINK_ENTRY entries. Unlike iter_tree_records, a full scan keeps
+    directories reached a second time (as entries without children), so
+    the tree view can show them as skipped. The walk's counters are
+    published as ``last_walk_stats``.
+    """
+    result = ScanResult(directory, extension is not None, max_depth, base)
+    if (max_depth is not None and max_depth <= 0) or (limit is not None
+                                                       and limit <= 0):
+        return result
+    stats = _start_walk(stats, f"scan {directory}")
+    try:
+        _scan_into(result, directory, max_depth,
+                   ExtensionMatcher(extension) if extension is not None else None,
+                   stats, _exclude_rules(exclude, directory),
+                   _visited_directories(directory, follow_symlinks, stats), limit)
+    finally:
+        stats.finish()
+    return result
+
+
+def _scan_into(result, directory, max_depth, matcher, stats, rules, visited,
+               limit):
+    """The walk behind scan_tree."""
+    if not _is_directory(directory, None, stats):
+        result.valid = False
+        return
+    try:
+        items = scan_directory(directory, stats)
+    except (OSError, PermissionError) as e:
+        stats.errors += 1
+        result._errors[0] = e
+        return  # Skip inaccessible directories
+    rules, items = _filter_excluded(directory, items, rules)
+    # Frames are [items, directory index, depth, rules, last entry hidden]
+    stack = [[iter(items), 0, 0, rules, False]]
+    files_only = matcher is not None
+    found = 0
+
+    while stack:
+        frame = stack[-1]
+        items, parent, depth, rules, hidden = frame
+        item = next(items, None)
+        if item is None:
+            if hidden:
+                result._hidden_tails.add(parent)
+            stack.pop()
+            continue
+
+        kind = entry_kind(item, stats, visited is not None)
+        frame[4] = kind is None
+        if kind == FILE_ENTRY:
+            if files_only and matcher.match(item.name) is None:
+                continue
+            result._add(parent, item.name, kind, _entry_stat(item, kind, stats))
+            found += 1
+            if limit is not None and found >= limit:
+                return
+
+        elif kind == DIR_ENTRY:
+            first = _first_visit(item, visited, stats)
+            if files_only:
+                if not first or (max_depth is not None and depth + 1 >= max_depth):
+                    continue
+                index = result._add_directory(parent, item.name)
+            else:
+                result._add(parent, item.name, kind,
+                            _entry_stat(item, kind, stats) if first else None,
+                            0 if first else _SCAN_REVISIT)
+                index = result._add_directory(parent, item.name)
+                if not first or (max_depth is not None and depth + 1 >= max_depth):
+                    continue
+            try:
+                sub_items = scan_directory(item.path, stats)
+            except (OSError, PermissionError) as e:
+                stats.errors += 1
+                result._errors[index] = e
+                continue  # Skip inaccessible directories
+            sub_rules, sub_items = _filter_excluded(item.path, sub_items, rules)
+            stack.append([iter(sub_items), index, depth + 1, sub_rules, False])
+
+        elif kind == LINK_ENTRY and not files_only:
+            index = result._add(parent, item.name, kind,
+                                _entry_stat(item, kind, stats))
+            result._links[index] = _link_target(item)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Python CLI File Manager - Snapshot Module
+Saves a scan of a directory tree (paths, sizes and mtimes) to a compact
+binary file, and compares two scans, or a scan and the live tree, in one
+sorted merge. Uses only standard library modules.
+"""
+
+import mmap
+import os
+import struct
+import time
+
+from file_exclude import ExcludeRules
+from file_manager import DIR_ENTRY, FILE_ENTRY, LINK_ENTRY, iter_tree_records
+from file_watch import ADDED, REMOVED
+
+
+# A snapshot is a header, the UTF-8 root path, the exclude patterns of the
+# scan (UTF-8, one per line), then one record per entry in the walk order
+# of iter_tree_records. Each record stores how many
+# bytes its path shares with the previous path and the rest of the path,
+# so the common directory prefixes are written once.
+SNAPSHOT_MAGIC = b"FMSNAP2\n"
+# magic, entry count, creation time (epoch seconds), root path length,
+# scan option flags, exclude patterns length
+_HEADER = struct.Struct("<8sQdHBH")
+_FOLLOW_SYMLINKS = 0x01  # Option flag: symlinked directories were walked
+_GITIGNORE = 0x02  # Option flag: .gitignore files were honored
+# shared prefix length, suffix length, kind, size, mtime (epoch seconds)
+_RECORD = struct.Struct("<HHBQd")
+_KINDS = (FILE_ENTRY, DIR_ENTRY, LINK_ENTRY)
+_KIND_CODES = {kind: code for code, kind in enumerate(_KINDS)}
+_NO_STAT = 0x80  # Kind flag: the stat failed, size and mtime are unknown
+
+# Change kind reported by diff_entries() besides ADDED and REMOVED
+MODIFIED = "modified"
+
+
+def save_snapshot(directory, path, stats=None, exclude=None,
+                  follow_symlinks=False):
+    """
+    Scan a directory tree into a snapshot file; return the number of entries.
+
+    Records are written as the walk (iter_tree_records, with its
+    ``exclude`` and ``follow_symlinks`` options) produces them, so memory
+    use does not grow with the tree. The file is written next to ``path``
+    and renamed into place once complete, so an interrupted scan never
+    leaves a partial snapshot behind. The options are saved with the
+    snapshot, so diff_snapshots() can scan a directory the same way.
+    Raises OSError if it cannot be written.
+    """
+    root = os.path.abspath(directory).encode("utf-8", "surrogateescape")
+    if isinstance(exclude, ExcludeRules):
+        patterns, gitignore = exclude.patterns, exclude.gitignore
+    elif isinstance(exclude, str):
+        patterns, gitignore = [exclude], False
+    else:
+        patterns, gitignore = list(exclude or ()), False
+    patterns = "\n".join(patterns).encode("utf-8", "surrogateescape")
+    flags = ((_FOLLOW_SYMLINKS if follow_symlinks else 0)
+             | (_GITIGNORE if gitignore else 0))
+    records = iter_tree_records(directory, stats=stats, exclude=exclude,
+                                follow_symlinks=follow_symlinks)
+    temporary = f"{path}.tmp"
+    count = 0
+    try:
+        with open(temporary, "wb") as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, 0, time.time(), len(root),
+                                 flags, len(patterns)))
+            f.write(root)
+            f.write(patterns)
+            pack = _RECORD.pack
+            previous = b""
+            for record in records:
+                encoded = record["path"].encode("utf-8", "surrogateescape")
+                shared = len(os.path.commonprefix((previous, encoded)))
+                kind = _KIND_CODES[record["type"]]
+                if record["size"] is None:
+                    f.write(pack(shared, len(encoded) - shared, kind | _NO_STAT,
+                                 0, 0.0))
+                else:
+                    f.write(pack(shared, len(encoded) - shared, kind,
+                                 record["size"], record["mtime"]))
+                f.write(encoded[shared:])
+                previous = encoded
+                count += 1
+            # The count is filled in last: a header without it is invalid
+            f.seek(0)
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, count, time.time(), len(root),
+                                 flags, len(patterns)))
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+    return count
+
+
+class Snapshot:
+    """
+    A snapshot file, mapped into memory with mmap.
+
+    Iterating yields (path, kind, size, mtime) tuples in walk order,
+    decoded from the mapping as they are needed, with size and mtime None
+    for entries that could not be stat'ed. ``root`` is the absolute path
+    that was scanned and ``created`` the time the scan finished;
+    ``exclude``, ``gitignore`` and ``follow_symlinks`` are the options of
+    the scan. Raises
+    ValueError for a file that is not a complete snapshot, and OSError if
+    it cannot be read. Use as a context manager, or call close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # An empty file cannot be mapped
+                raise ValueError(f"'{path}' is not a snapshot file") from None
+        try:
+            magic, self.count, self.created, root_length, flags, \
+                patterns_length = _HEADER.unpack_from(self._map)
+        except struct.error:
+            magic = None
+        if magic != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError(f"'{path}' is not a snapshot file")
+        root_end = _HEADER.size + root_length
+        self._start = root_end + patterns_length
+        self.root = self._map[_HEADER.size:root_end].decode(
+            "utf-8", "surrogateescape")
+        patterns = self._map[root_end:self._start].decode(
+            "utf-8", "surrogateescape")
+        self.exclude = patterns.split("\n") if patterns else []
+        self.gitignore = bool(flags & _GITIGNORE)
+        self.follow_symlinks = bool(flags & _FOLLOW_SYMLINKS)
+
+    def __len__(self):
+        return self.count
+
+    def exclude_rules(self):
+        """Return the ExcludeRules the scan used, or None."""
+        if not self.exclude and not self.gitignore:
+            return None
+        return ExcludeRules(self.exclude, gitignore=self.gitignore)
+
+    def __iter__(self):
+        data = self._map
+        unpack = _RECORD.unpack_from
+        record_size = _RECORD.size
+        offset = self._start
+        previous = b""
+        for _ in range(self.count):
+            try:
+                shared, length, kind, size, mtime = unpack(data, offset)
+            except struct.error:
+                raise ValueError(f"'{self.path}' is truncated") from None
+            offset += record_size
+            encoded = previous[:shared] + data[offset:offset + length]
+            offset += length
+            previous = encoded
+            if kind & _NO_STAT:
+                yield (encoded.decode("utf-8", "surrogateescape"),
+                       _KINDS[kind & ~_NO_STAT], None, None)
+            else:
+                yield (encoded.decode("utf-8", "surrogateescape"), _KINDS[kind],
+                       size, mtime)
+        if offset != len(data):
+            raise ValueError(f"'{self.path}' has trailing data")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+
+def scan_entries(directory, stats=None, exclude=None, follow_symlinks=False):
+    """Yield the live tree as the (path, kind, size, mtime) tuples of a Snapshot."""
+    for record in iter_tree_records(directory, stats=stats, exclude=exclude,
+                                    follow_symlinks=follow_symlinks):
+        yield record["path"], record["type"], record["size"], record["mtime"]
+
+
+def diff_entries(old, new):
+    """
+    Compare two walk-ordered streams of (path, kind, size, mtime) entries.
+
+    Both streams are read once, side by side: the walk visits names in
+    sorted order, so comparing the paths' component lists tells which
+    stream is behind, and the comparison takes linear time and constant
+    memory. Yields (kind, path, old size, new size) changes, as
+    TreeWatcher.poll() reports them, with kind one of ADDED, REMOVED and
+    MODIFIED (a file or link whose size or mtime changed) and directory
+    paths ending in os.sep. An entry whose type changed is reported as
+    removed and added.
+    """
+    old = iter(old)
+    new = iter(new)
+    before = next(old, None)
+    after = next(new, None)
+    before_key = before and before[0].split(os.sep)
+    after_key = after and after[0].split(os.sep)
+
+    while before is not None or after is not None:
+        if after is None or (before is not None and before_key < after_key):
+            yield REMOVED, _display_path(before), before[2], None
+            before = next(old, None)
+            before_key = before and before[0].split(os.sep)
+            continue
+        if before is None or after_key < before_key:
+            yield ADDED, _display_path(after), None, after[2]
+            after = next(new, None)
+            after_key = after and after[0].split(os.sep)
+            continue
+
+        if before[1] != after[1]:
+            yield REMOVED, _display_path(before), before[2], None
+            yield ADDED, _display_path(after), None, after[2]
+        elif before[1] != DIR_ENTRY and before[2:] != after[2:]:
+            yield MODIFIED, after[0], before[2], after[2]
+        before = next(old, None)
+        before_key = before and before[0].split(os.sep)
+        after = next(new, None)
+        after_key = after and after[0].split(os.sep)
+
+
+def _display_path(entry):
+    return entry[0] + os.sep if entry[1] == DIR_ENTRY else entry[0]
+
+
+def diff_snapshots(old, new, stats=None, exclude=None, follow_symlinks=None):
+    """
+    Yield the changes from one scan to another, as diff_entries does.
+
+    ``old`` and ``new`` are snapshot files or directories; a directory is
+    scanned live (with ``stats`` counting the walk), so a snapshot can be
+    compared with the current tree without saving a second one. The live
+    scan uses ``exclude`` and ``follow_symlinks``; left as None, they
+    default to the options of the snapshot on the other side, so a
+    snapshot compares cleanly with its own unchanged directory. Raises
+    ValueError or OSError, before the first change, for a bad snapshot.
+    """
+    paths = (old, new)
+    sources = [None, None]
+    try:
+        for index, source in enumerate(paths):
+            if not os.path.isdir(source):
+                sources[index] = Snapshot(source)
+    except (OSError, ValueError):
+        for source in sources:
+            if source is not None:
+                source.close()
+        raise
+
+    saved = sources[0] or sources[1]
+    if exclude is None and saved is not None:
+        exclude = saved.exclude_rules()
+    if follow_symlinks is None:
+        follow_symlinks = saved is not None and saved.follow_symlinks
+    for index, source in enumerate(paths):
+        if sources[index] is None:
+            sources[index] = scan_entries(source, stats, exclude, follow_symlinks)
+    return _diff_sources(*sources)
+
+
+def _diff_sources(old, new):
+    """Generator behind diff_snapshots, closing the snapshots when done."""
+    try:
+        yield from diff_entries(old, new)
+    finally:
+        for source in (old, new):
+            if isinstance(source, Snapshot):
+                source.close()
+
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Python CLI File Manager - Watch Module
+Polls a directory tree and reports what changed between polls, re-listing
+only the directories whose mtime changed. Uses only standard library
+modules and no OS-specific notification APIs.
+"""
+
+import os
+import sys
+import time
+
+from file_manager import (DIR_ENTRY, FILE_ENTRY, WalkStats, entry_kind,
+                          entry_size, scan_directory)
+
+
+# Change kinds reported by TreeWatcher.poll()
+ADDED = "added"
+REMOVED = "removed"
+RESIZED = "resized"
+
+# Directory mtimes this recent are not trusted: a change made in the same
+# timestamp tick as the listing would leave the mtime unchanged (coarse
+# clocks, 2 s on FAT), so such directories are re-listed on the next poll.
+RACY_MTIME_NS = 2 * 10 ** 9
+
+
+class TreeWatcher:
+    """
+    In-memory scan of a directory tree that can be brought up to date.
+
+    The listing of every directory is kept together with the directory's
+    mtime. A poll stats each known directory and re-lists only those whose
+    mtime changed; the others reuse their cached listing, subtrees
+    included. Creating, removing or renaming an entry changes its parent
+    directory's mtime, but writing to a file does not, so a file resized
+    in place is only noticed when its directory is re-listed anyway,
+    unless ``stat_files`` is set, which stats every file on each poll.
+    Directories modified within RACY_MTIME_NS of a listing are re-listed
+    until their mtime is old enough to be trusted.
+    """
+
+    def __init__(self, root, stat_files=False):
+        self.root = root
+        self.stat_files = stat_files
+        # relative directory -> (mtime_ns, {name: (kind, size)})
+        self._listings = {}
+
+    def poll(self, stats=None):
+        """
+        Rescan the tree and return the changes since the previous poll.
+
+        The first poll only records the tree and returns no changes. A
+        change is a (kind, path, old size, new size) tuple with kind one
+        of ADDED, REMOVED and RESIZED, path relative to the root (ending
+        in os.sep for directories) and sizes None where they do not apply.
+        Changes are returned in the tree view's order.
+        """
+        stats = (stats if stats is not None else WalkStats()).start(
+            f"watch {self.root}")
+        changes = [] if self._listings else None
+        try:
+            stack = [""]
+            while stack:
+                relative = stack.pop()
+                entries = self._update_directory(relative, changes, stats)
+                stack.extend(sorted(
+                    (os.path.join(relative, name) if relative else name
+                     for name, (kind, _) in entries.items() if kind == DIR_ENTRY),
+                    reverse=True))
+        finally:
+            stats.finish()
+
+        if not changes:
+            return []
+        changes.sort(key=_change_key)
+        return changes
+
+    def _update_directory(self, relative, changes, stats):
+        """Bring one directory's listing up to date; return its entries."""
+        path = os.path.join(self.root, relative) if relative else self.root
+        cached = self._listings.get(relative)
+        try:
+            stats.stat_calls += 1
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            # Gone since its parent was listed; the parent reports it next
+            # poll. Only the root has no parent to do that.
+            stats.errors += 1
+            if relative == "" and cached is not None:
+                self._forget(relative, changes)
+            return {}
+
+        if cached is not None and cached[0] == mtime_ns:
+            entries = cached[1]
+            if self.stat_files and changes is not None:
+                self._restat_files(relative, path, entries, changes, stats)
+            return entries
+
+        try:
+            items = scan_directory(path, stats)
+        except (OSError, PermissionError):
+            stats.errors += 1  # Keep what we knew of an unreadable directory
+            return cached[1] if cached is not None else {}
+
+        entries = {}
+        for item in items:
+            kind = entry_kind(item, stats)
+            if kind == FILE_ENTRY:
+                try:
+                    entries[item.name] = (kind, entry_size(item, stats,
+                                                           use_cache=False))
+                except OSError:
+                    stats.errors += 1
+            elif kind == DIR_ENTRY:
+                entries[item.name] = (kind, None)
+
+        if changes is not None:
+            self._diff_listing(relative, cached[1] if cached else {}, entries,
+                               changes)
+        if time.time_ns() - mtime_ns < RACY_MTIME_NS:
+            mtime_ns = None  # Too recent to trust: re-list on the next poll
+        self._listings[relative] = (mtime_ns, entries)
+        return entries
+
+    def _diff_listing(self, relative, old, new, changes):
+        """Record the differences between two listings of a directory."""
+        for name, (kind, size) in new.items():
+            path = os.path.join(relative, name) if relative else name
+            previous = old.get(name)
+            if previous is not None and previous[0] != kind:
+                self._report_removed(path, previous, changes)
+                previous = None
+            if previous is None:
+                changes.append((ADDED, _display_path(path, kind), None, size))
+            elif kind == FILE_ENTRY and previous[1] != size:
+                changes.append((RESIZED, path, previous[1], size))
+
+        for name in old.keys() - new.keys():
+            path = os.path.join(relative, name) if relative else name
+            self._report_removed(path, old[name], changes)
+
+    def _report_removed(self, path, entry, changes):
+        """Record the removal of an entry, and of everything below a directory."""
+        kind, size = entry
+        changes.append((REMOVED, _display_path(path, kind), size, None))
+        if kind == DIR_ENTRY:
+            self._forget(path, changes)
+
+    def _forget(self, relative, changes):
+        """Drop a directory's cached subtree, recording its entries as removed."""
+        cached = self._listings.pop(relative, None)
+        if cached is None:
+            return
+        for name, entry in cached[1].items():
+            path = os.path.join(relative, name) if relative else name
+            if changes is not None:
+                self._report_removed(path, entry, changes)
+            elif entry[0] == DIR_ENTRY:
+                self._forget(path, None)
+
+    def _restat_files(self, relative, path, entries, changes, stats):
+        """Stat the files of an unchanged directory to catch in-place resizes."""
+        for name, (kind, size) in list(entries.items()):
+            if kind != FILE_ENTRY:
+                continue
+            try:
+                stats.stat_calls += 1
+                new_size = os.stat(os.path.join(path, name)).st_size
+            except OSError:
+                stats.errors += 1
+                continue
+            if new_size != size:
+                entries[name] = (kind, new_size)
+                changes.append((RESIZED, os.path.join(relative, name)
+                                if relative else name, size, new_size))
+
+
+def _display_path(path, kind):
+    return path + os.sep if kind == DIR_ENTRY else path
+
+
+def _change_key(change):
+    return change[1].rstrip(os.sep).split(os.sep)
+
+
+def format_change(change):
+    """Format a change as one line: "+ path", "- path" or "~ path (old -> new)"."""
+    kind, path, old_size, new_size = change
+    if kind == ADDED:
+        return f"+ {path}" if new_size is None else f"+ {path} ({new_size} bytes)"
+    if kind == REMOVED:
+        return f"- {path}"
+    return f"~ {path} ({old_size} -> {new_size} bytes)"
+
+
+def watch_directory(directory, interval=2.0, polls=None, stat_files=False,
+                    stream=None):
+    """
+    Poll a directory tree every ``interval`` seconds and print the changes.
+
+    Each poll that finds changes prints them under a timestamp. Runs until
+    interrupted, or for ``polls`` polls after the initial scan. Output goes
+    to ``stream`` (default stdout) and is flushed after every poll.
+    """
+    stream = stream or sys.stdout
+    watcher = TreeWatcher(directory, stat_files)
+    watcher.poll()
+    stream.write(f"Watching '{directory}' every {interval:g} s "
+                 f"(Ctrl+C to stop)\n")
+    stream.flush()
+
+    count = 0
+    while polls is None or count < polls:
+        time.sleep(interval)
+        count += 1
+        changes = watcher.poll()
+        if changes:
+            lines = [f"[{time.strftime('%H:%M:%S')}] {len(changes)} change(s)"]
+            lines.extend(format_change(change) for change in changes)
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
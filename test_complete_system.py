@@ -14,6 +14,11 @@ from unittest.mock import patch
 
 # Import the modules
 import file_manager
+import file_cache
+import file_exclude
+import file_index
+import file_scan
+import file_snapshot
 import cli
 
 
@@ -647,6 +652,1872 @@ class TestFileManagerTODOTasks(unittest.TestCase):
         self.assertTrue(True)
 
 
+class TempTreeTestCase(unittest.TestCase):
+    """Base class for test cases that work in a fresh temporary directory."""
+
+    def setUp(self):
+        import tempfile
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _make_tree(self, files, directories=(), root=None):
+        """
+        Create ``files`` (relative path -> str or bytes contents) and the
+        empty ``directories`` below ``root`` (default: temp_dir), together
+        with any missing parent directories.
+        """
+        root = self.temp_dir if root is None else root
+        for directory in directories:
+            os.makedirs(os.path.join(root, directory), exist_ok=True)
+        for path, data in files.items():
+            full = os.path.join(root, path)
+            os.makedirs(os.path.dirname(full), exist_ok=True)
+            with open(full, "wb" if isinstance(data, bytes) else "w") as f:
+                f.write(data)
+
+
+class TestScandirWalker(TempTreeTestCase):
+    """Test cases for the os.scandir based traversal engine."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree({"README.md": "hello",
+                         os.path.join("src", "main.py"): "print(1)",
+                         os.path.join("src", "pkg", "util.PY"): "x = 1"},
+                        directories=["empty"])
+
+    def test_tree_output_format(self):
+        """Tree output keeps the sorted box-drawing layout and file sizes."""
+        captured_output = io.StringIO()
+        with redirect_stdout(captured_output):
+            file_manager.list_directory_tree(self.temp_dir, max_depth=3)
+
+        self.assertEqual(captured_output.getvalue().splitlines(), [
+            "├── README.md (5 bytes)",
+            "├── empty/",
+            "│   (empty directory)",
+            "└── src/",
+            "    ├── main.py (8 bytes)",
+            "    └── pkg/",
+            "        └── util.PY (5 bytes)",
+        ])
+
+    def test_find_files_sorted_and_case_insensitive(self):
+        """Find returns relative paths in sorted walk order."""
+        result = file_manager.find_files_by_extension(self.temp_dir, ".py")
+        self.assertEqual(result, [os.path.join("src", "main.py"),
+                                  os.path.join("src", "pkg", "util.PY")])
+
+    def test_walk_syscall_counts(self):
+        """One listing per directory and one stat per file, nothing per entry."""
+        stats = file_manager.WalkStats()
+        with redirect_stdout(io.StringIO()):
+            file_manager.list_directory_tree(self.temp_dir, max_depth=10,
+                                             stats=stats)
+        # 4 directories listed; 3 file sizes plus the root isdir check
+        self.assertEqual(stats.scandir_calls, 4)
+        self.assertEqual(stats.stat_calls, 4)
+
+        stats = file_manager.WalkStats()
+        file_manager.find_files_by_extension(self.temp_dir, ".py", stats=stats)
+        self.assertEqual(stats.scandir_calls, 4)
+        self.assertEqual(stats.stat_calls, 1)
+
+
+class TestStreamingFind(TempTreeTestCase):
+    """Test cases for the iter_files_by_extension generator."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree({os.path.join(sub, f"file{n}.txt"): "x"
+                         for sub in ("a", "b", "c") for n in range(3)})
+
+    def test_generator_matches_list(self):
+        """The generator yields exactly what find_files_by_extension returns."""
+        result = list(file_manager.iter_files_by_extension(self.temp_dir, ".txt"))
+        self.assertEqual(len(result), 9)
+        self.assertEqual(result,
+                         file_manager.find_files_by_extension(self.temp_dir, ".txt"))
+
+    def test_limit_stops_walk_early(self):
+        """With a limit, directories past the last match are never listed."""
+        stats = file_manager.WalkStats()
+        result = list(file_manager.iter_files_by_extension(
+            self.temp_dir, ".txt", limit=2, stats=stats))
+        self.assertEqual(result, [os.path.join("a", "file0.txt"),
+                                  os.path.join("a", "file1.txt")])
+        # Only the root and "a" were listed
+        self.assertEqual(stats.scandir_calls, 2)
+
+    def test_invalid_directory_yields_nothing(self):
+        """An invalid directory produces an empty generator."""
+        self.assertEqual(
+            list(file_manager.iter_files_by_extension("nonexistent_dir_9", ".txt")), [])
+
+
+class TestIterativeTraversal(TempTreeTestCase):
+    """Test cases for the explicit-stack traversal mode."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree(dict.fromkeys(
+            ["top.py", os.path.join("a", "one.py"),
+             os.path.join("a", "b", "two.txt"),
+             os.path.join("a", "b", "c", "d", "deep.py"), "z.py"], "data"),
+            directories=["empty"])
+
+    def _tree(self, **kwargs):
+        captured_output = io.StringIO()
+        with redirect_stdout(captured_output):
+            file_manager.list_directory_tree(self.temp_dir, **kwargs)
+        return captured_output.getvalue()
+
+    def test_tree_output_identical(self):
+        """Iterative tree output matches the recursive output exactly."""
+        for max_depth in (0, 1, 3, 10):
+            self.assertEqual(self._tree(max_depth=max_depth, iterative=True),
+                             self._tree(max_depth=max_depth))
+
+    def test_find_order_identical(self):
+        """Iterative search returns the same paths in the same order."""
+        self.assertEqual(
+            file_manager.find_files_by_extension(self.temp_dir, ".py", iterative=True),
+            file_manager.find_files_by_extension(self.temp_dir, ".py"))
+        self.assertEqual(
+            file_manager.find_files_by_extension(self.temp_dir, ".py", "base",
+                                                 iterative=True),
+            file_manager.find_files_by_extension(self.temp_dir, ".py", "base"))
+
+    @staticmethod
+    def _remove_chain(deep_dir, depth):
+        os.remove(os.path.join(deep_dir, "bottom.py"))
+        for _ in range(depth):
+            os.rmdir(deep_dir)
+            deep_dir = os.path.dirname(deep_dir)
+
+    def test_deeper_than_recursion_limit(self):
+        """Trees deeper than the recursion limit are walked iteratively."""
+        depth = sys.getrecursionlimit() + 50
+        # os.makedirs and shutil.rmtree recurse too, so build and remove by hand
+        deep_dir = self.temp_dir
+        for _ in range(depth):
+            deep_dir = os.path.join(deep_dir, "d")
+            os.mkdir(deep_dir)
+        with open(os.path.join(deep_dir, "bottom.py"), "w") as f:
+            f.write("data")
+
+        try:
+            with self.assertRaises(RecursionError):
+                file_manager.find_files_by_extension(self.temp_dir, ".py")
+
+            result = file_manager.find_files_by_extension(self.temp_dir, ".py",
+                                                          iterative=True)
+            self.assertIn(os.path.join(*(["d"] * depth), "bottom.py"), result)
+
+            output = self._tree(max_depth=depth + 1, iterative=True)
+            self.assertIn("bottom.py (4 bytes)", output)
+        finally:
+            self._remove_chain(deep_dir, depth)
+
+
+class TestThreadedFind(TempTreeTestCase):
+    """Test cases for find_files_by_extension(workers=N) and (processes=N)."""
+
+    def setUp(self):
+        super().setUp()
+        deep = os.path.join("a", "inner", "deeper", "deepest")
+        self._make_tree(dict.fromkeys(
+            ["a.py", "z.py", os.path.join("a", "x.py"),
+             os.path.join("a", "inner", "y.py"), os.path.join(deep, "q.py"),
+             os.path.join("a.d", "w.py"), os.path.join("b", "v.txt")], "data"))
+
+    def test_matches_serial_order(self):
+        """Threaded results are merged into the serial walk order."""
+        serial = file_manager.find_files_by_extension(self.temp_dir, ".py")
+        for workers in (1, 4):
+            self.assertEqual(
+                file_manager.find_files_by_extension(self.temp_dir, ".py",
+                                                     workers=workers),
+                serial)
+        self.assertEqual(
+            file_manager.find_files_by_extension(self.temp_dir, ".py", "base",
+                                                 limit=2, workers=2),
+            file_manager.find_files_by_extension(self.temp_dir, ".py", "base",
+                                                 limit=2))
+
+    def test_stats_merged_from_workers(self):
+        """Per-task counters add up to the serial walk's counters."""
+        serial_stats = file_manager.WalkStats()
+        file_manager.find_files_by_extension(self.temp_dir, ".py",
+                                             stats=serial_stats)
+        threaded_stats = file_manager.WalkStats()
+        file_manager.find_files_by_extension(self.temp_dir, ".py", workers=3,
+                                             stats=threaded_stats)
+        self.assertEqual(threaded_stats.syscalls, serial_stats.syscalls)
+
+    def test_invalid_directory(self):
+        """An invalid directory returns an empty list."""
+        self.assertEqual(
+            file_manager.find_files_by_extension("nonexistent_dir_9", ".py",
+                                                 workers=2), [])
+
+    def test_process_shards_match_serial_order(self):
+        """Sharded process-pool results come back in the serial order."""
+        serial_stats = file_manager.WalkStats()
+        serial = file_manager.find_files_by_extension(self.temp_dir, ".py", "base",
+                                                      stats=serial_stats)
+        sharded_stats = file_manager.WalkStats()
+        sharded = file_manager.find_files_by_extension(self.temp_dir, ".py", "base",
+                                                       processes=2,
+                                                       stats=sharded_stats)
+        self.assertEqual(sharded, serial)
+        self.assertEqual(sharded_stats.scandir_calls, serial_stats.scandir_calls)
+
+    def test_cli_rejects_worker_counts_below_one(self):
+        """find --workers and --processes take positive integers only."""
+        for option in ("--workers", "--processes"):
+            for value in ("0", "-2", "many"):
+                errors = io.StringIO()
+                with redirect_stderr(errors), self.assertRaises(SystemExit) as exit:
+                    cli.main(["find", self.temp_dir, ".py", option, value])
+                self.assertEqual(exit.exception.code, 2)
+                self.assertIn("is not a positive integer", errors.getvalue())
+
+
+class TestFileIndex(TempTreeTestCase):
+    """Test cases for the SQLite metadata index."""
+
+    def setUp(self):
+        super().setUp()
+        self.root = os.path.join(self.temp_dir, "tree")
+        self._make_tree(dict.fromkeys(
+            ["setup.py", os.path.join("src", "main.py"),
+             os.path.join("src", "pkg", "util.py"), os.path.join("docs", "index.md"),
+             os.path.join("Docs_old", "old.py"), "archive.tar.gz"], "data"),
+            root=self.root)
+        self.index = file_index.FileIndex(os.path.join(self.temp_dir, "index.db"),
+                                          self.root)
+
+    def tearDown(self):
+        self.index.close()
+        super().tearDown()
+
+    def _write(self, name, data="data"):
+        with open(os.path.join(self.root, name), "w") as f:
+            f.write(data)
+
+    def test_queries_match_walk(self):
+        """Indexed results equal a fresh walk, in the same order."""
+        self.assertEqual(self.index.refresh(), 5)
+        for extension in (".py", ".PY", ".tar.gz", "md", ""):
+            self.assertEqual(
+                self.index.find_files_by_extension(extension),
+                file_manager.find_files_by_extension(self.root, extension))
+
+    def test_refresh_relists_only_changed_directories(self):
+        """Unchanged directories are not listed again."""
+        self.index.refresh()
+        stats = file_manager.WalkStats()
+        self.assertEqual(self.index.refresh(stats=stats), 0)
+        self.assertEqual(stats.scandir_calls, 0)
+
+        self._write(os.path.join("src", "pkg", "new.py"))
+        os.utime(os.path.join(self.root, "src", "pkg"), ns=(0, 0))
+        self.assertEqual(self.index.refresh(), 1)
+        self.assertIn(os.path.join("src", "pkg", "new.py"),
+                      self.index.find_files_by_extension(".py"))
+
+    def test_removed_directory_is_forgotten(self):
+        """Deleting a directory drops its subtree but not similarly named ones."""
+        import shutil
+        self.index.refresh()
+        shutil.rmtree(os.path.join(self.root, "docs"))
+        os.utime(self.root, ns=(0, 0))
+        self.index.refresh()
+        self.assertEqual(self.index.find_files_by_extension(".md"), [])
+        self.assertIn(os.path.join("Docs_old", "old.py"),
+                      self.index.find_files_by_extension(".py"))
+
+    def test_index_bound_to_root(self):
+        """An index cannot be reused for a different root."""
+        with self.assertRaises(ValueError):
+            file_index.FileIndex(os.path.join(self.temp_dir, "index.db"),
+                                 self.temp_dir)
+
+    def test_cli_query_without_refresh(self):
+        """find --index --no-refresh answers from the index as it stands."""
+        db = os.path.join(self.temp_dir, "index.db")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = cli.main(["find", self.root, ".md", "--index", db])
+        self.assertEqual(status, 0)
+        self.assertEqual(output.getvalue().splitlines(),
+                         [os.path.join("docs", "index.md")])
+
+        self._write("new.md")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = cli.main(["find", self.root, ".md", "--index", db,
+                               "--no-refresh"])
+        self.assertEqual(status, 0)
+        self.assertEqual(output.getvalue().splitlines(),
+                         [os.path.join("docs", "index.md")])
+
+    def test_cli_reports_index_of_another_root(self):
+        """An index built for another root is an error, not a traceback."""
+        errors = io.StringIO()
+        with redirect_stderr(errors):
+            status = cli.main(["find", self.temp_dir, ".py", "--index",
+                               os.path.join(self.temp_dir, "index.db")])
+        self.assertEqual(status, 1)
+        self.assertTrue(errors.getvalue().startswith("Error: Index "))
+
+
+class TestMultiExtensionFind(TempTreeTestCase):
+    """Test cases for multi-extension, single-pass searches."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree(dict.fromkeys(
+            ["a.py", "b.PYI", "c.pyx", "d.txt", "e.tar.gz", "f.gz", ".bashrc",
+             os.path.join("pkg", "g.py"), os.path.join("pkg", "h.backup.tar.gz")],
+            "data"))
+
+    def test_matcher_longest_suffix_wins(self):
+        """Compound suffixes are matched ahead of their last component."""
+        matcher = file_manager.ExtensionMatcher([".GZ", ".tar.gz", "rc"])
+        self.assertEqual(matcher.extensions, [".gz", ".tar.gz", "rc"])
+        self.assertEqual(matcher.match("x.TAR.GZ"), ".tar.gz")
+        self.assertEqual(matcher.match("x.gz"), ".gz")
+        self.assertEqual(matcher.match(".bashrc"), "rc")
+        self.assertIsNone(matcher.match("x.tgz"))
+
+    def test_set_of_extensions_single_walk(self):
+        """A set of extensions is found in one walk."""
+        stats = file_manager.WalkStats()
+        result = file_manager.find_files_by_extension(
+            self.temp_dir, {".py", ".pyi", ".pyx"}, stats=stats)
+        self.assertEqual(result, ["a.py", "b.PYI", "c.pyx",
+                                  os.path.join("pkg", "g.py")])
+        self.assertEqual(stats.scandir_calls, 2)
+
+    def test_grouped_results(self):
+        """Results are grouped per extension in the order given."""
+        grouped = file_manager.find_files_by_extensions(
+            self.temp_dir, [".tar.gz", ".gz", ".py"], workers=2)
+        self.assertEqual(list(grouped), [".tar.gz", ".gz", ".py"])
+        self.assertEqual(grouped[".tar.gz"],
+                         ["e.tar.gz", os.path.join("pkg", "h.backup.tar.gz")])
+        self.assertEqual(grouped[".gz"], ["f.gz"])
+        self.assertEqual(grouped[".py"], ["a.py", os.path.join("pkg", "g.py")])
+
+    def test_index_accepts_several_extensions(self):
+        """The SQLite index answers multi-extension queries the same way."""
+        with file_index.FileIndex(os.path.join(self.temp_dir, "pkg", "x.db"),
+                                  self.temp_dir) as index:
+            index.refresh()
+            for extensions in ([".py", ".tar.gz"], [".pyi", "rc"]):
+                self.assertEqual(
+                    index.find_files_by_extension(extensions),
+                    file_manager.find_files_by_extension(self.temp_dir,
+                                                         extensions))
+
+
+class TestFormatFileSizes(unittest.TestCase):
+    """Test cases for the format_file_sizes batch API."""
+
+    SIZES = [0, 1, 512, 1023, 1024, 1536, 1048575, 1048576, 999, 1000,
+             999999, 10 ** 6, 2.5, 1024.5, 1024 ** 5, 1024 ** 7, 10 ** 18,
+             -1, "12", None]
+
+    def test_matches_scalar(self):
+        """Batch output equals format_file_size for every input."""
+        for use_binary in (True, False):
+            for precision in (0, 2, 3):
+                self.assertEqual(
+                    file_manager.format_file_sizes(self.SIZES, precision, use_binary),
+                    [file_manager.format_file_size(size, precision, use_binary)
+                     for size in self.SIZES])
+
+    def test_unit_boundaries(self):
+        """Units switch exactly at the unit sizes."""
+        self.assertEqual(file_manager.format_file_sizes([1023, 1024]),
+                         ["1023 bytes", "1.00 KiB"])
+        self.assertEqual(
+            file_manager.format_file_sizes([999999, 10 ** 6], use_binary=False),
+            ["1000.00 KB", "1.00 MB"])
+        self.assertEqual(file_manager.format_file_size(1024 ** 7), "1048576.00 PiB")
+
+    def test_accepts_arrays(self):
+        """array.array input is accepted like a list."""
+        from array import array
+        sizes = array("Q", [0, 1536, 1048576])
+        self.assertEqual(file_manager.format_file_sizes(sizes),
+                         ["0 bytes", "1.50 KiB", "1.00 MiB"])
+
+
+class TestBufferedTreeRenderer(TempTreeTestCase):
+    """Test cases for render_directory_tree and TreeWriter."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree({os.path.join(sub, f"f{n}.txt"): "x" * n
+                         for sub in ("alpha", "beta") for n in range(3)})
+
+    def test_output_identical_to_print(self):
+        """The renderer writes exactly what list_directory_tree prints."""
+        printed = io.StringIO()
+        with redirect_stdout(printed):
+            file_manager.list_directory_tree(self.temp_dir)
+        for iterative in (False, True):
+            rendered = io.StringIO()
+            entries = file_manager.render_directory_tree(self.temp_dir, rendered,
+                                                         iterative=iterative)
+            self.assertEqual(rendered.getvalue(), printed.getvalue())
+            self.assertEqual(entries, 8)
+
+    def test_writes_in_chunks(self):
+        """Lines reach the stream in bulk writes, not one per line."""
+        writes = []
+
+        class RecordingStream(io.StringIO):
+            def write(self, text):
+                writes.append(text)
+                return super().write(text)
+
+        file_manager.render_directory_tree(self.temp_dir, RecordingStream())
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(writes[0].count("\n"), 8)
+
+    def test_max_entries_truncates(self):
+        """Rendering stops at max_entries and reports the truncation."""
+        for iterative in (False, True):
+            rendered = io.StringIO()
+            stats = file_manager.WalkStats()
+            entries = file_manager.render_directory_tree(
+                self.temp_dir, rendered, max_entries=3, stats=stats,
+                iterative=iterative)
+            self.assertEqual(entries, 3)
+            self.assertEqual(rendered.getvalue().splitlines(), [
+                "├── alpha/",
+                "│   ├── f0.txt (0 bytes)",
+                "│   ├── f1.txt (1 bytes)",
+                "... (output truncated after 3 entries)",
+            ])
+            # "beta" was never listed
+            self.assertEqual(stats.scandir_calls, 2)
+
+
+class TestStructuredOutput(TempTreeTestCase):
+    """Test cases for iter_tree_records and write_records."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree({"a.py": "abc", os.path.join("docs", "guide.md"): "#",
+                         os.path.join("docs", "img", "logo.py"): ""})
+
+    def test_records_in_tree_order(self):
+        """Records follow the tree order and carry size, depth and mtime."""
+        stats = file_manager.WalkStats()
+        records = list(file_manager.iter_tree_records(self.temp_dir, stats=stats))
+        self.assertEqual([(r["path"], r["type"], r["depth"]) for r in records], [
+            ("a.py", "file", 0),
+            ("docs", "dir", 0),
+            (os.path.join("docs", "guide.md"), "file", 1),
+            (os.path.join("docs", "img"), "dir", 1),
+            (os.path.join("docs", "img", "logo.py"), "file", 2),
+        ])
+        self.assertEqual(records[0]["size"], 3)
+        self.assertEqual(records[0]["mtime"],
+                         os.stat(os.path.join(self.temp_dir, "a.py")).st_mtime)
+        # One root check, one listing per directory and one stat per entry
+        self.assertEqual(stats.syscalls, 1 + 3 + 5)
+
+    def test_max_depth_and_extension(self):
+        """max_depth matches the tree view; extension yields matching files."""
+        shallow = list(file_manager.iter_tree_records(self.temp_dir, max_depth=1))
+        self.assertEqual([r["path"] for r in shallow], ["a.py", "docs"])
+        found = [r["path"] for r in
+                 file_manager.iter_tree_records(self.temp_dir, extension=".py")]
+        self.assertEqual(found,
+                         file_manager.find_files_by_extension(self.temp_dir, ".py"))
+
+    def test_ndjson_and_json_output(self):
+        """Records round-trip through NDJSON and JSON array output."""
+        import json
+        records = list(file_manager.iter_tree_records(self.temp_dir))
+
+        stream = io.StringIO()
+        count = file_manager.write_records(iter(records), stream, chunk_records=2)
+        self.assertEqual(count, 5)
+        self.assertEqual([json.loads(line) for line in stream.getvalue().splitlines()],
+                         records)
+
+        stream = io.StringIO()
+        file_manager.write_records(iter(records), stream, json_lines=False,
+                                   chunk_records=2)
+        self.assertEqual(json.loads(stream.getvalue()), records)
+
+        stream = io.StringIO()
+        file_manager.write_records(iter([]), stream, json_lines=False)
+        self.assertEqual(json.loads(stream.getvalue()), [])
+
+
+class TestBatchMode(TempTreeTestCase):
+    """Test cases for the non-interactive batch mode of the CLI."""
+
+    def setUp(self):
+        super().setUp()
+        self.sample = os.path.join(self.temp_dir, "sample file.txt")
+        with open(self.sample, "w") as f:
+            f.write("x" * 1536)
+
+    def test_parse_command_line(self):
+        """Lines split into command and arguments, honoring quotes."""
+        self.assertEqual(cli.parse_command_line("CALC a.txt b.txt\n"),
+                         ("calc", ["a.txt", "b.txt"]))
+        self.assertEqual(cli.parse_command_line('calc "my file.txt"'),
+                         ("calc", ["my file.txt"]))
+        self.assertIsNone(cli.parse_command_line("   "))
+        self.assertIsNone(cli.parse_command_line("# comment"))
+
+    def test_batch_runs_without_menu(self):
+        """Commands run through process_user_command with no menu or prompt."""
+        lines = [f'calc "{self.sample}"', "info", "quit", "calc never-run.txt"]
+        output = io.StringIO()
+        with patch("builtins.input", side_effect=AssertionError("prompted")):
+            status = cli.run_batch(lines, output, chunk_commands=1)
+        text = output.getvalue()
+        self.assertEqual(status, 0)
+        self.assertIn("Size: 1.50 KiB", text)
+        self.assertIn("PROGRAM INFORMATION", text)
+        self.assertNotIn("Available commands", text)
+        self.assertNotIn("never-run", text)
+
+    def test_batch_exit_status_on_errors(self):
+        """Failed and unknown commands make the batch exit non-zero."""
+        errors = io.StringIO()
+        with redirect_stderr(errors):
+            status = cli.run_batch(["calc missing.txt", "bogus", 'calc "open'],
+                                   io.StringIO())
+        self.assertEqual(status, 1)
+        self.assertIn("Error on line 1: calc missing.txt", errors.getvalue())
+        self.assertIn("Error on line 2: bogus", errors.getvalue())
+        self.assertIn("3 command(s) failed", errors.getvalue())
+
+    def test_main_batch_file(self):
+        """main(["--batch", FILE]) runs the file and returns its status."""
+        batch_file = os.path.join(self.temp_dir, "commands.txt")
+        with open(batch_file, "w") as f:
+            f.write(f'calc "{self.sample}"\n')
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(cli.main(["--batch", batch_file]), 0)
+        self.assertIn("Size: 1536 bytes", output.getvalue())
+
+
+class TestOneShotCommands(TempTreeTestCase):
+    """Test cases for the one-shot calc/tree/find entry points."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree(dict.fromkeys(
+            ["notes.txt", os.path.join("src", "app.py"),
+             os.path.join("src", "lib.py")], "data"))
+
+    def _run(self, argv):
+        output = io.StringIO()
+        with redirect_stdout(output), redirect_stderr(io.StringIO()):
+            status = cli.main(argv)
+        return status, output.getvalue()
+
+    def test_calc_many_files(self):
+        """calc sizes every file and fails if any is missing."""
+        notes = os.path.join(self.temp_dir, "notes.txt")
+        status, output = self._run(["calc", notes, notes])
+        self.assertEqual(status, 0)
+        self.assertEqual(output.count(f"File: {notes}"), 2)
+        status, _ = self._run(["calc", notes, "missing.txt"])
+        self.assertEqual(status, 1)
+
+    def test_tree_and_find(self):
+        """tree prints the tree view and find prints one path per line."""
+        status, output = self._run(["tree", self.temp_dir, "--depth", "2"])
+        expected = io.StringIO()
+        with redirect_stdout(expected):
+            file_manager.list_directory_tree(self.temp_dir, max_depth=2)
+        self.assertEqual((status, output), (0, expected.getvalue()))
+
+        status, output = self._run(["find", self.temp_dir, ".py", "--limit", "1"])
+        self.assertEqual((status, output.splitlines()),
+                         (0, [os.path.join("src", "app.py")]))
+        status, _ = self._run(["find", "nonexistent_dir_9", ".py"])
+        self.assertEqual(status, 1)
+
+    def test_find_json_and_index(self):
+        """find --json writes NDJSON; find --index answers from an index."""
+        import json
+        status, output = self._run(["find", self.temp_dir, ".py", "--json"])
+        self.assertEqual([json.loads(line)["path"] for line in output.splitlines()],
+                         [os.path.join("src", "app.py"), os.path.join("src", "lib.py")])
+
+        db_path = os.path.join(self.temp_dir, "index.db")
+        for _ in range(2):
+            status, output = self._run(["find", self.temp_dir, ".py",
+                                        "--index", db_path])
+            self.assertEqual(output.splitlines(),
+                             [os.path.join("src", "app.py"),
+                              os.path.join("src", "lib.py")])
+
+    def test_import_is_lazy(self):
+        """Importing cli does not load argparse, json, sqlite3 or thread pools."""
+        import subprocess
+        code = ("import sys, cli; "
+                "print(sorted(m for m in ('argparse', 'json', 'sqlite3', "
+                "'concurrent.futures', 'shlex') if m in sys.modules))")
+        completed = subprocess.run([sys.executable, "-c", code],
+                                   cwd=os.path.dirname(os.path.abspath(cli.__file__)),
+                                   capture_output=True, text=True, check=True)
+        self.assertEqual(completed.stdout.strip(), "[]")
+
+
+class TestMultiFileCalc(TempTreeTestCase):
+    """Test cases for sizing many files and glob patterns at once."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree({"b.log": "x" * 2048, "a.log": "x" * 1024,
+                         "c.txt": "x" * 10})
+
+    def _path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def test_single_stat_per_file(self):
+        """Each file is resolved with exactly one os.stat call."""
+        real_stat = os.stat
+        with patch("os.stat", side_effect=real_stat) as mock_stat:
+            with redirect_stdout(io.StringIO()):
+                self.assertTrue(
+                    file_manager.get_and_display_file_size(self._path("c.txt")))
+        self.assertEqual(mock_stat.call_count, 1)
+
+    def test_globs_in_input_order_with_total(self):
+        """Globs expand sorted, results keep input order, and a total follows."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            ok = file_manager.get_and_display_file_sizes(
+                [self._path("c.txt"), self._path("*.log")], workers=4)
+        self.assertTrue(ok)
+        files = [line[len("File: "):] for line in output.getvalue().splitlines()
+                 if line.startswith("File: ")]
+        self.assertEqual(files, [self._path("c.txt"), self._path("a.log"),
+                                 self._path("b.log")])
+        self.assertIn("Total: 3 file(s), 3082 bytes (3.01 KiB)", output.getvalue())
+
+    def test_errors_reported_in_place(self):
+        """Missing files, directories and empty globs are errors."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            ok = file_manager.get_and_display_file_sizes(
+                [self._path("a.log"), self._path("missing"), self.temp_dir,
+                 self._path("*.none")])
+        self.assertFalse(ok)
+        text = output.getvalue()
+        self.assertIn(f"Error: File '{self._path('missing')}' not found.", text)
+        self.assertIn(f"Error: '{self.temp_dir}' is not a regular file.", text)
+        self.assertIn("No files match", text)
+        self.assertIn("Total: 1 file(s), 1024 bytes", text)
+        self.assertLess(text.index("a.log"), text.index("missing"))
+
+    def test_existing_names_are_literal_and_globs_skip_directories(self):
+        """A name that exists is not globbed; a glob never yields directories."""
+        with open(self._path("rep[1].txt"), "w") as f:
+            f.write("xyz")
+        with open(self._path("rep1.txt"), "w") as f:
+            f.write("other")
+        os.makedirs(self._path("logs.log"))
+        self.assertEqual(
+            file_manager.expand_file_patterns(
+                [self._path("rep[1].txt"), self._path("*.log")]),
+            ([self._path("rep[1].txt"), self._path("a.log"), self._path("b.log")],
+             True))
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(
+                file_manager.expand_file_patterns([self._path("logs.*")]),
+                ([], False))
+        self.assertIn("No files match", output.getvalue())
+
+    def test_single_file_output_unchanged(self):
+        """A single name prints exactly what get_and_display_file_size prints."""
+        single, multi = io.StringIO(), io.StringIO()
+        with redirect_stdout(single):
+            file_manager.get_and_display_file_size(self._path("a.log"))
+        with redirect_stdout(multi):
+            file_manager.get_and_display_file_sizes([self._path("a.log")])
+        self.assertEqual(multi.getvalue(), single.getvalue())
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    """Test cases for the benchmark suite's results and comparisons."""
+
+    def test_suite_runs_and_counts_syscalls(self):
+        """A tiny suite run reports timings and syscall counts for each tree."""
+        import benchmarks
+        results = benchmarks.run_suite(scale=20, repeat=1)
+        for tree_name in benchmarks.SUITE_TREES:
+            result = results[f"{tree_name}/list_directory_tree"]
+            self.assertGreater(result["entries"], 0)
+            self.assertGreater(result["scandir_calls"], 0)
+        self.assertIn("sizes/format_file_sizes", results)
+
+    def test_compare_flags_regressions(self):
+        """Slowdowns past the threshold and extra syscalls are regressions."""
+        import benchmarks
+        baseline = {
+            "a": {"per_entry_us": 1.0, "scandir_calls": 5, "stat_calls": 5},
+            "b": {"per_entry_us": 1.0, "scandir_calls": 5, "stat_calls": 5},
+            "c": {"per_entry_us": 1.0},
+        }
+        results = {
+            "a": {"per_entry_us": 1.1, "scandir_calls": 5, "stat_calls": 5},
+            "b": {"per_entry_us": 0.5, "scandir_calls": 5, "stat_calls": 6},
+            "c": {"per_entry_us": 1.5},
+            "d": {"per_entry_us": 9.0},
+        }
+        with redirect_stdout(io.StringIO()):
+            regressions = benchmarks.compare_results(results, baseline, 0.2)
+        self.assertEqual(regressions, ["b", "c"])
+
+
+class TestWalkInstrumentation(TempTreeTestCase):
+    """Test cases for the walk counters and the CLI stats command."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree(dict.fromkeys(
+            ["a.py", os.path.join("src", "b.py"),
+             os.path.join("src", "pkg", "c.txt")], "data"),
+            directories=["locked"])
+
+    def _deny_locked(self):
+        """Patch os.scandir so the "locked" directory cannot be listed."""
+        real_scandir = os.scandir
+        locked = os.path.join(self.temp_dir, "locked")
+
+        def scandir(path):
+            if path == locked:
+                raise PermissionError(13, "Permission denied", path)
+            return real_scandir(path)
+        return patch("file_manager.os.scandir", side_effect=scandir)
+
+    def test_tree_counts_entries_and_output(self):
+        """A tree render counts directories, files, syscalls and output bytes."""
+        stats = file_manager.WalkStats()
+        stream = io.StringIO()
+        file_manager.render_directory_tree(self.temp_dir, stream, stats=stats)
+        self.assertIs(file_manager.last_walk_stats, stats)
+        self.assertEqual(stats.operation, f"tree {self.temp_dir}")
+        self.assertEqual(stats.directories, 4)
+        self.assertEqual(stats.files, 3)
+        self.assertEqual(stats.scandir_calls, 4)
+        self.assertEqual(stats.errors, 0)
+        self.assertEqual(stats.output_bytes,
+                         len(stream.getvalue().encode("utf-8")))
+        self.assertGreater(stats.wall_time, 0)
+        self.assertLessEqual(stats.list_time, stats.wall_time)
+
+    def test_skipped_errors_are_counted(self):
+        """Directories the walkers skip over are counted as errors."""
+        with self._deny_locked():
+            found = file_manager.find_files_by_extension(self.temp_dir, ".py")
+            self.assertEqual(file_manager.last_walk_stats.errors, 1)
+            for iterative in (False, True):
+                with redirect_stdout(io.StringIO()):
+                    file_manager.list_directory_tree(self.temp_dir,
+                                                     iterative=iterative)
+                self.assertEqual(file_manager.last_walk_stats.errors, 1)
+            list(file_manager.iter_tree_records(self.temp_dir))
+            self.assertEqual(file_manager.last_walk_stats.errors, 1)
+        self.assertEqual(found, ["a.py", os.path.join("src", "b.py")])
+
+    def test_generator_wall_time_ends_with_walk(self):
+        """A lazy search publishes its stats at once and times the whole walk."""
+        stats = file_manager.WalkStats()
+        found = file_manager.iter_files_by_extension(self.temp_dir, ".py",
+                                                     stats=stats)
+        self.assertEqual(next(found), "a.py")
+        self.assertEqual(stats.wall_time, 0)
+        self.assertEqual(list(found), [os.path.join("src", "b.py")])
+        self.assertGreater(stats.wall_time, 0)
+        self.assertEqual(stats.files, 3)
+
+    def test_stats_command(self):
+        """The stats command shows the counters of the last operation."""
+        with patch.object(file_manager, "last_walk_stats", None):
+            output = io.StringIO()
+            with redirect_stdout(output):
+                cli.process_user_command("stats", True)
+            self.assertIn("No operation has been run yet.", output.getvalue())
+
+            output = io.StringIO()
+            status = cli.run_batch([f'find "{self.temp_dir}" .py', "stats"],
+                                   output)
+        text = output.getvalue()
+        self.assertEqual(status, 0)
+        self.assertIn("2 file(s) found.", text)
+        self.assertIn(f"Operation:       find {self.temp_dir}", text)
+        self.assertIn("Directories:     4", text)
+        self.assertIn("Errors skipped:  0", text)
+
+
+class TestDuplicateFinder(TempTreeTestCase):
+    """Test cases for the duplicate file finder."""
+
+    def setUp(self):
+        super().setUp()
+        big = bytes(range(256)) * 64  # 16 KiB, more than two partial blocks
+        middle = bytearray(big)
+        middle[8000] ^= 0xFF
+        self.files = {
+            "a.txt": b"same", os.path.join("sub", "b.txt"): b"same",
+            "c.txt": b"diff", "unique.txt": b"only one of this size",
+            "big.bin": big, os.path.join("sub", "big copy.bin"): big,
+            "middle.bin": bytes(middle), "empty1": b"", "empty2": b"",
+        }
+        self._make_tree(self.files)
+
+    def test_groups_identical_files(self):
+        """Only byte-identical files are grouped, largest first."""
+        import file_hashing
+        groups = file_hashing.find_duplicate_files(self.temp_dir, workers=4)
+        self.assertEqual(groups, [
+            (16384, ["big.bin", os.path.join("sub", "big copy.bin")]),
+            (4, ["a.txt", os.path.join("sub", "b.txt")]),
+        ])
+
+    def test_unique_sizes_are_not_read(self):
+        """Files with a unique size are never hashed; survivors are hashed in full."""
+        import file_hashing
+        with patch("file_hashing._hash_job", wraps=file_hashing._hash_job) as job:
+            file_hashing.find_duplicate_files(self.temp_dir, workers=1)
+        hashed = [(os.path.relpath(call.args[0][0], self.temp_dir), call.args[0][2])
+                  for call in job.call_args_list]
+        self.assertNotIn(("unique.txt", True), hashed)
+        self.assertNotIn(("empty1", True), hashed)
+        # The 16 KiB files share their first and last blocks, so all three
+        # need a full hash; the small files were settled by the partial one
+        self.assertIn(("middle.bin", False), hashed)
+        self.assertNotIn(("a.txt", False), hashed)
+
+    def test_links_are_not_duplicates(self):
+        """Symlinks and hard links to a file are not extra copies of it."""
+        import file_hashing
+        os.symlink("a.txt", os.path.join(self.temp_dir, "link.txt"))
+        os.link(os.path.join(self.temp_dir, "big.bin"),
+                os.path.join(self.temp_dir, "hard.bin"))
+        groups = file_hashing.find_duplicate_files(self.temp_dir)
+        self.assertEqual(groups, [
+            (16384, ["big.bin", os.path.join("sub", "big copy.bin")]),
+            (4, ["a.txt", os.path.join("sub", "b.txt")]),
+        ])
+
+        # A file whose only other names are links has no duplicates
+        os.remove(os.path.join(self.temp_dir, "sub", "big copy.bin"))
+        groups = file_hashing.find_duplicate_files(self.temp_dir)
+        self.assertEqual([size for size, _ in groups], [4])
+
+    def test_hash_file_matches_hashlib(self):
+        """Chunked reads and mmap give the same digest as hashlib."""
+        import hashlib
+        import file_hashing
+        path = os.path.join(self.temp_dir, "big.bin")
+        expected = hashlib.sha256(self.files["big.bin"]).hexdigest()
+        self.assertEqual(file_hashing.hash_file(path, "sha256"), expected)
+        self.assertEqual(file_hashing.hash_file(path, "sha256", chunk_size=1000),
+                         expected)  # larger than chunk_size: mmap
+
+    def test_dupes_command(self):
+        """The dupes command lists each group and the reclaimable space."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = cli.main(["dupes", self.temp_dir, "--workers", "2"])
+        text = output.getvalue()
+        self.assertEqual(status, 0)
+        self.assertIn("2 files of 16.00 KiB:\n  big.bin\n", text)
+        self.assertIn("2 group(s) of duplicates, 16.00 KiB reclaimable.", text)
+        self.assertEqual(file_manager.last_walk_stats.operation,
+                         f"dupes {self.temp_dir}")
+
+
+class TestChecksums(TempTreeTestCase):
+    """Test cases for checksum computation and manifest verification."""
+
+    def setUp(self):
+        super().setUp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        self.contents = {"a.txt": b"hello\n", "b.bin": bytes(range(256)) * 8192}
+        self._make_tree(self.contents)
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        super().tearDown()
+
+    def _run(self, *argv):
+        output, errors = io.StringIO(), io.StringIO()
+        with redirect_stdout(output), redirect_stderr(errors):
+            status = cli.main(list(argv))
+        return status, output.getvalue(), errors.getvalue()
+
+    def test_checksum_files_in_order(self):
+        """Digests match hashlib, in input order, for both algorithms."""
+        import hashlib
+        import file_hashing
+        for algorithm in ("sha256", "blake2b"):
+            results = file_hashing.checksum_files(
+                ["b.bin", "missing.txt", "a.txt"], algorithm, workers=3)
+            self.assertEqual(results[0], (
+                hashlib.new(algorithm, self.contents["b.bin"]).hexdigest(),
+                len(self.contents["b.bin"]), None))
+            self.assertEqual(results[1],
+                             (None, None, "Error: File 'missing.txt' not found."))
+            self.assertEqual(results[2][0],
+                             hashlib.new(algorithm, b"hello\n").hexdigest())
+
+    def test_checksum_command_writes_manifest(self):
+        """Output is sha256sum-compatible; errors and throughput go to stderr."""
+        status, output, errors = self._run("checksum", "*.txt", "b.bin", "nope")
+        self.assertEqual(status, 1)
+        self.assertEqual(output.splitlines()[0],
+                         "5891b5b522d5df086d0ff0b110fbd9d21bb4fc7163af34d08286a2e846f6be03"
+                         "  a.txt")
+        self.assertEqual(len(output.splitlines()), 2)
+        self.assertIn("Error: File 'nope' not found.", errors)
+        self.assertIn("2 file(s)", errors)
+        self.assertIn("MB/s", errors)
+
+    def test_verify_manifest(self):
+        """A manifest round-trips, and changed or missing files fail it."""
+        _, output, _ = self._run("checksum", "--algorithm", "blake2b",
+                                 "a.txt", "b.bin")
+        with open("manifest", "w") as f:
+            f.write(output + "not a checksum line\n")
+
+        status, output, _ = self._run("checksum", "--check", "manifest")
+        self.assertEqual(status, 1)  # the malformed line
+        self.assertIn("a.txt: OK\nb.bin: OK\n", output)
+        self.assertIn("1 line(s) are improperly formatted", output)
+
+        _, good, _ = self._run("checksum", "a.txt", "b.bin")
+        with open("manifest", "w") as f:
+            f.write(good)
+        with open("a.txt", "ab") as f:
+            f.write(b"changed")
+        os.remove("b.bin")
+        status, output, _ = self._run("checksum", "--check", "manifest")
+        self.assertEqual(status, 1)
+        self.assertIn("a.txt: FAILED\nb.bin: FAILED open or read\n", output)
+        self.assertIn("2 of 2 file(s) did NOT match", output)
+
+    def test_checksum_in_batch(self):
+        """Batch files can compute and verify checksums."""
+        _, good, _ = self._run("checksum", "a.txt")
+        with open("manifest", "w") as f:
+            f.write(good)
+        output = io.StringIO()
+        with redirect_stderr(io.StringIO()):
+            status = cli.run_batch(["checksum a.txt", "checksum --check manifest"],
+                                   output)
+        self.assertEqual(status, 0)
+        self.assertEqual(output.getvalue(), good + "a.txt: OK\n")
+
+
+class TestWatchMode(TempTreeTestCase):
+    """Test cases for the polling watch mode."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree({"log.txt": "x",
+                         os.path.join("old", "deep", "keep.txt"): "keep"})
+        self._age_directories()
+
+    def _write(self, name, text, mode="w"):
+        with open(os.path.join(self.temp_dir, name), mode) as f:
+            f.write(text)
+
+    def _age_directories(self):
+        """Give every directory an old mtime the watcher can trust."""
+        for dirpath, _, _ in os.walk(self.temp_dir):
+            os.utime(dirpath, (1_000_000_000, 1_000_000_000))
+
+    def test_reports_added_removed_and_resized(self):
+        """A poll reports what changed since the previous one, in tree order."""
+        import file_watch
+        watcher = file_watch.TreeWatcher(self.temp_dir)
+        self.assertEqual(watcher.poll(), [])
+
+        os.makedirs(os.path.join(self.temp_dir, "new"))
+        self._write(os.path.join("new", "a.py"), "abc")
+        self._write("log.txt", "xyz", "a")
+        os.remove(os.path.join(self.temp_dir, "old", "deep", "keep.txt"))
+        changes = watcher.poll()
+        self.assertEqual(changes, [
+            (file_watch.RESIZED, "log.txt", 1, 4),  # root was re-listed
+            (file_watch.ADDED, "new" + os.sep, None, None),
+            (file_watch.ADDED, os.path.join("new", "a.py"), None, 3),
+            (file_watch.REMOVED, os.path.join("old", "deep", "keep.txt"), 4, None),
+        ])
+        self.assertEqual(watcher.poll(), [])
+
+    def test_unchanged_directories_are_not_relisted(self):
+        """Only directories whose mtime changed are listed again."""
+        import file_watch
+        watcher = file_watch.TreeWatcher(self.temp_dir)
+        watcher.poll()
+        stats = file_manager.WalkStats()
+        self.assertEqual(watcher.poll(stats), [])
+        self.assertEqual(stats.scandir_calls, 0)
+        self.assertEqual(stats.stat_calls, 3)  # one per directory
+
+        # Writing to a file does not touch its directory's mtime...
+        self._write("log.txt", "more", "a")
+        self.assertEqual(watcher.poll(), [])
+        # ...so catching that needs stat_files
+        watcher = file_watch.TreeWatcher(self.temp_dir, stat_files=True)
+        watcher.poll()
+        self._write("log.txt", "!", "a")
+        self.assertEqual(watcher.poll(),
+                         [(file_watch.RESIZED, "log.txt", 5, 6)])
+
+    def test_removed_directory_reports_subtree(self):
+        """Removing a directory reports everything that was below it."""
+        import shutil
+        import file_watch
+        watcher = file_watch.TreeWatcher(self.temp_dir)
+        watcher.poll()
+        shutil.rmtree(os.path.join(self.temp_dir, "old"))
+        lines = [file_watch.format_change(change) for change in watcher.poll()]
+        self.assertEqual(lines, ["- old" + os.sep,
+                                 "- " + os.path.join("old", "deep") + os.sep,
+                                 "- " + os.path.join("old", "deep", "keep.txt")])
+
+    def test_watch_command(self):
+        """watch prints the changes found by each poll."""
+        def change_tree(seconds):
+            self.assertEqual(seconds, 0.5)
+            self._write("added.txt", "12")
+
+        output = io.StringIO()
+        with patch("file_watch.time.sleep", side_effect=change_tree), \
+                redirect_stdout(output):
+            status = cli.main(["watch", self.temp_dir, "--interval", "0.5",
+                               "--count", "1"])
+        self.assertEqual(status, 0)
+        self.assertIn("1 change(s)\n+ added.txt (2 bytes)\n", output.getvalue())
+
+    def test_batch_watch_needs_polls(self):
+        """In a batch, watch without POLLS fails instead of running forever."""
+        output = io.StringIO()
+        errors = io.StringIO()
+        with patch("file_watch.time.sleep") as sleep, redirect_stderr(errors):
+            status = cli.run_batch([f'watch "{self.temp_dir}"',
+                                    f'watch "{self.temp_dir}" 0.5',
+                                    f'watch "{self.temp_dir}" 0.5 1'], output)
+        self.assertEqual(status, 1)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertIn("Error on line 1: ", errors.getvalue())
+        self.assertIn("Error on line 2: ", errors.getvalue())
+        self.assertIn("SECONDS POLLS", errors.getvalue())
+        self.assertIn("2 command(s) failed", errors.getvalue())
+
+
+class TestLargestFiles(TempTreeTestCase):
+    """Test cases for the top-K largest files search."""
+
+    def setUp(self):
+        super().setUp()
+        self.sizes = {"a.log": 10, "b.txt": 300, os.path.join("sub", "c.log"): 2048,
+                      os.path.join("sub", "d.txt"): 10,
+                      os.path.join("sub", "deeper", "e.log"): 5000, "z.bin": 0}
+        self._make_tree({name: b"x" * size for name, size in self.sizes.items()})
+
+    def test_largest_first_with_ties_in_walk_order(self):
+        """The K largest files come back largest first, ties in walk order."""
+        expected = [(5000, os.path.join("sub", "deeper", "e.log")),
+                    (2048, os.path.join("sub", "c.log")), (300, "b.txt"),
+                    (10, "a.log"), (10, os.path.join("sub", "d.txt"))]
+        self.assertEqual(file_manager.find_largest_files(self.temp_dir, 5), expected)
+        self.assertEqual(file_manager.find_largest_files(self.temp_dir, 4),
+                         expected[:4])
+        self.assertEqual(len(file_manager.find_largest_files(self.temp_dir, 100)), 6)
+        self.assertEqual(file_manager.find_largest_files(self.temp_dir, 0), [])
+
+    def test_extension_filter(self):
+        """Extensions restrict the candidates, as for find_files_by_extension."""
+        self.assertEqual(
+            file_manager.find_largest_files(self.temp_dir, 2, ".LOG"),
+            [(5000, os.path.join("sub", "deeper", "e.log")),
+             (2048, os.path.join("sub", "c.log"))])
+        self.assertEqual(
+            [path for _, path in file_manager.find_largest_files(
+                self.temp_dir, 10, [".txt", ".bin"])],
+            ["b.txt", os.path.join("sub", "d.txt"), "z.bin"])
+
+    def test_heap_stays_bounded(self):
+        """The heap never holds more than K files, and only they get a path."""
+        import heapq
+        sizes = []
+        real_push = heapq.heappush
+
+        def push(heap, item):
+            real_push(heap, item)
+            sizes.append(len(heap))
+        stats = file_manager.WalkStats()
+        with patch("heapq.heappush", side_effect=push), \
+                patch("file_manager._join_relative",
+                      wraps=file_manager._join_relative) as join:
+            file_manager.find_largest_files(self.temp_dir, 2, stats=stats)
+        self.assertEqual(max(sizes), 2)
+        # Two directories plus the four files that entered the heap;
+        # sub/d.txt and z.bin were too small to get a path
+        self.assertEqual(join.call_count, 6)
+        self.assertEqual(stats.stat_calls, 1 + len(self.sizes))
+
+    def test_largest_command(self):
+        """largest prints formatted sizes, in the menu and as a one-shot."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = cli.main(["largest", self.temp_dir, "-n", "2"])
+        self.assertEqual(status, 0)
+        self.assertEqual(output.getvalue().splitlines(), [
+            f"{'4.88 KiB':>12}  {os.path.join('sub', 'deeper', 'e.log')}",
+            f"{'2.00 KiB':>12}  {os.path.join('sub', 'c.log')}"])
+
+        output = io.StringIO()
+        status = cli.run_batch([f'largest "{self.temp_dir}" 1 .txt'], output)
+        self.assertEqual(status, 0)
+        self.assertEqual(output.getvalue(), f"{'300 bytes':>12}  b.txt\n")
+
+
+class TestExcludeRules(TempTreeTestCase):
+    """Test cases for gitignore-style exclude rules in the walkers."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree(dict.fromkeys(
+            ["main.py", "notes.md", os.path.join("docs", "guide.md"),
+             os.path.join("docs", "api", "ref.md"),
+             os.path.join("node_modules", "lib", "index.py"),
+             os.path.join("src", "app.py"), os.path.join("src", "app.pyc"),
+             os.path.join("src", "__pycache__", "app.cpython.pyc"),
+             os.path.join("src", "build", "out.py"),
+             os.path.join("build", "gen.py")], "x"))
+
+    def _excluded(self, patterns, relative, is_dir=False):
+        rules = file_exclude.ExcludeRules(patterns).rooted(self.temp_dir)
+        return rules.excluded(os.path.join(self.temp_dir, relative),
+                              os.path.basename(relative), is_dir)
+
+    def test_pattern_semantics(self):
+        """Patterns follow .gitignore matching rules."""
+        self.assertTrue(self._excluded(["node_modules"], "a/node_modules", True))
+        self.assertTrue(self._excluded(["build/"], "src/build", True))
+        self.assertFalse(self._excluded(["build/"], "build", False))
+        self.assertTrue(self._excluded(["/build"], "build", True))
+        self.assertFalse(self._excluded(["/build"], "src/build", True))
+        self.assertTrue(self._excluded(["*.pyc"], "src/deep/x.pyc"))
+        self.assertFalse(self._excluded(["docs/*.md"], "docs/api/ref.md"))
+        self.assertTrue(self._excluded(["docs/**/*.md"], "docs/api/ref.md"))
+        self.assertTrue(self._excluded(["docs/**/*.md"], "docs/guide.md"))
+        self.assertTrue(self._excluded(["**/api"], "docs/api", True))
+        self.assertTrue(self._excluded(["file[0-9].txt"], "file7.txt"))
+        self.assertFalse(self._excluded(["file[!0-9].txt"], "file7.txt"))
+        # The last matching pattern wins
+        self.assertFalse(self._excluded(["*.md", "!notes.md"], "notes.md"))
+        self.assertTrue(self._excluded(["!notes.md", "*.md"], "notes.md"))
+        self.assertFalse(self._excluded(["# comment", "", "\\#x"], "# comment"))
+
+    def test_negation_applies_to_nested_plain_names(self):
+        """With a "!" rule, plain names still match at any depth."""
+        patterns = ["build", "*.md", "!guide.md"]
+        self.assertTrue(self._excluded(patterns, "src/build", True))
+        self.assertFalse(self._excluded(patterns, "docs/guide.md"))
+        self.assertTrue(self._excluded(patterns, "docs/api/ref.md"))
+
+        found = file_manager.find_files_by_extension(
+            self.temp_dir, [".py", ".md"], exclude=patterns)
+        self.assertEqual(sorted(found), sorted([
+            "main.py", os.path.join("docs", "guide.md"),
+            os.path.join("node_modules", "lib", "index.py"),
+            os.path.join("src", "app.py")]))
+
+    def test_excluded_directories_are_not_listed(self):
+        """Every walker mode skips excluded subtrees without listing them."""
+        exclude = ["node_modules/", "__pycache__", "/build", "*.pyc"]
+        expected = ["main.py", os.path.join("src", "app.py"),
+                    os.path.join("src", "build", "out.py")]
+        for kwargs in ({}, {"iterative": True}, {"workers": 2},
+                       {"processes": 2}):
+            stats = file_manager.WalkStats()
+            found = file_manager.find_files_by_extension(
+                self.temp_dir, [".py", ".pyc"], stats=stats, exclude=exclude,
+                **kwargs)
+            self.assertEqual(found, expected, kwargs)
+            # root, docs, docs/api, src and src/build
+            self.assertEqual(stats.scandir_calls, 5, kwargs)
+
+        for iterative in (False, True):
+            stream = io.StringIO()
+            file_manager.render_directory_tree(self.temp_dir, stream, 5,
+                                               iterative=iterative,
+                                               exclude=exclude + ["docs"])
+            self.assertEqual(stream.getvalue().splitlines(), [
+                "├── main.py (1 bytes)", "├── notes.md (1 bytes)", "└── src/",
+                "    ├── app.py (1 bytes)", "    └── build/",
+                "        └── out.py (1 bytes)"])
+
+    def test_gitignore_files(self):
+        """.gitignore files apply to their subtree, deeper files first."""
+        with open(os.path.join(self.temp_dir, ".gitignore"), "w") as f:
+            f.write("# generated\nbuild/\n*.md\nnode_modules\n")
+        with open(os.path.join(self.temp_dir, "docs", ".gitignore"), "w") as f:
+            f.write("!*.md\napi/\n")
+        rules = file_exclude.ExcludeRules(["__pycache__/", "*.pyc"], gitignore=True)
+        records = file_manager.iter_tree_records(self.temp_dir, extension=".md",
+                                                 exclude=rules)
+        self.assertEqual([record["path"] for record in records],
+                         [os.path.join("docs", "guide.md")])
+        self.assertEqual(
+            file_manager.find_files_by_extension(self.temp_dir, ".py",
+                                                 exclude=rules),
+            ["main.py", os.path.join("src", "app.py")])
+
+    def test_cli_exclude_options(self):
+        """tree and find accept --exclude and --gitignore."""
+        with open(os.path.join(self.temp_dir, ".gitignore"), "w") as f:
+            f.write("src/\n")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = cli.main(["find", self.temp_dir, ".py", "--gitignore",
+                               "--exclude", "node_modules", "--exclude", "build"])
+        self.assertEqual(status, 0)
+        self.assertEqual(output.getvalue(), "main.py\n")
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            cli.main(["tree", self.temp_dir, "--depth", "1", "--exclude", "*/",
+                      "--exclude", "*.py"])
+        self.assertEqual(output.getvalue(),
+                         "├── .gitignore (5 bytes)\n└── notes.md (1 bytes)\n")
+
+
+class TestSymlinkFollowing(TempTreeTestCase):
+    """Test cases for following symlinked directories with cycle detection."""
+
+    def setUp(self):
+        super().setUp()
+        self.root = os.path.join(self.temp_dir, "root")
+        self.outside = os.path.join(self.temp_dir, "outside")
+        self._make_tree(dict.fromkeys(
+            [os.path.join("root", "a", "b", "x.txt"),
+             os.path.join("root", "c", "y.txt"),
+             os.path.join("outside", "z.txt")], "xyz"))
+        # A cycle, a second link to a walked directory and a link outside
+        os.symlink(os.path.join("..", ".."), os.path.join(self.root, "a", "b", "up"))
+        os.symlink(os.path.join("..", "a"), os.path.join(self.root, "c", "toa"))
+        os.symlink(self.outside, os.path.join(self.root, "ext"))
+
+    def test_symlinked_directories_not_followed_by_default(self):
+        """Directory symlinks are shown as links and never entered."""
+        stream = io.StringIO()
+        file_manager.render_directory_tree(self.root, stream, 10)
+        self.assertEqual(stream.getvalue().splitlines(), [
+            "├── a/", "│   └── b/", f"│       ├── up -> {os.path.join('..', '..')}",
+            "│       └── x.txt (3 bytes)", "├── c/",
+            f"│   ├── toa -> {os.path.join('..', 'a')}", "│   └── y.txt (3 bytes)",
+            f"└── ext -> {self.outside}"])
+        self.assertEqual(file_manager.find_files_by_extension(self.root, ".txt"),
+                         [os.path.join("a", "b", "x.txt"), os.path.join("c", "y.txt")])
+        records = list(file_manager.iter_tree_records(self.root))
+        self.assertEqual([r["path"] for r in records if r["type"] == "link"],
+                         [os.path.join("a", "b", "up"), os.path.join("c", "toa"),
+                          "ext"])
+
+    def test_follow_symlinks_skips_revisits(self):
+        """Every walker mode lists each directory once, cycles included."""
+        expected = [os.path.join("a", "b", "x.txt"), os.path.join("c", "y.txt"),
+                    os.path.join("ext", "z.txt")]
+        for kwargs in ({}, {"iterative": True}, {"workers": 2}):
+            stats = file_manager.WalkStats()
+            found = file_manager.find_files_by_extension(
+                self.root, ".txt", stats=stats, follow_symlinks=True, **kwargs)
+            self.assertEqual(found, expected, kwargs)
+            self.assertEqual(stats.revisits_skipped, 2, kwargs)
+            # root, a, a/b, c and outside
+            self.assertEqual(stats.scandir_calls, 5, kwargs)
+        self.assertEqual(file_manager.find_files_by_extension(
+            self.root, ".txt", processes=2, follow_symlinks=True), expected)
+
+        records = file_manager.iter_tree_records(self.root, follow_symlinks=True)
+        self.assertEqual([r["path"] for r in records if r["type"] == "file"],
+                         expected)
+        self.assertEqual(file_manager.find_largest_files(
+            self.root, 2, follow_symlinks=True),
+            [(3, os.path.join("a", "b", "x.txt")), (3, os.path.join("c", "y.txt"))])
+        self.assertEqual(file_manager.last_walk_stats.revisits_skipped, 2)
+
+    def test_every_mode_picks_the_serial_path(self):
+        """A directory linked twice is found under the serial walk's path."""
+        for link in ("a", "b"):
+            os.makedirs(os.path.join(self.root, link), exist_ok=True)
+            os.symlink(os.path.join("..", "shared"),
+                       os.path.join(self.root, link, "l"))
+        os.makedirs(os.path.join(self.root, "shared"))
+        with open(os.path.join(self.root, "shared", "x.py"), "w"):
+            pass
+        for kwargs in ({}, {"iterative": True}, {"workers": 3},
+                       {"processes": 2}):
+            self.assertEqual(file_manager.find_files_by_extension(
+                self.root, ".py", follow_symlinks=True, **kwargs),
+                [os.path.join("a", "l", "x.py")], kwargs)
+
+    def test_tree_marks_skipped_directories(self):
+        """The tree view shows revisited directories as skipped."""
+        for iterative in (False, True):
+            stream = io.StringIO()
+            stats = file_manager.WalkStats()
+            file_manager.render_directory_tree(self.root, stream, 10, stats=stats,
+                                               iterative=iterative,
+                                               follow_symlinks=True)
+            self.assertEqual(stream.getvalue().splitlines(), [
+                "├── a/", "│   └── b/", "│       ├── up/ (already listed, skipped)",
+                "│       └── x.txt (3 bytes)", "├── c/",
+                "│   ├── toa/ (already listed, skipped)",
+                "│   └── y.txt (3 bytes)", "└── ext/", "    └── z.txt (3 bytes)"])
+            self.assertEqual(stats.revisits_skipped, 2)
+            self.assertIn("Revisits skipped: 2", stats.summary_lines())
+
+    def test_cli_follow_symlinks(self):
+        """find --follow-symlinks walks links and notes the skips on stderr."""
+        output = io.StringIO()
+        errors = io.StringIO()
+        with redirect_stdout(output), redirect_stderr(errors):
+            status = cli.main(["find", self.root, ".txt", "--follow-symlinks"])
+        self.assertEqual(status, 0)
+        self.assertIn(os.path.join("ext", "z.txt"), output.getvalue())
+        self.assertIn("skipped 2 directories", errors.getvalue())
+
+        errors = io.StringIO()
+        with redirect_stdout(io.StringIO()), redirect_stderr(errors):
+            status = cli.main(["find", self.root, ".txt", "--follow-symlinks",
+                               "--index", os.path.join(self.temp_dir, "i.db")])
+        self.assertEqual(status, 1)
+        self.assertIn("--follow-symlinks", errors.getvalue())
+
+
+class TestScanResult(TempTreeTestCase):
+    """Test cases for the columnar ScanResult store."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree({"readme.md": "x" * 5, os.path.join("src", "app.py"): "x" * 12,
+                         os.path.join("src", "util.py"): "x" * 3,
+                         os.path.join("src", "deep", "mod.py"): "x" * 7,
+                         os.path.join("docs", "guide.md"): "x" * 9, "z.py": "x"},
+                        directories=["empty", "locked"])
+
+    def test_scan_matches_tree_records(self):
+        """A scan holds the entries of iter_tree_records, rebuilt on access."""
+        scan = file_scan.scan_tree(self.temp_dir)
+        records = list(file_manager.iter_tree_records(self.temp_dir))
+        self.assertEqual(len(scan), len(records))
+        self.assertEqual(list(scan), [record["path"] for record in records])
+        self.assertEqual(list(scan.records()), records)
+        self.assertEqual(scan[-1], "z.py")
+        self.assertEqual(scan[1:3], [records[1]["path"], records[2]["path"]])
+        self.assertEqual(scan.size(len(scan) - 1), 1)
+        self.assertEqual(scan.kind(0), file_manager.DIR_ENTRY)
+        with self.assertRaises(IndexError):
+            scan[len(scan)]
+        # Directory names are stored once, not once per path
+        self.assertEqual(scan.directories, 6)
+
+    def test_render_with_entries_the_tree_does_not_show(self):
+        """FIFOs and broken links still decide which entry is drawn last."""
+        os.mkfifo(os.path.join(self.temp_dir, "zz.fifo"))
+        os.symlink("missing", os.path.join(self.temp_dir, "src", "zz-broken"))
+        os.mkdir(os.path.join(self.temp_dir, "only-fifo"))
+        os.mkfifo(os.path.join(self.temp_dir, "only-fifo", "pipe"))
+        scan = file_scan.scan_tree(self.temp_dir)
+        self.assertNotIn("zz.fifo", list(scan))
+        for max_depth in (1, 3):
+            expected = io.StringIO()
+            file_manager.render_directory_tree(self.temp_dir, expected, max_depth)
+            rendered = io.StringIO()
+            file_manager.render_directory_tree(scan, rendered, max_depth)
+            self.assertEqual(rendered.getvalue(), expected.getvalue())
+        self.assertIn("├── z.py (1 bytes)", expected.getvalue())
+        self.assertIn("│   ├── util.py (3 bytes)", expected.getvalue())
+
+    def test_compact_find_results(self):
+        """find_files_by_extension(compact=True) holds the same paths."""
+        for kwargs in ({}, {"current_path": "base"}, {"limit": 2},
+                       {"exclude": ["deep/"]}):
+            expected = file_manager.find_files_by_extension(self.temp_dir, ".py",
+                                                            **kwargs)
+            found = file_manager.find_files_by_extension(self.temp_dir, ".py",
+                                                         compact=True, **kwargs)
+            self.assertIsInstance(found, file_scan.ScanResult)
+            self.assertEqual(list(found), expected, kwargs)
+            self.assertEqual(len(found), len(expected))
+        found = file_manager.find_files_by_extension(self.temp_dir, ".py",
+                                                     compact=True)
+        self.assertEqual([found.size(i) for i in range(len(found))], [12, 7, 3, 1])
+        self.assertEqual(list(file_manager.find_files_by_extension(
+            os.path.join(self.temp_dir, "missing"), ".py", compact=True)), [])
+
+    def test_render_matches_live_tree(self):
+        """Rendering a scan prints what walking the directory prints."""
+        scan = file_scan.scan_tree(self.temp_dir)
+        for max_depth, max_entries in ((0, None), (1, None), (2, None),
+                                       (5, None), (5, 4)):
+            live = io.StringIO()
+            file_manager.render_directory_tree(self.temp_dir, live, max_depth,
+                                               max_entries=max_entries)
+            rendered = io.StringIO()
+            stats = file_manager.WalkStats()
+            file_manager.render_directory_tree(scan, rendered, max_depth,
+                                               max_entries=max_entries,
+                                               stats=stats)
+            self.assertEqual(rendered.getvalue(), live.getvalue(), max_depth)
+            self.assertEqual(stats.scandir_calls, 0)
+
+        # A depth-limited scan renders like a depth-limited walk
+        shallow = io.StringIO()
+        file_manager.render_directory_tree(
+            file_scan.scan_tree(self.temp_dir, max_depth=1), shallow, 5)
+        live = io.StringIO()
+        file_manager.render_directory_tree(self.temp_dir, live, 1)
+        self.assertEqual(shallow.getvalue(), live.getvalue())
+
+    def test_render_errors(self):
+        """Unreadable directories are kept as errors; searches cannot render."""
+        real_scandir = os.scandir
+        locked = os.path.join(self.temp_dir, "locked")
+
+        def scandir(path):
+            if path == locked:
+                raise PermissionError(13, "Permission denied", path)
+            return real_scandir(path)
+
+        with patch("file_manager.os.scandir", side_effect=scandir):
+            scan = file_scan.scan_tree(self.temp_dir)
+            live = io.StringIO()
+            file_manager.render_directory_tree(self.temp_dir, live, 5)
+        rendered = io.StringIO()
+        file_manager.render_directory_tree(scan, rendered, 5)
+        self.assertIn("Error accessing directory", rendered.getvalue())
+        self.assertEqual(rendered.getvalue(), live.getvalue())
+
+        missing = io.StringIO()
+        file_manager.render_directory_tree(
+            file_scan.scan_tree(os.path.join(self.temp_dir, "missing")),
+            missing)
+        self.assertIn("is not a valid directory", missing.getvalue())
+        with self.assertRaises(ValueError):
+            file_manager.render_directory_tree(
+                file_scan.scan_tree(self.temp_dir, extension=".py"),
+                io.StringIO())
+
+
+class TestSnapshots(TempTreeTestCase):
+    """Test cases for binary tree snapshots and snapshot diffs."""
+
+    def setUp(self):
+        super().setUp()
+        self.root = os.path.join(self.temp_dir, "tree")
+        self._make_tree({"a.txt": "aaa", os.path.join("src", "main.py"): "x",
+                         os.path.join("src", "lib", "util.py"): "yy",
+                         "z.md": "zzzz"}, root=self.root)
+
+    def _snapshot(self, name):
+        path = os.path.join(self.temp_dir, name)
+        file_snapshot.save_snapshot(self.root, path)
+        return path
+
+    def test_round_trip(self):
+        """A snapshot reads back the entries of the walk that wrote it."""
+        path = self._snapshot("old.snap")
+        expected = list(file_snapshot.scan_entries(self.root))
+        with file_snapshot.Snapshot(path) as snapshot:
+            self.assertEqual(snapshot.root, os.path.abspath(self.root))
+            self.assertEqual(len(snapshot), 6)
+            self.assertEqual(list(snapshot), expected)
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+        # Shared path prefixes are stored once
+        deep = os.path.join(self.root, "a" * 50, "b" * 50)
+        os.makedirs(deep)
+        for n in range(20):
+            with open(os.path.join(deep, f"file{n:02d}"), "w"):
+                pass
+        path = self._snapshot("deep.snap")
+        self.assertLess(os.path.getsize(path), 28 * 40)
+
+    def test_invalid_snapshots(self):
+        """Files that are not complete snapshots raise ValueError."""
+        empty = os.path.join(self.temp_dir, "empty")
+        with open(empty, "wb"):
+            pass
+        with self.assertRaises(ValueError):
+            file_snapshot.Snapshot(empty)
+        with self.assertRaises(ValueError):
+            file_snapshot.Snapshot(os.path.join(self.root, "a.txt"))
+
+        path = self._snapshot("old.snap")
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(data[:-10])
+        with file_snapshot.Snapshot(path) as snapshot:
+            with self.assertRaises(ValueError):
+                list(snapshot)
+        with self.assertRaises(OSError):
+            file_snapshot.Snapshot(os.path.join(self.temp_dir, "missing"))
+
+    def test_diff(self):
+        """The merge reports added, removed, modified and retyped entries."""
+        old = self._snapshot("old.snap")
+        os.remove(os.path.join(self.root, "a.txt"))
+        with open(os.path.join(self.root, "src", "main.py"), "w") as f:
+            f.write("longer")
+        os.remove(os.path.join(self.root, "z.md"))
+        os.mkdir(os.path.join(self.root, "z.md"))
+        with open(os.path.join(self.root, "src", "b.py"), "w") as f:
+            f.write("b")
+        import shutil
+        shutil.rmtree(os.path.join(self.root, "src", "lib"))
+        new = self._snapshot("new.snap")
+
+        expected = [
+            ("removed", "a.txt", 3, None),
+            ("added", os.path.join("src", "b.py"), None, 1),
+            ("removed", os.path.join("src", "lib") + os.sep,
+             os.path.getsize(os.path.join(self.root, "src")), None),
+            ("removed", os.path.join("src", "lib", "util.py"), 2, None),
+            ("modified", os.path.join("src", "main.py"), 1, 6),
+            ("removed", "z.md", 4, None),
+        ]
+        changes = list(file_snapshot.diff_snapshots(old, new))
+        self.assertEqual(changes[:-1], expected)
+        self.assertEqual(changes[-1][:2], ("added", "z.md" + os.sep))
+        # A directory is scanned live in place of a second snapshot
+        self.assertEqual(list(file_snapshot.diff_snapshots(old, self.root)),
+                         changes)
+        self.assertEqual(list(file_snapshot.diff_snapshots(new, self.root)), [])
+
+    def test_snapshot_keeps_its_scan_options(self):
+        """A snapshot records its options and diff reuses them for a directory."""
+        os.makedirs(os.path.join(self.root, "node_modules", "pkg"))
+        with open(os.path.join(self.root, "node_modules", "pkg", "x.js"), "w") as f:
+            f.write("x")
+        path = os.path.join(self.temp_dir, "excluded.snap")
+        file_snapshot.save_snapshot(self.root, path, exclude=["node_modules/"],
+                                    follow_symlinks=True)
+        with file_snapshot.Snapshot(path) as snapshot:
+            self.assertEqual(snapshot.exclude, ["node_modules/"])
+            self.assertFalse(snapshot.gitignore)
+            self.assertTrue(snapshot.follow_symlinks)
+        self.assertEqual(list(file_snapshot.diff_snapshots(path, self.root)), [])
+        self.assertEqual(list(file_snapshot.diff_snapshots(self.root, path)), [])
+
+        plain = self._snapshot("plain.snap")
+        with file_snapshot.Snapshot(plain) as snapshot:
+            self.assertEqual(snapshot.exclude, [])
+            self.assertIsNone(snapshot.exclude_rules())
+            self.assertFalse(snapshot.follow_symlinks)
+
+    def test_cli_snapshot_and_diff(self):
+        """snapshot saves a tree; diff prints the changes and a summary."""
+        path = os.path.join(self.temp_dir, "cli.snap")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = cli.main(["snapshot", self.root, path, "--exclude", "lib/"])
+        self.assertEqual(status, 0)
+        self.assertIn("Saved 4 entries", output.getvalue())
+
+        with open(os.path.join(self.root, "new.txt"), "w") as f:
+            f.write("new")
+        # The live side is scanned with the snapshot's own exclude rules
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = cli.main(["diff", path, self.root])
+        self.assertEqual(status, 0)
+        self.assertEqual(output.getvalue().splitlines(), [
+            "+ new.txt (3 bytes)", "1 added, 0 removed, 0 modified."])
+
+        # Options given on the command line take their place
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = cli.main(["diff", path, self.root, "--exclude", "*.txt"])
+        self.assertEqual(status, 0)
+        self.assertEqual(output.getvalue().splitlines(), [
+            "- a.txt", f"+ {os.path.join('src', 'lib')}{os.sep}"
+            f" ({os.path.getsize(os.path.join(self.root, 'src', 'lib'))} bytes)",
+            f"+ {os.path.join('src', 'lib', 'util.py')} (2 bytes)",
+            "2 added, 1 removed, 0 modified."])
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = cli.main(["diff", os.path.join(self.root, "a.txt"), path])
+        self.assertEqual(status, 1)
+        self.assertIn("not a snapshot file", output.getvalue())
+
+
+class TestStatCache(TempTreeTestCase):
+    """Test cases for the session stat cache."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree({name: name for name in ("a.txt", "b.txt", "c.txt")})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """The cache keeps at most max_entries results, LRU first out."""
+        cache = file_cache.StatCache(max_entries=2)
+        paths = [os.path.join(self.temp_dir, name)
+                 for name in ("a.txt", "b.txt", "c.txt")]
+        cache.put(paths[0], os.stat(paths[0]))
+        cache.put(paths[1], os.stat(paths[1]))
+        self.assertIsNotNone(cache.get(paths[0]))  # b.txt is now the oldest
+        cache.put(paths[2], os.stat(paths[2]))
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(paths[1]))
+        self.assertEqual(cache.get(paths[2]).st_size, 5)
+        # Paths are normalized, so spellings of the same path share an entry
+        self.assertEqual(
+            cache.get(os.path.join(self.temp_dir, ".", "a.txt")).st_size, 5)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (3, 1, 1))
+
+    def test_entries_expire_after_ttl(self):
+        """A result older than the time to live is stat'ed again."""
+        path = os.path.join(self.temp_dir, "a.txt")
+        cache = file_cache.StatCache(ttl=0)
+        cache.put(path, os.stat(path))
+        self.assertIsNone(cache.get(path))
+        self.assertEqual((len(cache), cache.expired, cache.misses), (0, 1, 1))
+
+        cache = file_cache.StatCache(ttl=60)
+        with patch.object(file_manager.time, "monotonic", return_value=100.0):
+            cache.put(path, os.stat(path))
+        with patch.object(file_manager.time, "monotonic", return_value=159.0):
+            self.assertIsNotNone(cache.get(path))
+        with patch.object(file_manager.time, "monotonic", return_value=161.0):
+            self.assertIsNone(cache.get(path))
+
+    def test_walks_share_results_until_the_directory_changes(self):
+        """A second walk reuses sizes; a new entry invalidates the directory."""
+        def walk():
+            stats = file_manager.WalkStats()
+            records = list(file_manager.iter_tree_records(self.temp_dir,
+                                                          stats=stats))
+            return stats.stat_calls, {r["path"]: r["size"] for r in records}
+
+        with patch.object(file_manager, "stat_cache", file_cache.StatCache()):
+            first_calls, first = walk()
+            second_calls, second = walk()
+            self.assertEqual(first, second)
+            self.assertLess(second_calls, first_calls)
+
+            # Replacing a file by renaming over it changes the directory
+            replacement = os.path.join(self.temp_dir, "new.tmp")
+            with open(replacement, "w") as f:
+                f.write("a much longer a.txt")
+            os.replace(replacement, os.path.join(self.temp_dir, "a.txt"))
+            os.utime(self.temp_dir, ns=(0, 0))
+            _, third = walk()
+        self.assertEqual(third["a.txt"], len("a much longer a.txt"))
+        self.assertEqual(third["b.txt"], 5)
+
+    def test_calc_notices_files_deleted_or_replaced(self):
+        """calc checks the directory, so it never reports a stale file."""
+        path = os.path.join(self.temp_dir, "a.txt")
+        with patch.object(file_manager, "stat_cache", file_cache.StatCache()):
+            self.assertEqual(file_manager.stat_file_size(path), (5, None))
+            os.remove(path)
+            self.assertEqual(file_manager.stat_file_size(path),
+                             (None, f"Error: File '{path}' not found."))
+
+            # Also for sizes recorded by a walk that listed the directory
+            list(file_manager.iter_tree_records(self.temp_dir))
+            replacement = os.path.join(self.temp_dir, "new.tmp")
+            with open(replacement, "w") as f:
+                f.write("a longer b.txt")
+            os.replace(replacement, os.path.join(self.temp_dir, "b.txt"))
+            os.utime(self.temp_dir, ns=(0, 0))
+            output = io.StringIO()
+            with redirect_stdout(output):
+                file_manager.get_and_display_file_sizes(
+                    [os.path.join(self.temp_dir, "*.txt")])
+            self.assertIn("Size: 14 bytes", output.getvalue())
+            # The directory, then its files stored before it changed
+            self.assertEqual(file_manager.last_walk_stats.stat_calls, 3)
+
+            # Unchanged, one stat of the directory vouches for its files
+            with redirect_stdout(io.StringIO()):
+                file_manager.get_and_display_file_sizes(
+                    [os.path.join(self.temp_dir, "*.txt")])
+            self.assertEqual(file_manager.last_walk_stats.stat_calls, 1)
+
+    def test_cache_command(self):
+        """Batch runs share a cache that the cache command shows and clears."""
+        path = os.path.join(self.temp_dir, "a.txt")
+        output = io.StringIO()
+        with redirect_stderr(io.StringIO()):
+            status = cli.run_batch([f'calc "{path}"', f'calc "{path}"', "cache",
+                                    "cache clear", "cache", "cache bogus"],
+                                   output)
+        text = output.getvalue()
+        self.assertEqual(status, 1)
+        self.assertIn("Hits:            1 (50.0%)", text)
+        self.assertIn("Stat cache cleared.", text)
+        self.assertIn("Hits:            0 (0.0%)", text)
+        self.assertIn("Usage: cache [clear]", text)
+        self.assertIsNone(file_manager.stat_cache)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            cli.process_user_command("cache", True)
+        self.assertIn("only used in interactive and batch sessions",
+                      output.getvalue())
+
+
+class TestDirectorySizes(TempTreeTestCase):
+    """Test cases for recursive directory sizes (du)."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_tree({"a.txt": b"x" * 10, os.path.join("src", "main.py"): b"x" * 100,
+                         os.path.join("src", "lib", "util.py"): b"x" * 1000,
+                         os.path.join("src", "lib", "deep", "x.bin"): b"x" * 5,
+                         os.path.join("docs", "guide.md"): b"x" * 20},
+                        directories=["empty"])
+
+    def _path(self, *parts):
+        return os.path.join(self.temp_dir, *parts)
+
+    def test_totals_are_added_up_in_one_walk(self):
+        """Every directory gets the total below it; each entry is read once."""
+        stats = file_manager.WalkStats()
+        totals = file_manager.directory_sizes(self.temp_dir, stats=stats)
+        self.assertEqual(totals[self.temp_dir], (1135, 5))
+        self.assertEqual(totals[self._path("src")], (1105, 3))
+        self.assertEqual(totals[self._path("src", "lib")], (1005, 2))
+        self.assertEqual(totals[self._path("src", "lib", "deep")], (5, 1))
+        self.assertEqual(totals[self._path("empty")], (0, 0))
+        self.assertEqual(len(totals), 6)
+        self.assertEqual(stats.scandir_calls, 6)
+        self.assertEqual(stats.stat_calls, 5)
+        self.assertIs(file_manager.last_walk_stats, stats)
+
+        # The du view renders from that walk instead of listing again
+        stats = file_manager.WalkStats()
+        file_manager.render_directory_tree(self.temp_dir, io.StringIO(), 2,
+                                           sizes=True, stats=stats)
+        self.assertEqual(stats.scandir_calls, 6)
+        self.assertEqual(stats.stat_calls, 6)  # The files and the root check
+        self.assertEqual(stats.files, 5)
+
+        totals = file_manager.directory_sizes(self.temp_dir, exclude=["lib/"])
+        self.assertEqual(totals[self.temp_dir], (130, 3))
+        self.assertNotIn(self._path("src", "lib"), totals)
+
+    def test_tree_view_shows_directory_totals(self):
+        """The tree shows each directory's total and the total of the tree."""
+        output = io.StringIO()
+        file_manager.render_directory_tree(self.temp_dir, output, 2, sizes=True)
+        text = output.getvalue()
+        self.assertIn("└── src/ (1105 bytes)\n", text)
+        self.assertIn("    ├── lib/ (1005 bytes)\n", text)
+        self.assertIn("├── empty/ (0 bytes)\n", text)
+        self.assertIn("    └── main.py (100 bytes)\n", text)
+        self.assertTrue(text.endswith("Total: 5 file(s), 1135 bytes (1.11 KiB)\n"))
+
+        # Otherwise the view is the plain tree, whatever the depth or limit
+        import re
+        for max_depth, max_entries in ((0, None), (1, None), (3, None),
+                                       (5, None), (5, 4)):
+            sized = io.StringIO()
+            file_manager.render_directory_tree(self.temp_dir, sized, max_depth,
+                                               max_entries=max_entries,
+                                               sizes=True)
+            plain = io.StringIO()
+            file_manager.render_directory_tree(self.temp_dir, plain, max_depth,
+                                               max_entries=max_entries)
+            lines = [re.sub(r"/ \(\d+ bytes\)$", "/", line)
+                     for line in sized.getvalue().splitlines()]
+            self.assertTrue(lines.pop().startswith("Total: 5 file(s)"))
+            self.assertEqual(lines, plain.getvalue().splitlines(),
+                             (max_depth, max_entries))
+        self.assertNotIn("Total:", plain.getvalue())
+
+    def test_totals_are_memoized_per_directory(self):
+        """A repeat query only lists the directories whose mtime changed."""
+        def sizes(directory):
+            stats = file_manager.WalkStats()
+            return file_manager.directory_sizes(directory, stats=stats), stats
+
+        with patch.object(file_manager, "stat_cache", file_cache.StatCache()):
+            sizes(self.temp_dir)
+            totals, stats = sizes(self.temp_dir)
+            self.assertEqual(totals[self.temp_dir], (1135, 5))
+            self.assertEqual(stats.scandir_calls, 0)
+
+            # A subtree reuses what the walk of its parent found
+            totals, stats = sizes(self._path("src"))
+            self.assertEqual(totals[self._path("src")], (1105, 3))
+            self.assertEqual(stats.scandir_calls, 0)
+
+            deep = self._path("src", "lib", "deep")
+            with open(os.path.join(deep, "y.bin"), "wb") as f:
+                f.write(b"y" * 50)
+            os.utime(deep, ns=(0, 0))
+            totals, stats = sizes(self.temp_dir)
+            self.assertEqual(totals[self.temp_dir], (1185, 6))
+            self.assertEqual(totals[self._path("src", "lib")], (1055, 3))
+            self.assertEqual(stats.scandir_calls, 1)
+            self.assertIn("Directory sizes: 6 memoized, 14 reused",
+                          file_manager.stat_cache.summary_lines())
+
+    def test_du_command(self):
+        """du shows sized trees in batches and one-shot; calc points to it."""
+        output = io.StringIO()
+        with redirect_stderr(io.StringIO()):
+            status = cli.run_batch([f'du "{self.temp_dir}" 1', "du missing-dir",
+                                    f'du "{self.temp_dir}" deep',
+                                    f'calc "{self.temp_dir}"'], output)
+        text = output.getvalue()
+        self.assertEqual(status, 1)
+        self.assertIn("├── docs/ (20 bytes)", text)
+        self.assertIn("Total: 5 file(s), 1135 bytes", text)
+        self.assertIn("Error: 'missing-dir' is not a valid directory.", text)
+        self.assertIn("Error: Usage: du DIRECTORY [DEPTH]", text)
+        self.assertIn("is not a regular file. Use du for directories.", text)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = cli.main(["du", self.temp_dir, "--depth", "1",
+                               "--exclude", "docs/"])
+        self.assertEqual(status, 0)
+        self.assertNotIn("docs/", output.getvalue())
+        self.assertIn("Total: 4 file(s), 1115 bytes", output.getvalue())
+
+
 def print_todo_summary():
     """Print the TODO completion summary."""
     # Import here to avoid circular imports